@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+VERB5_LINES = [
+    "{ts} us=123456 Current Parameter Settings:",
+    "{ts} us=123456   config = '/home/user/vpn/client.ovpn'",
+    "{ts} us=123456   mode = 0",
+    "{ts} us=123456   persist_config = DISABLED",
+    "{ts} us=123456   remote_cert_tls = 2",
+    "{ts} us=123456 TCP/UDP: Preserving recently used remote address: [AF_INET]203.0.113.7:1194",
+    "{ts} us=123456 UDP link remote: [AF_INET]203.0.113.7:1194",
+    "{ts} us=123456 TLS: Initial packet from [AF_INET]203.0.113.7:1194, sid=5c1f3a2e 9b1d2c3f",
+    "{ts} us=123456 VERIFY OK: depth=1, CN=Example CA",
+    "{ts} us=123456 Control Channel: TLSv1.3, cipher TLSv1.3 TLS_AES_256_GCM_SHA384, peer certificate: 2048 bit RSA",
+    "{ts} us=123456 [server] Peer Connection Initiated with [AF_INET]203.0.113.7:1194",
+    "{ts} us=123456 PUSH: Received control message: 'PUSH_REPLY,route 10.8.0.1,topology net30,ping 10,"
+    "ifconfig 10.8.0.6 10.8.0.5,peer-id 0,cipher AES-256-GCM'",
+    "{ts} us=123456 Data Channel: using negotiated cipher 'AES-256-GCM'",
+    "{ts} us=123456 TUN/TAP device tun0 opened",
+    "{ts} us=123456 net_addr_v4_add: 10.8.0.6/24 dev tun0",
+    "{ts} us=123456 Initialization Sequence Completed",
+    "{ts} us=123456 RWRwrWRwRWrwRWRWrwRW",
+    "{ts} us=123456 UDPv4 read bytes from [AF_INET]203.0.113.7:1194",
+    "{ts} us=123456 UDPv4 WRITE [133] to [AF_INET]203.0.113.7:1194: P_DATA_V2 kid=0 DATA len=132",
+    "{ts} us=123456 TUN READ [84]",
+    "{ts} us=123456 TUN WRITE [84]",
+    "{ts} us=123456 OpenSSL: error:1C800064:Provider routines::bad decrypt",
+    "{ts} us=123456 AUTH: Received control message: AUTH_FAILED",
+]
+
+# Data-plane lines dominate real --verb 5 output, so weight them accordingly.
+DATA_PLANE_WEIGHT = 40
+WEIGHTS = [1, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1] + [DATA_PLANE_WEIGHT] * 5 + [1, 1]
+
+
+def legacy_level(line):
+    line_lower = line.lower()
+    if "Initialization Sequence Completed" in line:
+        return "SUCCESS"
+    if "AUTH_FAILED" in line or "auth-failure" in line_lower or "ERROR" in line:
+        return "ERROR"
+    if "tun0:" in line or ("established" in line_lower and "tun" in line):
+        return "TUN"
+    if "Connecting to" in line or "TCP" in line:
+        return "TCP"
+    if "TLS" in line or "Peer Connection" in line:
+        return "TLS"
+    return "INFO"
+
+
+def legacy_events(line):
+    events = []
+    if "Initialization Sequence Completed" in line:
+        events.append("connected")
+    if "AUTH_FAILED" in line or "auth-failure" in line.lower():
+        events.append("auth_failed")
+    if "bad decrypt" in line.lower():
+        events.append("bad_decrypt")
+    if "tun0:" in line or ("established" in line.lower() and ("tun" in line or "/24" in line)):
+        for m in re.finditer(r"(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})", line):
+            a, b = int(m.group(1)), int(m.group(2))
+            if (a == 10) or (a == 172 and 16 <= b <= 31) or (a == 192 and b == 168):
+                events.append("ifconfig")
+                break
+    return events
+
+
+def legacy_classify(line):
+    return legacy_level(line), legacy_events(line)
+
+
+def make_legacy_ingest():
+    lock = threading.Lock()
+    logs = []
+
+    def ingest(line):
+        nonlocal logs
+        level, _ = legacy_classify(line)
+        ts = datetime.now().strftime("%H:%M:%S")
+        with lock:
+            logs.append({"timestamp": ts, "level": level, "message": line})
+            if len(logs) > server.MAX_LOGS:
+                logs = logs[-server.MAX_LOGS:]
+
+    return ingest
+
+
+def make_ring_ingest():
+    buf = server.LogBuffer(server.MAX_LOGS)
+    classify = server.LOG_CLASSIFIER.classify
+
+    def ingest(line):
+        level, _ = classify(line)
+        buf.append(level, line)
+
+    return ingest
+
+
+def synthetic_log(n, seed=1, control_only=False):
+    rng = random.Random(seed)
+    pairs = [(t, w) for t, w in zip(VERB5_LINES, WEIGHTS) if not control_only or w < DATA_PLANE_WEIGHT]
+    templates = rng.choices([t for t, _ in pairs], weights=[w for _, w in pairs], k=n)
+    return [t.format(ts="2024-05-01 12:00:00") for t in templates]
+
+
+def _time(fn, lines):
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return time.perf_counter() - start
+
+
+def compare(title, candidates, lines, repeat):
+    # Runs are interleaved so drift on a busy machine hits every candidate alike; the
+    # first candidate is the baseline the others are reported against.
+    best = [float("inf")] * len(candidates)
+    for _ in range(repeat):
+        for i, (_, fn) in enumerate(candidates):
+            best[i] = min(best[i], _time(fn, lines))
+    print(f"{title} ({len(lines):,} lines):")
+    for (name, _), elapsed in zip(candidates, best):
+        rate = len(lines) / elapsed
+        print(f"  {name:<28} {rate:>14,.0f} lines/s  {best[0] / elapsed:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark openvpn log line classification.")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = synthetic_log(args.lines)
+    control = synthetic_log(args.lines // 10, control_only=True)
+    classify = server.LOG_CLASSIFIER.classify
+    print(f"synthetic --verb 5 log, best of {args.repeat}")
+    compare("classification only, weighted mix", [
+        ("legacy substring checks", legacy_classify),
+        ("LogClassifier.classify", classify),
+    ], lines, args.repeat)
+    compare("classification only, control-plane lines", [
+        ("legacy substring checks", legacy_classify),
+        ("LogClassifier.classify", classify),
+    ], control, args.repeat)
+    compare("classification + log buffer ingest", [
+        ("legacy dict list + trim", make_legacy_ingest()),
+        ("classifier + ring buffer", make_ring_ingest()),
+    ], lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
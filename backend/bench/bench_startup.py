@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import selectors
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# How the desktop shell used to start the backend (script, HTTP polling every 400 ms) and
+# how it starts it now (-m for cached bytecode, wait for the READY line).
+MODES = {
+    "script+poll": (["server.py"], False),
+    "module+ready": (["-m", "server"], True),
+}
+
+
+def _wait_ready(proc, deadline):
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ)
+    buf = b""
+    try:
+        while time.perf_counter() < deadline:
+            if not sel.select(deadline - time.perf_counter()):
+                break
+            chunk = os.read(proc.stdout.fileno(), 4096)
+            if not chunk:
+                break
+            buf += chunk
+            for line in buf.splitlines():
+                if line.startswith(b"READY port="):
+                    return int(line.split(b"=", 1)[1])
+    finally:
+        sel.close()
+    return None
+
+
+def _get(url, timeout=2.0):
+    # Any HTTP answer means the backend is up; without a built frontend "/" is a 404.
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def _poll(url, deadline, interval=0.4):
+    while time.perf_counter() < deadline:
+        try:
+            _get(url)
+            return True
+        except OSError:
+            time.sleep(interval)
+    return False
+
+
+def run_once(mode, port, static_dir, timeout):
+    args, ready = MODES[mode]
+    env = dict(os.environ, VPN_CONNECT_STATIC=str(static_dir))
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, *args, f"--port={0 if ready else port}", "--no-browser"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = start + timeout
+    try:
+        if ready:
+            port = _wait_ready(proc, deadline)
+            if port is None:
+                raise RuntimeError(f"{mode}: no READY line within {timeout}s")
+            ready_at = time.perf_counter()
+            _get(f"http://127.0.0.1:{port}/")
+        else:
+            if not _poll(f"http://127.0.0.1:{port}/", deadline):
+                raise RuntimeError(f"{mode}: backend did not answer within {timeout}s")
+            ready_at = time.perf_counter()
+        first_page = time.perf_counter()
+    finally:
+        proc.terminate()
+        proc.wait()
+    return (ready_at - start) * 1000.0, (first_page - start) * 1000.0
+
+
+def import_time_ms(backend_dir=BACKEND_DIR):
+    code = "import time; t = time.perf_counter(); import server; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _git(*args):
+    return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+
+
+def import_times(rev, runs):
+    # server.py is self-contained, so the baseline is that one file at `rev`, imported from
+    # a scratch directory. Runs alternate between it and the working copy so that machine
+    # noise hits both sides alike.
+    with tempfile.TemporaryDirectory(prefix="vpn-bench-baseline-") as scratch:
+        Path(scratch, "server.py").write_text(_git("show", f"{rev}:./server.py"))
+        subprocess.run([sys.executable, "-m", "compileall", "-q", scratch], check=True)
+        current, base = [], []
+        for _ in range(runs):
+            current.append(import_time_ms())
+            base.append(import_time_ms(scratch))
+        return current, base
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend cold start to first page.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=18765, help="fixed port for the polling mode")
+    parser.add_argument("--static", default=str(BACKEND_DIR.parent / "vpn-connect" / "dist"))
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--baseline", help="git revision to compare import time against (default: the root commit)")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "compileall", "-q", str(BACKEND_DIR / "server.py")], check=True)
+    try:
+        rev = args.baseline or _git("rev-list", "--max-parents=0", "HEAD").split()[0]
+        imports, base = import_times(rev, args.runs)
+    except (subprocess.CalledProcessError, OSError, IndexError) as e:
+        print(f"import baseline unavailable: {e}")
+        rev, imports, base = None, [import_time_ms() for _ in range(args.runs)], None
+    print(f"import server: median {statistics.median(imports):.1f} ms, min {min(imports):.1f} ms")
+    if base:
+        delta = statistics.median(c - b for c, b in zip(imports, base))
+        print(f"  baseline {rev[:12]}: median {statistics.median(base):.1f} ms, paired delta {delta:+.1f} ms")
+    for mode in MODES:
+        ready, page = zip(*(run_once(mode, args.port, args.static, args.timeout) for _ in range(args.runs)))
+        print(
+            f"{mode:>14}: ready median {statistics.median(ready):.1f} ms (min {min(ready):.1f}), "
+            f"first page median {statistics.median(page):.1f} ms (min {min(page):.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
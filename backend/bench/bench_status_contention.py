@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# A synthetic openvpn: verb-3 style lines as fast as the pipe takes them, with an
+# interface and a cipher line every so often so the status fields keep changing too.
+FLOOD = r"""
+import sys, time
+out = sys.stdout
+end = time.monotonic() + float(sys.argv[1])
+i = 0
+while time.monotonic() < end:
+    lines = []
+    for _ in range(200):
+        i += 1
+        if i % 50 == 0:
+            lines.append(f"TUN/TAP device tun{i % 4} opened\n")
+        elif i % 77 == 0:
+            lines.append(f"Outgoing Data Channel: Cipher 'AES-{128 if i % 2 else 256}-GCM' initialized with 256 bit key\n")
+        else:
+            lines.append(f"2026-01-01 00:00:00 UDPv4 READ [1420] from [AF_INET]203.0.113.9:1194: P_DATA_V2 kid=0 DATA len={i}\n")
+    out.write("".join(lines))
+    out.flush()
+"""
+
+
+def load_server(path):
+    os.environ.setdefault("VPN_CONNECT_LOG_ARCHIVE", "0")
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="vpn-bench-home-")
+    sys.path.insert(0, str(BACKEND_DIR))
+    spec = importlib.util.spec_from_file_location("server", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["server"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+async def flood(server, conn, seconds):
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", FLOOD, str(seconds),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    await conn._read_stream(proc.stdout)
+    await proc.wait()
+
+
+def readers(server, conn, count, stop, with_logs, interval):
+    samples = [[] for _ in range(count)]
+
+    def read(out):
+        while not stop.is_set():
+            t = time.perf_counter()
+            server._status_payload(conn)
+            if with_logs:
+                records, _ = conn.logs.since(0, 500)
+                [server.format_log(r) for r in records]
+            out.append((time.perf_counter() - t) * 1e6)
+            if interval:
+                time.sleep(interval)
+
+    threads = [threading.Thread(target=read, args=(samples[i],), daemon=True) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, samples
+
+
+def run(server, count, seconds, with_flood, with_logs, interval):
+    conn = server.Connection(1, "/nonexistent/bench.ovpn", auto_reconnect=False)
+    for i in range(server.MAX_LOGS):
+        conn.append_log(f"warm-up line {i}", "INFO")
+    stop = threading.Event()
+    threads, samples = readers(server, conn, count, stop, with_logs, interval)
+    lines_before = conn.logs.last_seq()
+    start = time.perf_counter()
+    if with_flood:
+        server.io_loop.submit(flood(server, conn, seconds)).result()
+    else:
+        time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in threads:
+        t.join()
+    lat = sorted(x for s in samples for x in s)
+    ingested = conn.logs.last_seq() - lines_before
+    return {
+        "reads": len(lat),
+        "p50": statistics.median(lat),
+        "p99": lat[int(len(lat) * 0.99) - 1],
+        "max": lat[-1],
+        "lines_per_s": ingested / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Status read latency while a synthetic openvpn floods output.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--logs", action="store_true", help="readers also fetch the last 500 log lines")
+    parser.add_argument("--interval", type=float, default=0.002,
+                        help="pause between one reader's requests; 0 spins and mostly measures the GIL")
+    parser.add_argument("--server", default=str(BACKEND_DIR / "server.py"),
+                        help="server.py to measure, e.g. an older revision from git show")
+    args = parser.parse_args()
+
+    server = load_server(args.server)
+    for label, with_flood in (("idle", False), ("flood", True)):
+        r = run(server, args.readers, args.seconds, with_flood, args.logs, args.interval)
+        print(
+            f"{label:>5}: {args.readers} readers, {r['reads']} reads, "
+            f"p50 {r['p50']:.1f} us, p99 {r['p99']:.1f} us, max {r['max'] / 1000:.1f} ms"
+            + (f", {r['lines_per_s']:.0f} lines/s ingested" if with_flood else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
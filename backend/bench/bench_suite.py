@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.server
+import json
+import os
+import selectors
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadgen import LoadGenerator, percentile, print_report  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+
+# End-to-end run of the real backend with no root and no VPN server: openvpn is
+# bench/fake_openvpn.py, tunnel counters come from a fake sysfs tree and the public-IP
+# lookup hits a local stub. Reports connect-to-ready time, log ingest rate, API latency
+# under concurrent pollers and backend memory growth.
+
+PROFILE = """client
+dev tun
+proto udp
+remote 127.0.0.1 1194
+cipher AES-256-GCM
+"""
+
+
+class _PublicIpStub(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"198.51.100.7\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _wait_ready(proc, timeout):
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ)
+    deadline = time.monotonic() + timeout
+    buf = b""
+    try:
+        while time.monotonic() < deadline:
+            if not sel.select(deadline - time.monotonic()):
+                break
+            chunk = os.read(proc.stdout.fileno(), 4096)
+            if not chunk:
+                break
+            buf += chunk
+            for line in buf.splitlines():
+                if line.startswith(b"READY port="):
+                    return int(line.split(b"=", 1)[1])
+    finally:
+        sel.close()
+    raise RuntimeError(f"backend did not print READY within {timeout}s")
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Backend:
+    def __init__(self, work, lines_per_sec, connect_delay, extra_env=()):
+        self.work = Path(work)
+        self.stub = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PublicIpStub)
+        threading.Thread(target=self.stub.serve_forever, daemon=True).start()
+        sysfs = self.work / "sysfs"
+        sysfs.mkdir()
+        home = self.work / "home"
+        home.mkdir()
+        self.profile = self.work / "bench.ovpn"
+        self.profile.write_text(PROFILE)
+        env = dict(
+            os.environ,
+            HOME=str(home),
+            VPN_CONNECT_OPENVPN=f"{sys.executable} {BENCH_DIR / 'fake_openvpn.py'}",
+            VPN_CONNECT_SYSFS_NET=str(sysfs),
+            VPN_CONNECT_PUBLIC_IP_URLS=f"http://127.0.0.1:{self.stub.server_port}/",
+            FAKE_OPENVPN_SYSFS=str(sysfs),
+            FAKE_OPENVPN_LINES_PER_SEC=str(lines_per_sec),
+            FAKE_OPENVPN_CONNECT_DELAY=str(connect_delay),
+        )
+        env.update(extra_env)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "server", "--port=0", "--no-browser"],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.port = _wait_ready(self.proc, 20)
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def request(self, path, data=None):
+        body = None if data is None else json.dumps(data).encode()
+        req = urllib.request.Request(self.url + path, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=10) as r:
+                return json.load(r)
+        except urllib.error.HTTPError as e:
+            return json.load(e)
+
+    def wait_for(self, conn_id, predicate, timeout=20.0, poll=0.005):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.request(f"/api/connections/{conn_id}")
+            if predicate(status):
+                return status
+            time.sleep(poll)
+        raise RuntimeError(f"connection {conn_id} did not reach the expected state within {timeout}s")
+
+    def connect(self, timeout=10.0):
+        # A disconnected tunnel keeps its config busy until the child has been reaped, so
+        # a refused connect right after a disconnect is retried. Returns the id and when
+        # the accepted request was sent.
+        deadline = time.monotonic() + timeout
+        while True:
+            start = time.perf_counter()
+            r = self.request("/api/connect", {"config_path": str(self.profile), "password": "bench", "auto_reconnect": False})
+            if r.get("ok"):
+                return r["id"], start
+            if "Already connected" not in r.get("error", "") or time.monotonic() > deadline:
+                raise RuntimeError(f"connect failed: {r.get('error')}")
+            time.sleep(0.01)
+
+    def disconnect(self, conn_id):
+        self.request(f"/api/connections/{conn_id}/disconnect", {})
+        self.wait_for(conn_id, lambda s: not s.get("connected") and not s.get("connecting") and not s.get("pid"))
+
+    def close(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.stub.shutdown()
+
+
+def bench_connect(backend, runs):
+    times = []
+    for _ in range(runs):
+        conn_id, start = backend.connect()
+        backend.wait_for(conn_id, lambda s: s.get("connected"))
+        times.append((time.perf_counter() - start) * 1000)
+        backend.disconnect(conn_id)
+    times.sort()
+    return {"runs": runs, "p50_ms": statistics.median(times), "p99_ms": percentile(times, 0.99), "min_ms": times[0]}
+
+
+def bench_load(backend, clients, interval, duration):
+    conn_id, _ = backend.connect()
+    backend.wait_for(conn_id, lambda s: s.get("connected"))
+    rss = [_rss_kb(backend.proc.pid)]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.5):
+            rss.append(_rss_kb(backend.proc.pid))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    seq_before = backend.request(f"/api/logs?id={conn_id}&limit=0")["last_seq"]
+    start = time.perf_counter()
+    gen = LoadGenerator(backend.url, ["/api/status", f"/api/logs?id={conn_id}&limit=200", "/api/connections"], clients, interval)
+    report = gen.run(duration)
+    seq_after = backend.request(f"/api/logs?id={conn_id}&limit=0")["last_seq"]
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    rss.append(_rss_kb(backend.proc.pid))
+    backend.disconnect(conn_id)
+    return {
+        "http": report,
+        "ingest_lines_per_s": (seq_after - seq_before) / elapsed,
+        "rss_kb": {"start": rss[0], "peak": max(rss), "end": rss[-1], "growth": rss[-1] - rss[0]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end backend benchmark against a fake openvpn.")
+    parser.add_argument("--connects", type=int, default=10, help="connect/disconnect cycles to time")
+    parser.add_argument("--connect-delay", type=float, default=0.2, help="fake openvpn handshake duration (s)")
+    parser.add_argument("--lines", type=float, default=2000, help="fake openvpn log lines per second")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--interval", type=float, default=0.0, help="pause between a client's requests")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="vpn-bench-") as work:
+        backend = Backend(work, args.lines, args.connect_delay)
+        try:
+            rss_idle = _rss_kb(backend.proc.pid)
+            connect = bench_connect(backend, args.connects)
+            load = bench_load(backend, args.clients, args.interval, args.duration)
+        finally:
+            backend.close()
+
+    print(
+        f"connect-to-ready: p50 {connect['p50_ms']:.0f} ms, p99 {connect['p99_ms']:.0f} ms, "
+        f"min {connect['min_ms']:.0f} ms over {connect['runs']} runs "
+        f"(fake handshake {args.connect_delay * 1000:.0f} ms)"
+    )
+    print(f"log ingest: {load['ingest_lines_per_s']:.0f} lines/s (fake openvpn emits {args.lines:.0f}/s)")
+    print_report(load["http"])
+    rss = load["rss_kb"]
+    print(
+        f"memory: idle {rss_idle / 1024:.1f} MiB, load start {rss['start'] / 1024:.1f} MiB, "
+        f"peak {rss['peak'] / 1024:.1f} MiB, end {rss['end'] / 1024:.1f} MiB "
+        f"({rss['growth'] / 1024:+.1f} MiB)"
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "rss_idle_kb": rss_idle, "connect": connect, **load}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
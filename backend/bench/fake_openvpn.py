@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+# Stand-in for the openvpn binary: run the backend with
+#   VPN_CONNECT_OPENVPN="python3 /path/to/bench/fake_openvpn.py"
+# and it accepts the same command line, prints a verb-3 style connect sequence, serves the
+# --management socket (state, bytecount, signal) and then chatters at a fixed rate.
+# Behaviour is set through the environment, which the backend passes through:
+#   FAKE_OPENVPN_CONNECT_DELAY  seconds from start to Initialization Sequence Completed (0.3)
+#   FAKE_OPENVPN_LINES_PER_SEC  log lines per second once connected (0)
+#   FAKE_OPENVPN_EXIT_AFTER     exit this many seconds after connecting, 0 = never (0)
+#   FAKE_OPENVPN_EXIT_CODE      exit status for EXIT_AFTER (1)
+#   FAKE_OPENVPN_FAIL           "auth" or "decrypt" to fail the handshake instead
+#   FAKE_OPENVPN_STUBBORN       1 to ignore SIGTERM, from the management socket or the OS (0)
+#   FAKE_OPENVPN_SYSFS          sysfs-shaped root to publish the tun counters under
+#   FAKE_OPENVPN_RX_RATE / _TX_RATE  bytes per second through the tunnel (5e6 / 1e6)
+
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_sysfs import FakeNetDev  # noqa: E402
+
+
+def _env(name, default):
+    return type(default)(os.environ.get(f"FAKE_OPENVPN_{name}", default))
+
+
+CONNECT_DELAY = _env("CONNECT_DELAY", 0.3)
+LINES_PER_SEC = _env("LINES_PER_SEC", 0.0)
+EXIT_AFTER = _env("EXIT_AFTER", 0.0)
+EXIT_CODE = _env("EXIT_CODE", 1)
+FAIL = os.environ.get("FAKE_OPENVPN_FAIL", "")
+STUBBORN = os.environ.get("FAKE_OPENVPN_STUBBORN", "0") == "1"
+SYSFS = os.environ.get("FAKE_OPENVPN_SYSFS", "")
+RX_RATE = _env("RX_RATE", 5e6)
+TX_RATE = _env("TX_RATE", 1e6)
+
+CHATTER = (
+    "UDPv4 WRITE [133] to [AF_INET]{remote}: P_DATA_V2 kid=0 DATA len=132",
+    "UDPv4 READ [1420] from [AF_INET]{remote}: P_DATA_V2 kid=0 DATA len=1419",
+    "TUN READ [84]",
+    "TUN WRITE [1400]",
+    "RWRwrWRwRWrwRWRWrwRW",
+    "Data Channel: using negotiated cipher 'AES-256-GCM'",
+)
+
+
+def _timestamp():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class FakeOpenvpn:
+    def __init__(self, argv):
+        self.remote = self._remote(argv)
+        self.management = self._option(argv, "--management")
+        self.pid_file = self._option(argv, "--writepid")
+        self.dev = f"tun{os.getpid() % 10000}"
+        self.ip = f"10.{os.getpid() % 200 + 8}.0.6"
+        self.netdev = None
+        self.rx = 0
+        self.tx = 0
+        self.connected_at = None
+        self.exit_code = None
+        self.out_lock = threading.Lock()
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.bytecount = 0
+        self.state_on = False
+        self.restart = threading.Event()
+        self.done = threading.Event()
+        self.history = []
+
+    @staticmethod
+    def _option(argv, name):
+        return argv[argv.index(name) + 1] if name in argv and argv.index(name) + 1 < len(argv) else None
+
+    def _remote(self, argv):
+        if "--remote" in argv:
+            i = argv.index("--remote")
+            return argv[i + 1], argv[i + 2] if len(argv) > i + 2 and argv[i + 2].isdigit() else "1194"
+        config = self._option(argv, "--config")
+        try:
+            for line in Path(config).read_text().splitlines():
+                parts = line.split()
+                if parts[:1] == ["remote"] and len(parts) >= 2:
+                    return parts[1], parts[2] if len(parts) >= 3 else "1194"
+        except (OSError, TypeError):
+            pass
+        return "127.0.0.1", "1194"
+
+    def log(self, text):
+        with self.out_lock:
+            sys.stdout.write(f"{_timestamp()} {text}\n")
+            sys.stdout.flush()
+
+    def send(self, text):
+        with self.client_lock:
+            if self.client is None:
+                return
+            try:
+                self.client.sendall(text.encode() + b"\r\n")
+            except OSError:
+                self.client = None
+
+    def state(self, name, desc="", local="", remote="", port=""):
+        self.history.append(f"{int(time.time())},{name},{desc},{local},{remote},{port},,")
+        if self.state_on:
+            self.send(f">STATE:{self.history[-1]}")
+
+    def serve_management(self):
+        srv = socket.socket(socket.AF_UNIX)
+        srv.bind(self.management)
+        srv.listen(1)
+        conn, _ = srv.accept()
+        with self.client_lock:
+            self.client = conn
+        self.send(">INFO:OpenVPN Management Interface Version 5 -- type 'help' for more info")
+        for raw in conn.makefile("r"):
+            cmd = raw.strip()
+            if cmd == "state on all":
+                self.state_on = True
+                for record in list(self.history):
+                    self.send(record)
+                self.send("END")
+            elif cmd == "pid":
+                self.send(f"SUCCESS: pid={os.getpid()}")
+            elif cmd.startswith("bytecount "):
+                self.bytecount = int(cmd.split()[1])
+                self.send("SUCCESS: bytecount interval changed")
+            elif cmd == "signal SIGUSR1":
+                self.send("SUCCESS: signal SIGUSR1 thrown")
+                self.restart.set()
+            elif cmd in ("signal SIGTERM", "signal SIGINT"):
+                self.send(f"SUCCESS: {cmd} thrown")
+                if not STUBBORN:
+                    self.stop(0, cmd.split()[1])
+            else:
+                self.send("SUCCESS:")
+        with self.client_lock:
+            self.client = None
+
+    def stop(self, code, sig=None):
+        if self.exit_code is None:
+            self.exit_code = code
+            if sig:
+                self.log(f"{sig}[hard,] received, process exiting")
+            self.state("EXITING", sig or "exit")
+        self.done.set()
+
+    def counters(self):
+        if self.netdev is not None:
+            return self.netdev.counters["rx_bytes"], self.netdev.counters["tx_bytes"]
+        return self.rx, self.tx
+
+    def handshake(self):
+        host, port = self.remote
+        remote = f"{host}:{port}"
+        steps = [
+            ("OpenVPN 2.6.9 x86_64-pc-linux-gnu [SSL (OpenSSL)] [LZO] [LZ4] [EPOLL] [MH/PKTINFO] [AEAD]", None),
+            ("library versions: OpenSSL 3.0.13 30 Jan 2024, LZO 2.10", None),
+            (f"TCP/UDP: Preserving recently used remote address: [AF_INET]{remote}", ("RESOLVE",)),
+            (f"UDPv4 link remote: [AF_INET]{remote}", ("WAIT",)),
+            (f"TLS: Initial packet from [AF_INET]{remote}, sid=5c1f3a2e 9b1d2c3f", ("AUTH",)),
+            ("VERIFY OK: depth=1, CN=Fake CA", None),
+            ("Control Channel: TLSv1.3, cipher TLSv1.3 TLS_AES_256_GCM_SHA384, peer certificate: 2048 bit RSA", None),
+            (f"[server] Peer Connection Initiated with [AF_INET]{remote}", ("GET_CONFIG",)),
+        ]
+        pause = CONNECT_DELAY / (len(steps) + 3)
+        for line, st in steps:
+            if self.done.is_set():
+                return False
+            self.log(line)
+            if st:
+                self.state(*st)
+            time.sleep(pause)
+        if FAIL == "auth":
+            self.log("AUTH: Received control message: AUTH_FAILED")
+            self.state("EXITING", "auth-failure")
+            self.stop(1)
+            return False
+        if FAIL == "decrypt":
+            self.log("OpenSSL: error:1C800064:Provider routines::bad decrypt")
+            self.stop(1)
+            return False
+        self.log(f"PUSH: Received control message: 'PUSH_REPLY,route-gateway 10.8.0.1,ifconfig {self.ip} 255.255.255.0,cipher AES-256-GCM'")
+        self.log("Data Channel: using negotiated cipher 'AES-256-GCM'")
+        self.log("Outgoing Data Channel: Cipher 'AES-256-GCM' initialized with 256 bit key")
+        self.log(f"TUN/TAP device {self.dev} opened")
+        self.state("ASSIGN_IP", "", self.ip)
+        time.sleep(pause)
+        self.log(f"net_addr_v4_add: {self.ip}/24 dev {self.dev}")
+        self.state("ADD_ROUTES")
+        time.sleep(pause)
+        if SYSFS and self.netdev is None:
+            self.netdev = FakeNetDev(SYSFS, self.dev, RX_RATE, TX_RATE).start()
+        self.log("Initialization Sequence Completed")
+        self.state("CONNECTED", "SUCCESS", self.ip, host, port)
+        self.connected_at = time.monotonic()
+        return True
+
+    def connected(self):
+        host, port = self.remote
+        remote = f"{host}:{port}"
+        interval = 1.0 / LINES_PER_SEC if LINES_PER_SEC else 0.5
+        batch = max(1, int(LINES_PER_SEC / 50)) if LINES_PER_SEC else 0
+        last_count = last = time.monotonic()
+        i = 0
+        while not self.done.is_set():
+            now = time.monotonic()
+            if EXIT_AFTER and now - self.connected_at >= EXIT_AFTER:
+                self.log(f"Fake exit after {EXIT_AFTER:g}s")
+                self.stop(EXIT_CODE)
+                return
+            if self.restart.is_set():
+                self.restart.clear()
+                self.log("SIGUSR1[soft,connection-reset] received, process restarting")
+                self.state("RECONNECTING", "connection-reset")
+                if not self.handshake():
+                    return
+                continue
+            self.rx += int(RX_RATE * (now - last))
+            self.tx += int(TX_RATE * (now - last))
+            last = now
+            if self.bytecount and now - last_count >= self.bytecount:
+                last_count = now
+                rx, tx = self.counters()
+                self.send(f">BYTECOUNT:{rx},{tx}")
+            if batch:
+                lines = []
+                for _ in range(batch):
+                    i += 1
+                    lines.append(f"{_timestamp()} {CHATTER[i % len(CHATTER)].format(remote=remote)}\n")
+                with self.out_lock:
+                    sys.stdout.write("".join(lines))
+                    sys.stdout.flush()
+                self.done.wait(interval * batch)
+            else:
+                self.done.wait(interval)
+
+    def run(self):
+        if self.pid_file:
+            Path(self.pid_file).write_text(f"{os.getpid()}\n")
+        signal.signal(signal.SIGTERM, signal.SIG_IGN if STUBBORN else lambda *_: self.stop(0, "SIGTERM"))
+        signal.signal(signal.SIGINT, lambda *_: self.stop(0, "SIGINT"))
+        if self.management:
+            threading.Thread(target=self.serve_management, daemon=True).start()
+        try:
+            if self.handshake():
+                self.connected()
+            self.done.wait()
+        except BrokenPipeError:
+            self.exit_code = 1
+        finally:
+            if self.netdev is not None:
+                self.netdev.set_up(False)
+                self.netdev.stop()
+        return self.exit_code or 0
+
+
+if __name__ == "__main__":
+    sys.exit(FakeOpenvpn(sys.argv[1:]).run())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+
+FIELDS = ("rx_packets", "tx_packets", "rx_bytes", "tx_bytes", "rx_errors", "tx_errors", "rx_dropped", "tx_dropped")
+
+
+class FakeNetDev:
+    # One interface under a /sys/class/net-shaped tree (point VPN_CONNECT_SYSFS_NET at the
+    # root). Counters grow at the given byte rates from a background thread; every file is
+    # replaced with a rename, so readers never see a half-written number.
+
+    def __init__(self, root, dev, rx_rate=0, tx_rate=0, mtu=1420):
+        self.dir = Path(root) / dev
+        self.rx_rate = rx_rate
+        self.tx_rate = tx_rate
+        self.mtu = mtu
+        self.counters = dict.fromkeys(FIELDS, 0)
+        self._stop = threading.Event()
+        self._thread = None
+        (self.dir / "statistics").mkdir(parents=True, exist_ok=True)
+        self.set_up(True)
+        self._flush()
+
+    def _write(self, path, text):
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(text)
+        os.replace(tmp, path)
+
+    def _flush(self):
+        for name, value in self.counters.items():
+            self._write(self.dir / "statistics" / name, f"{value}\n")
+
+    def set_up(self, up):
+        self._write(self.dir / "operstate", "up\n" if up else "down\n")
+
+    def advance(self, seconds):
+        rx = int(self.rx_rate * seconds)
+        tx = int(self.tx_rate * seconds)
+        self.counters["rx_bytes"] += rx
+        self.counters["tx_bytes"] += tx
+        self.counters["rx_packets"] += -(-rx // self.mtu)
+        self.counters["tx_packets"] += -(-tx // self.mtu)
+        self._flush()
+
+    def start(self, interval=0.25):
+        def tick():
+            last = time.monotonic()
+            while not self._stop.wait(interval):
+                now = time.monotonic()
+                self.advance(now - last)
+                last = now
+
+        self._thread = threading.Thread(target=tick, name=f"fake-{self.dir.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake interface counters under a sysfs-shaped tree.")
+    parser.add_argument("root")
+    parser.add_argument("--dev", default="tun0")
+    parser.add_argument("--rx-rate", type=float, default=5e6, help="bytes per second")
+    parser.add_argument("--tx-rate", type=float, default=1e6, help="bytes per second")
+    args = parser.parse_args()
+    dev = FakeNetDev(args.root, args.dev, args.rx_rate, args.tx_rate).start()
+    print(f"{dev.dir}: rx {args.rx_rate:.0f} B/s, tx {args.tx_rate:.0f} B/s; Ctrl-C to stop", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        dev.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+import urllib.parse
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class LoadGenerator:
+    # Closed-loop HTTP pollers: each client holds one keep-alive connection and cycles
+    # through the paths, pausing `interval` seconds between requests (0 = back to back).
+
+    def __init__(self, base_url, paths, clients=16, interval=0.0, timeout=5.0):
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.paths = list(paths)
+        self.clients = clients
+        self.interval = interval
+        self.timeout = timeout
+        self.samples = {p: [] for p in self.paths}
+        self.errors = {p: 0 for p in self.paths}
+        self._lock = threading.Lock()
+
+    def _client(self, stop, offset):
+        conn = None
+        i = offset
+        while not stop.is_set():
+            path = self.paths[i % len(self.paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status < 400
+                if resp.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                ok = False
+                if conn is not None:
+                    conn.close()
+                conn = None
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                if ok:
+                    self.samples[path].append(elapsed)
+                else:
+                    self.errors[path] += 1
+            if self.interval:
+                stop.wait(self.interval)
+        if conn is not None:
+            conn.close()
+
+    def run(self, duration):
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._client, args=(stop, n), daemon=True) for n in range(self.clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        out = {}
+        for path in self.paths:
+            lat = sorted(self.samples[path])
+            out[path] = {
+                "requests": len(lat),
+                "errors": self.errors[path],
+                "rps": len(lat) / elapsed,
+                "p50_ms": statistics.median(lat) * 1000 if lat else None,
+                "p99_ms": percentile(lat, 0.99) * 1000 if lat else None,
+                "max_ms": lat[-1] * 1000 if lat else None,
+            }
+        return out
+
+
+def print_report(report):
+    for path, r in report.items():
+        if not r["requests"]:
+            print(f"{path:>28}: no successful requests, {r['errors']} errors")
+            continue
+        print(
+            f"{path:>28}: {r['requests']} req ({r['rps']:.0f}/s), p50 {r['p50_ms']:.2f} ms, "
+            f"p99 {r['p99_ms']:.2f} ms, max {r['max_ms']:.1f} ms, {r['errors']} errors"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent pollers against the backend HTTP API.")
+    parser.add_argument("url", nargs="?", default="http://127.0.0.1:8765")
+    parser.add_argument("--path", action="append", help="repeatable; default /api/status")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--interval", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    gen = LoadGenerator(args.url, args.path or ["/api/status"], args.clients, args.interval)
+    print_report(gen.run(args.duration))
+
+
+if __name__ == "__main__":
+    main()
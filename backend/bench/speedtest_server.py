@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.server
+import os
+import threading
+import time
+import urllib.parse
+
+BLOCK = os.urandom(1 << 16)
+
+
+class Shaper:
+    # Token bucket shared by every connection in one direction; rate 0 means unshaped.
+
+    def __init__(self, mbps):
+        self.rate = mbps * 1e6 / 8
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate / 10, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class SpeedtestHandler(http.server.BaseHTTPRequestHandler):
+    # The two Cloudflare-style endpoints the backend's speed test uses: GET __down?bytes=N
+    # streams N bytes, POST __up reads and discards the body.
+    protocol_version = "HTTP/1.1"
+    down = Shaper(0)
+    up = Shaper(0)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.rstrip("/") != "/__down":
+            self.send_error(404)
+            return
+        try:
+            size = int(urllib.parse.parse_qs(url.query).get("bytes", ["0"])[0])
+        except ValueError:
+            self.send_error(400)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        try:
+            while size > 0:
+                n = min(size, len(BLOCK))
+                self.down.take(n)
+                self.wfile.write(BLOCK[:n])
+                size -= n
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path.rstrip("/") != "/__up":
+            self.send_error(404)
+            return
+        size = int(self.headers.get("Content-Length") or 0)
+        try:
+            while size > 0:
+                chunk = self.rfile.read(min(size, 1 << 16))
+                if not chunk:
+                    self.close_connection = True
+                    return
+                self.up.take(len(chunk))
+                size -= len(chunk)
+        except ConnectionResetError:
+            self.close_connection = True
+            return
+        body = b"ok\n"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0, down_mbps=0, up_mbps=0):
+    SpeedtestHandler.down = Shaper(down_mbps)
+    SpeedtestHandler.up = Shaper(up_mbps)
+    server = http.server.ThreadingHTTPServer((host, port), SpeedtestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a Cloudflare-style speed test endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--down-mbps", type=float, default=0, help="shape downloads; 0 = unlimited")
+    parser.add_argument("--up-mbps", type=float, default=0, help="shape uploads; 0 = unlimited")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.down_mbps, args.up_mbps)
+    print(f"speed test endpoint at http://{args.host}:{server.server_port}; "
+          f"set VPN_CONNECT_SPEEDTEST_URL or POST /api/speedtest {{\"url\": ...}}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
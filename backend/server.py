@@ -1,468 +1,3829 @@
 #!/usr/bin/env python3
 
+import asyncio
+import contextlib
+import errno
+import functools
+import hashlib
+import io
+import ipaddress
 import json
+import math
+import mimetypes
 import os
+import posixpath
+import pwd
+import queue
+import random
 import re
-import subprocess
+import shlex
+import shutil
+import socket
+import ssl
+import struct
 import sys
 import tempfile
 import threading
 import time
+import urllib.parse
+import zipfile
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
 try:
-    from flask import Flask, request, jsonify, send_from_directory
+    from flask import Flask, Response, request, jsonify
     from flask_cors import CORS
+    from werkzeug.serving import make_server
 except ImportError:
     print("Install dependencies: pip install flask flask-cors", file=sys.stderr)
     sys.exit(1)
 
+
 app = Flask(__name__, static_folder=None)
 CORS(app)
 
-SCRIPT_DIR = Path(__file__).resolve().parent
-PROJECT_ROOT = SCRIPT_DIR.parent
-STATIC_DIR = Path(os.environ.get("VPN_CONNECT_STATIC", "") or str(PROJECT_ROOT / "vpn-connect" / "dist"))
-if not STATIC_DIR.is_absolute():
-    STATIC_DIR = PROJECT_ROOT / "vpn-connect" / "dist"
-SUDOERS_FILE = "/etc/sudoers.d/vpn-connect"
-USER = os.environ.get("USER") or os.popen("whoami").read().strip()
-
-state = {
-    "status": "disconnected",
-    "logs": [],
-    "connect_start_time": None,
-    "vpn_process": None,
-    "askpass_file": None,
-    "pid": None,
-    "ip": "---.---.---.---",
-    "public_ip": None,
-    "config_file": "",
-    "encryption": "AES-256-GCM",
-    "down_mbps": 0.0,
-    "up_mbps": 0.0,
-    "ping_ms": None,
-    "_tun_rx_prev": None,
-    "_tun_tx_prev": None,
-    "_tun_time_prev": None,
-    "lock": threading.Lock(),
-}
-MAX_LOGS = 1024
-UPLOADED_CONFIGS_DIR = None
-TUN_STATS_INTERVAL = 1.0
-PING_INTERVAL = 2.0
-_CONFIG_DIR = os.environ.get("VPN_CONNECT_CONFIG_DIR", "vpn-connect")
-SAVED_CREDENTIALS_FILE = Path(os.path.expanduser("~")) / ".config" / _CONFIG_DIR / "saved.json"
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+STATIC_DIR = Path(os.environ.get("VPN_CONNECT_STATIC", "") or str(PROJECT_ROOT / "vpn-connect" / "dist"))
+if not STATIC_DIR.is_absolute():
+    STATIC_DIR = PROJECT_ROOT / "vpn-connect" / "dist"
+SUDOERS_FILE = "/etc/sudoers.d/vpn-connect"
+# Overrides for running without root against bench/fake_openvpn.py and a fake sysfs tree.
+OPENVPN_COMMAND = shlex.split(os.environ.get("VPN_CONNECT_OPENVPN", "") or "sudo openvpn")
+SYSFS_NET_DIR = os.environ.get("VPN_CONNECT_SYSFS_NET", "") or None
+DEFAULT_PORT = 8765
+
+DISCONNECTED_IP = "---.---.---.---"
+MAX_LOGS = 1024
+MAX_FINISHED_CONNECTIONS = 8
+STATUS_LOG_TAIL = 200
+LOG_LEVELS = ("INFO", "TCP", "TLS", "SUCCESS", "ERROR", "TUN")
+_LEVEL_INDEX = {name: i for i, name in enumerate(LOG_LEVELS)}
+UPLOADED_CONFIGS_DIR = None
+TUN_STATS_INTERVAL = 1.0
+PING_INTERVAL = 2.0
+HISTORY_INTERVAL = 1.0
+HISTORY_TIERS = ((1, 600), (60, 1440), (3600, 720))
+HISTORY_MAX_POINTS = 2000
+CONNECT_PHASES = ("race", "spawn", "resolve", "link", "tls", "peer_connected", "push_reply", "ifconfig", "routes", "completed")
+_LOG_PHASES = {"resolved": "resolve", "link": "link", "initial_packet": "tls", "peer_connected": "peer_connected"}
+_MANAGEMENT_PHASES = {
+    "RESOLVE": "resolve",
+    "TCP_CONNECT": "link",
+    "WAIT": "link",
+    "AUTH": "tls",
+    "GET_CONFIG": "push_reply",
+    "ASSIGN_IP": "ifconfig",
+    "ADD_ROUTES": "routes",
+}
+CONNECT_TIMING_HISTORY = 200
+# Escalation for stopping our own openvpn child, with how long to wait for it to exit
+# after each step.
+TEARDOWN_STAGES = (("signal", 3.0), ("terminate", 2.0), ("kill", 1.0))
+TEARDOWN_HISTORY = 200
+MAX_ATTEMPTS_PER_CONNECTION = 20
+HANDSHAKE_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+METRIC_COUNTERS = {
+    "connect_attempts": "Tunnel connection attempts, including automatic reconnects.",
+    "connect_successes": "Attempts that reached Initialization Sequence Completed.",
+    "auth_failures": "Attempts rejected with an authentication failure.",
+    "disconnects": "Tunnel sessions that ended.",
+}
+PING_TIMEOUT = 2.0
+PING_WINDOW = 30
+DEFAULT_OPENVPN_PORT = 1194
+DEFAULT_CIPHER = "AES-256-GCM"
+CONFIG_CACHE_SIZE = 32
+REMOTE_RACE_TIMEOUT = 1.5
+REMOTE_RACE_GRACE = 0.05
+AUTO_RECONNECT = os.environ.get("VPN_CONNECT_AUTO_RECONNECT", "1") != "0"
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+RECONNECT_RESET_AFTER = 60.0
+RECONNECT_MAX_RETRIES = 0
+PING_LOSS_RESTART = 5
+LINK_DOWN_RESTART = 3
+LINK_STATS_TIMEOUT = 1.0
+MANAGEMENT_CONNECT_TIMEOUT = 10.0
+MANAGEMENT_BYTECOUNT_INTERVAL = 1
+_CONFIG_DIR = os.environ.get("VPN_CONNECT_CONFIG_DIR", "vpn-connect")
+SAVED_CREDENTIALS_FILE = Path(os.path.expanduser("~")) / ".config" / _CONFIG_DIR / "saved.json"
+LIBRARY_DIR = Path(os.path.expanduser("~")) / ".config" / _CONFIG_DIR / "library"
+LIBRARY_IMPORT_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+LIBRARY_MAX_FILE_BYTES = 1024 * 1024
+LIBRARY_MAX_IMPORT_BYTES = 256 * 1024 * 1024
+LIBRARY_MAX_IMPORT_ENTRIES = 100_000
+LIBRARY_PAGE_SIZE = 50
+LIBRARY_MAX_PAGE_SIZE = 500
+LOG_ARCHIVE_DIR = Path(os.path.expanduser("~")) / ".config" / _CONFIG_DIR / "logs"
+LOG_ARCHIVE_ENABLED = os.environ.get("VPN_CONNECT_LOG_ARCHIVE", "1") != "0"
+LOG_ARCHIVE_SEGMENT_BYTES = 4 * 1024 * 1024
+LOG_ARCHIVE_MAX_BYTES = 64 * 1024 * 1024
+LOG_ARCHIVE_QUEUE_SIZE = 10000
+LOG_SEARCH_LIMIT = 500
+LOG_SEARCH_MAX_LIMIT = 5000
+EVENT_KEEPALIVE_INTERVAL = 15.0
+EVENT_QUEUE_SIZE = 512
+STATIC_COMPRESS_MIN = 1024
+PUBLIC_IP_URLS = tuple(u.strip() for u in os.environ.get("VPN_CONNECT_PUBLIC_IP_URLS", "").split(",") if u.strip()) or (
+    "https://api.ipify.org",
+    "https://icanhazip.com",
+    "https://checkip.amazonaws.com",
+    "https://ifconfig.me/ip",
+)
+PUBLIC_IP_TTL = 300.0
+PUBLIC_IP_TIMEOUT = 5.0
+PUBLIC_IP_RETRY_DELAYS = (0, 2, 4, 8)
+SPEEDTEST_URL = os.environ.get("VPN_CONNECT_SPEEDTEST_URL", "") or "https://speed.cloudflare.com"
+SPEEDTEST_STREAMS = 4
+SPEEDTEST_MAX_STREAMS = 16
+SPEEDTEST_DURATION = 8.0
+SPEEDTEST_MAX_DURATION = 30.0
+SPEEDTEST_WARMUP = 1.0
+SPEEDTEST_DOWN_BYTES = 100 * 1000 * 1000
+SPEEDTEST_UP_BYTES = 25 * 1000 * 1000
+SPEEDTEST_IDLE_PROBES = 8
+SPEEDTEST_PROBE_INTERVAL = 0.25
+SPEEDTEST_PROGRESS_INTERVAL = 0.5
+SPEEDTEST_TIMEOUT = 10.0
+SPEEDTEST_HISTORY = 10
+
+class EventLoopThread:
+    # The one asyncio loop that owns every openvpn child: its pipes, management socket,
+    # samplers and supervisor all run as tasks here instead of a handful of threads per
+    # tunnel. Flask request threads hand work over with submit() and call(). The loop is
+    # started on first use, so an idle backend runs no loop thread at all.
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.loop is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(ThreadPoolExecutor(max_workers=4, thread_name_prefix="vpn-io-blocking"))
+                ready = threading.Event()
+
+                def serve():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=serve, name="vpn-io", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self.loop = loop
+        return self.loop
+
+    def in_loop(self):
+        return self._thread is not None and threading.get_ident() == self._thread.ident
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def call(self, fn, *args):
+        if self.in_loop():
+            fn(*args)
+        else:
+            self.start().call_soon_threadsafe(fn, *args)
+
+
+io_loop = EventLoopThread()
+
+
+def _terminate(proc):
+    if proc.returncode is None:
+        try:
+            proc.terminate()
+        except ProcessLookupError:
+            pass
+
+
+def _openvpn_pid(proc, client, pid_file):
+    # openvpn's own pid, which differs from our child's when it runs under sudo: the
+    # management "pid" reply, else the --writepid file, else the child itself when it is
+    # openvpn. None when it cannot be known.
+    if client is not None and client.pid:
+        return client.pid
+    if pid_file:
+        try:
+            with open(pid_file) as f:
+                return int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            pass
+    if proc is not None and OPENVPN_COMMAND[:1] != ["sudo"]:
+        return proc.pid
+    return None
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as root under sudo: alive, just not ours to signal.
+        return True
+    return True
+
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def subscribe():
+    q = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+    with _subscribers_lock:
+        _subscribers.append(q)
+    return q
+
+
+def unsubscribe(q):
+    with _subscribers_lock:
+        if q in _subscribers:
+            _subscribers.remove(q)
+
+
+def publish(event, data):
+    if not _subscribers:
+        return
+    msg = _sse(event, data)
+    with _subscribers_lock:
+        for q in _subscribers:
+            try:
+                q.put_nowait(msg)
+            except queue.Full:
+                # Slow consumer: drop its backlog and have it resync from a fresh snapshot.
+                try:
+                    while True:
+                        q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(None)
+
+
+@functools.lru_cache(maxsize=None)
+def current_user():
+    return os.environ.get("USER") or os.environ.get("LOGNAME") or pwd.getpwuid(os.geteuid()).pw_name
+
+
+def ensure_sudoers():
+    import subprocess
+    if os.path.exists(SUDOERS_FILE):
+        return True
+    try:
+        user = current_user()
+        rule = (
+            f"{user} ALL=(ALL) NOPASSWD: /usr/sbin/openvpn\n"
+        )
+        f = tempfile.NamedTemporaryFile(mode="w", suffix=".sh", delete=False)
+        f.write(f"#!/bin/bash\nprintf '%s' '{rule}' > {SUDOERS_FILE}\nchmod 440 {SUDOERS_FILE}\n")
+        f.close()
+        os.chmod(f.name, 0o755)
+        r = subprocess.run(["pkexec", "bash", f.name], capture_output=True, timeout=60)
+        os.unlink(f.name)
+        return r.returncode == 0
+    except Exception:
+        return False
+
+
+_IPV4 = r"\d{1,3}(?:\.\d{1,3}){3}"
+_LEVEL_PRIORITY = ("SUCCESS", "ERROR", "TUN", "TCP", "TLS", "INFO")
+_LEVEL_RANK = {name: i for i, name in enumerate(_LEVEL_PRIORITY)}
+
+# (event, anchor, pattern, level, static payload). The anchor is a literal that must occur
+# in the line; the optional pattern is matched at the anchor to confirm it and extract
+# named fields. The reported level is the highest-priority level among all matching rules.
+LOG_RULES = [
+    ("connected", "Initialization Sequence Completed", None, "SUCCESS", None),
+    ("auth_failed", "AUTH_FAILED", None, "ERROR", None),
+    ("auth_failed", "auth-failure", None, "ERROR", None),
+    ("bad_decrypt", "bad decrypt", None, None, None),
+    ("tun_opened", "TUN/TAP device ", r"TUN/TAP device (?P<dev>\S+) opened", "TUN", None),
+    ("ifconfig", "net_addr_v4_add: ", rf"net_addr_v4_add: (?P<ip>{_IPV4})/\d+ dev (?P<dev>\S+)", "TUN", None),
+    ("ifconfig", "ip addr add dev ", rf"ip addr add dev (?P<dev>\S+) (?:local )?(?P<ip>{_IPV4})", "TUN", None),
+    ("ifconfig", "ifconfig tun", rf"ifconfig (?P<dev>tun\d+) (?P<ip>{_IPV4})", "TUN", None),
+    ("push_reply", "PUSH_REPLY", None, None, None),
+    ("ifconfig", ",ifconfig ", rf",ifconfig (?P<ip>{_IPV4})", None, None),
+    ("remote", "remote address: [AF_INET", r"remote address: \[AF_INET6?\](?P<address>\S+)", "TCP",
+     {"phase": "resolved"}),
+    ("remote", "link remote: [AF_INET", r"link remote: \[AF_INET6?\](?P<address>\S+)", "TCP", {"phase": "link"}),
+    ("remote", "TCP connection with [AF_INET", r"TCP connection with \[AF_INET6?\](?P<address>\S+)", "TCP",
+     {"phase": "resolved"}),
+    ("remote", "connection established with [AF_INET",
+     r"connection established with \[AF_INET6?\](?P<address>\S+)", "TCP", {"phase": "link"}),
+    ("tls", "TLS: Initial packet from", None, "TLS", {"phase": "initial_packet"}),
+    ("tls", "Control Channel: TLS", r"Control Channel: (?P<version>TLSv[\d.]+)", "TLS", {"phase": "control_channel"}),
+    ("tls", "Peer Connection Initiated with ", r"Peer Connection Initiated with \[AF_INET6?\](?P<address>\S+)",
+     "TLS", {"phase": "peer_connected"}),
+    ("tls", "Data Channel: ", r"Data Channel: (?:using negotiated cipher|[Cc]ipher) '(?P<cipher>[^']+)'", "TLS",
+     {"phase": "data_channel"}),
+    (None, "ERROR", None, "ERROR", None),
+    (None, "tun", r"tun\d+:", "TUN", None),
+    (None, "TCP", None, "TCP", None),
+    (None, "Connecting to", None, "TCP", None),
+    (None, "TLS", None, "TLS", None),
+    (None, "Peer Connection", None, "TLS", None),
+]
+
+
+# openvpn's per-packet output: the R/W/r/w marks of --verb 5 and the trace lines of --verb 4
+# and up. These never carry a rule anchor and dominate verbose output, so a message made only
+# of marks, or starting with one of the prefixes, is classified INFO without a scan.
+LOG_DATA_PLANE_MARKS = "RWrw"
+LOG_DATA_PLANE_PREFIXES = (
+    "TUN READ ", "TUN WRITE ",
+    "UDPv4 READ ", "UDPv4 WRITE ", "UDPv4 read bytes ",
+    "UDPv6 READ ", "UDPv6 WRITE ", "UDPv6 read bytes ",
+)
+
+
+def _literal_trie(words):
+    # Alternation of literals factored by common prefix, so the scan tries each leading
+    # character once per position instead of once per anchor that starts with it.
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class LogClassifier:
+    # Anchors of event rules are folded into one prefix-factored alternation, so a line is
+    # scanned once and rule patterns only run where their anchor was found. The generic
+    # level-only anchors (TCP, TLS, tun, ...) would hit on most lines, so they stay out of
+    # that scan and are only checked, in priority order, when a small scan of their own hits.
+
+    def __init__(self, rules=(), quiet_marks="", quiet_prefixes=()):
+        self._rules = []
+        self._quiet_marks = quiet_marks
+        self._quiet = tuple(quiet_prefixes)
+        self._by_anchor = {}
+        self._levels = []
+        self._level_scan = None
+        self._scan = None
+        for rule in rules:
+            self.add_rule(*rule)
+
+    def add_rule(self, event, anchor, pattern=None, level=None, payload=None):
+        if level is not None and level not in _LEVEL_RANK:
+            raise ValueError(f"unknown log level: {level}")
+        if not anchor:
+            raise ValueError("log rule needs a literal anchor")
+        if event is None and level is None:
+            raise ValueError("log rule needs an event or a level")
+        self._rules.append((event, anchor, pattern, level, payload))
+        self._scan = None
+
+    def _compile(self):
+        # Deferred to the first classify() so building the rule table costs one compile,
+        # not one per rule, and none at all for a backend that never starts a tunnel.
+        by_anchor = {}
+        levels = []
+        for event, anchor, pattern, level, payload in self._rules:
+            regex = re.compile(pattern) if pattern else None
+            if event is None:
+                levels.append((_LEVEL_RANK[level], anchor, regex))
+            else:
+                by_anchor.setdefault(anchor, []).append((event, regex, _LEVEL_RANK.get(level), payload))
+        levels.sort(key=lambda rule: rule[0])
+        self._by_anchor = by_anchor
+        self._levels = levels
+        # An empty alternation would match everywhere; (?!) never matches.
+        self._level_scan = re.compile(_literal_trie(anchor for _, anchor, _ in levels) or "(?!)")
+        self._scan = re.compile(_literal_trie(by_anchor) or "(?!)")
+        return self._scan
+
+    def classify(self, line):
+        # Skip openvpn's "YYYY-MM-DD HH:MM:SS [us=N] " stamp; it can hold no anchor.
+        start = 0
+        if line[19:20] == " " and line[4:5] == "-":
+            start = line.find(" ", 23) + 1 if line.startswith("us=", 20) else 20
+        if line.startswith(self._quiet, start) or not line[start:].strip(self._quiet_marks):
+            return "INFO", ()
+        scan = self._scan or self._compile()
+        rank = _LEVEL_RANK["INFO"]
+        events = ()
+        m = scan.search(line, start)
+        while m is not None:
+            for event, regex, rule_rank, payload in self._by_anchor[m.group()]:
+                if regex is not None:
+                    found = regex.match(line, m.start())
+                    if found is None:
+                        continue
+                if rule_rank is not None and rule_rank < rank:
+                    rank = rule_rank
+                data = dict(payload) if payload else {}
+                if regex is not None:
+                    data.update(found.groupdict())
+                if not events:
+                    events = []
+                events.append((event, data))
+            m = scan.search(line, m.end())
+        if self._level_scan.search(line, start) is not None:
+            for rule_rank, anchor, regex in self._levels:
+                if rule_rank >= rank:
+                    break
+                if anchor in line and (regex is None or regex.search(line, start)):
+                    rank = rule_rank
+                    break
+        return _LEVEL_PRIORITY[rank], events
+
+
+LOG_CLASSIFIER = LogClassifier(LOG_RULES, LOG_DATA_PLANE_MARKS, LOG_DATA_PLANE_PREFIXES)
+
+
+def level_for_line(line):
+    return LOG_CLASSIFIER.classify(line)[0]
+
+
+class LogBuffer:
+    # Fixed-capacity ring of (seq, epoch, level index, message) tuples; seq is monotonic
+    # and maps to slot seq % capacity, so appends never copy and reads are O(returned).
+    # Only writers take the lock. A writer fills the slot before advancing _next_seq, so
+    # a reader that sees last_seq finds every record up to it; a slot the writer lapped
+    # in the meantime carries a newer seq and is dropped as truncation.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+    def append(self, level, message, ts=None):
+        record_ts = time.time() if ts is None else ts
+        with self._lock:
+            seq = self._next_seq
+            record = (seq, record_ts, _LEVEL_INDEX.get(level, 0), message)
+            self._slots[seq % self.capacity] = record
+            self._next_seq = seq + 1
+        return record
+
+    def last_seq(self):
+        return self._next_seq - 1
+
+    def _range(self, first, last):
+        slots = self._slots
+        cap = self.capacity
+        records = [slots[seq % cap] for seq in range(first, last + 1)]
+        # A reader preempted mid-copy can find lapped slots anywhere in the range, not
+        # just at the old end. Everything after the newest mismatch is contiguous up to
+        # `last`, so that suffix is returned and the rest reported as truncated.
+        for i in range(len(records) - 1, -1, -1):
+            if records[i][0] != first + i:
+                return records[i + 1:], True
+        return records, False
+
+    def since(self, seq=0, limit=None):
+        last = self._next_seq - 1
+        oldest = max(1, last - self.capacity + 1)
+        first = max(seq + 1, oldest)
+        if limit is not None and last - first + 1 > limit:
+            last = first + limit - 1
+        records, lapped = self._range(first, last)
+        return records, lapped or seq + 1 < oldest
+
+    def tail(self, n):
+        last = self._next_seq - 1
+        first = max(1, last - min(n, self.capacity) + 1)
+        return self._range(first, last)[0]
+
+
+@functools.lru_cache(maxsize=4096)
+def _clock(second):
+    # Log lines arrive in bursts within the same second; strftime is most of format_log.
+    return time.strftime("%H:%M:%S", time.localtime(second))
+
+
+def format_log(record):
+    seq, ts, level, message = record
+    return {
+        "seq": seq,
+        "timestamp": _clock(int(ts)),
+        "level": LOG_LEVELS[level],
+        "message": message,
+    }
+
+
+class LogArchive:
+    # Append-only JSON-lines log of every session on disk. Lines are handed to a writer
+    # thread through a bounded queue, so read_stream never waits on the filesystem (a full
+    # queue drops the line and counts it). The open segment is rotated by size and closed
+    # segments are gzipped; index.json keeps per-segment time bounds and per-session line
+    # and level counts, so a search only decompresses the segments that can match.
+
+    def __init__(self, root, segment_bytes=LOG_ARCHIVE_SEGMENT_BYTES, max_bytes=LOG_ARCHIVE_MAX_BYTES):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue = queue.Queue(LOG_ARCHIVE_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._segments = None
+        self._active = None
+        self._active_file = None
+
+    @property
+    def _active_path(self):
+        return self.root / "active.jsonl"
+
+    @property
+    def _index_path(self):
+        return self.root / "index.json"
+
+    def append(self, session, conn_id, record):
+        if not LOG_ARCHIVE_ENABLED:
+            return
+        if self._thread is None:
+            self._start()
+        _, ts, level, message = record
+        try:
+            self._queue.put_nowait((session, conn_id, ts, LOG_LEVELS[level], message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="vpn-log-archive", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=1.0):
+        # Lets a search see lines queued just before it: a marker goes in behind them and
+        # the writer sets it once everything ahead has been written. Lines queued later do
+        # not hold it up, and the wait is bounded so a busy disk cannot stall the request.
+        if self._thread is None:
+            return
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return
+        marker.wait(timeout)
+
+    @staticmethod
+    def _empty_entry(name):
+        return {"file": name, "start": None, "end": None, "lines": 0, "bytes": 0, "levels": {}, "sessions": {}}
+
+    @staticmethod
+    def _account(entry, session, conn_id, ts, level):
+        if entry["start"] is None:
+            entry["start"] = ts
+        entry["end"] = ts
+        entry["lines"] += 1
+        entry["levels"][level] = entry["levels"].get(level, 0) + 1
+        info = entry["sessions"].get(session)
+        if info is None:
+            info = entry["sessions"][session] = {"id": conn_id, "start": ts, "end": ts, "lines": 0, "levels": {}}
+        info["end"] = ts
+        info["lines"] += 1
+        info["levels"][level] = info["levels"].get(level, 0) + 1
+
+    def _scan_segment(self, path, name):
+        import gzip
+        entry = self._empty_entry(name)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                    self._account(entry, r["s"], r.get("id"), r["t"], r["l"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return entry
+
+    def _load(self):
+        # Called with _lock held. A crash can leave the index behind the segment files;
+        # segments missing from it are rescanned, and an active file left over from a
+        # previous run is closed like any other full segment.
+        if self._segments is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True, mode=0o700)
+        try:
+            with open(self._index_path) as f:
+                indexed = {e["file"]: e for e in json.load(f).get("segments", [])}
+        except (OSError, ValueError, AttributeError):
+            indexed = {}
+        segments = []
+        for path in sorted(self.root.glob("segment-*.jsonl.gz")):
+            entry = indexed.get(path.name)
+            if entry is None:
+                try:
+                    entry = self._scan_segment(path, path.name)
+                except (OSError, EOFError):
+                    continue
+            entry["bytes"] = path.stat().st_size
+            segments.append(entry)
+        self._segments = segments
+        if self._active_path.exists():
+            try:
+                self._active = self._scan_segment(self._active_path, self._active_path.name)
+            except OSError:
+                self._active = None
+            if self._active is not None and self._active["lines"]:
+                self._rotate()
+        if self._active is None:
+            self._active = self._empty_entry(self._active_path.name)
+        self._save_index()
+
+    def _save_index(self):
+        try:
+            write_json_atomic(self._index_path, {"segments": self._segments})
+        except OSError:
+            pass
+
+    def _rotate(self):
+        # Called with _lock held: gzips the active file into a numbered segment, records
+        # its index entry and drops the oldest segments over the size budget.
+        import gzip
+
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+        seq = int(self._segments[-1]["file"].split("-")[1].split(".")[0]) + 1 if self._segments else 1
+        name = f"segment-{seq:06d}.jsonl.gz"
+        dst = self.root / name
+        tmp = self.root / f".{name}.tmp"
+        with open(self._active_path, "rb") as src, open(tmp, "wb") as raw:
+            os.fchmod(raw.fileno(), 0o600)
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(src, gz, 1 << 16)
+        os.replace(tmp, dst)
+        os.unlink(self._active_path)
+        entry = self._active
+        entry["file"] = name
+        entry["bytes"] = dst.stat().st_size
+        self._segments.append(entry)
+        total = sum(e["bytes"] for e in self._segments)
+        while len(self._segments) > 1 and total > self.max_bytes:
+            old = self._segments.pop(0)
+            total -= old["bytes"]
+            try:
+                os.unlink(self.root / old["file"])
+            except OSError:
+                pass
+        self._active = self._empty_entry(self._active_path.name)
+        self._save_index()
+
+    def _write_batch(self, batch):
+        with self._lock:
+            try:
+                self._load()
+                if self._active_file is None:
+                    fd = os.open(self._active_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                    self._active_file = os.fdopen(fd, "a", encoding="utf-8")
+                lines = []
+                for session, conn_id, ts, level, message in batch:
+                    lines.append(json.dumps({"t": ts, "s": session, "id": conn_id, "l": level, "m": message}) + "\n")
+                    self._account(self._active, session, conn_id, ts, level)
+                self._active_file.write("".join(lines))
+                self._active_file.flush()
+                if self._active_file.tell() >= self.segment_bytes:
+                    self._rotate()
+            except OSError as e:
+                self.dropped += len(batch)
+                print(f"Log archive write failed: {e}", file=sys.stderr)
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 512:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            markers = [item for item in batch if isinstance(item, threading.Event)]
+            if markers:
+                batch = [item for item in batch if not isinstance(item, threading.Event)]
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.set()
+
+    @staticmethod
+    def _entry_matches(entry, session, levels, start, end):
+        if not entry["lines"]:
+            return False
+        if start is not None and entry["end"] < start:
+            return False
+        if end is not None and entry["start"] > end:
+            return False
+        scope = entry
+        if session is not None:
+            scope = entry["sessions"].get(session)
+            if scope is None:
+                return False
+        return not levels or any(scope["levels"].get(level) for level in levels)
+
+    def sessions(self):
+        with self._lock:
+            self._load()
+            merged = {}
+            for entry in [*self._segments, self._active]:
+                for sid, info in entry["sessions"].items():
+                    m = merged.get(sid)
+                    if m is None:
+                        merged[sid] = {"session": sid, "id": info.get("id"), "start": info["start"],
+                                       "end": info["end"], "lines": info["lines"], "levels": dict(info["levels"])}
+                        continue
+                    m["end"] = max(m["end"], info["end"])
+                    m["start"] = min(m["start"], info["start"])
+                    m["lines"] += info["lines"]
+                    for level, n in info["levels"].items():
+                        m["levels"][level] = m["levels"].get(level, 0) + n
+        return sorted(merged.values(), key=lambda m: m["start"], reverse=True)
+
+    def search(self, session=None, levels=(), text=None, start=None, end=None, limit=LOG_SEARCH_LIMIT):
+        # Returns the newest `limit` matching lines in time order. Segments are walked
+        # newest first and skipped outright when the index rules them out.
+        import gzip
+
+        self.flush()
+        with self._lock:
+            self._load()
+            if self._active_file is not None:
+                self._active_file.flush()
+            indexed = len(self._segments) + 1
+            candidates = [dict(e) for e in [*self._segments, self._active]
+                          if self._entry_matches(e, session, levels, start, end)]
+        needle = text.lower() if text else None
+        # Segment lines are JSON with non-ASCII, quotes, backslashes and control characters
+        # escaped, so the cheap raw-line check only works for needles JSON leaves alone.
+        raw_needle = needle if needle is not None and json.dumps(needle)[1:-1] == needle else None
+        levels = set(levels)
+        results = []
+        scanned = 0
+        for entry in reversed(candidates):
+            path = self.root / entry["file"]
+            opener = gzip.open if path.suffix == ".gz" else open
+            matches = []
+            try:
+                with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        if raw_needle is not None and raw_needle not in line.lower():
+                            continue
+                        try:
+                            r = json.loads(line)
+                        except ValueError:
+                            continue
+                        if session is not None and r.get("s") != session:
+                            continue
+                        if levels and r.get("l") not in levels:
+                            continue
+                        ts = r.get("t", 0)
+                        if (start is not None and ts < start) or (end is not None and ts > end):
+                            continue
+                        if needle is not None and needle not in r.get("m", "").lower():
+                            continue
+                        matches.append(r)
+            except (OSError, EOFError):
+                # Rotated or pruned while we were reading it.
+                continue
+            scanned += 1
+            results[:0] = matches
+            if len(results) >= limit:
+                break
+        truncated = len(results) > limit or (len(results) == limit and scanned < len(candidates))
+        results = results[-limit:] if limit else []
+        return {
+            "results": [
+                {"timestamp": r["t"], "session": r["s"], "id": r.get("id"), "level": r["l"], "message": r.get("m", "")}
+                for r in results
+            ],
+            "truncated": truncated,
+            "segments_scanned": scanned,
+            "segments_matched": len(candidates),
+            "segments_indexed": indexed,
+        }
+
+
+log_archive = LogArchive(LOG_ARCHIVE_DIR)
+
+
+def _dechunk(body):
+    out = b""
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2:]
+    return out
+
+
+async def _http_open(url, timeout, ssl_context=None):
+    # Returns (reader, writer, request path) for one HTTP/1.1 exchange with url.
+    parts = urllib.parse.urlsplit(url)
+    https = parts.scheme == "https"
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, parts.port or (443 if https else 80),
+                                ssl=(ssl_context or ssl.create_default_context()) if https else None),
+        timeout,
+    )
+    return reader, writer, path
+
+
+async def _http_get_text(url, timeout, ssl_context=None, limit=4096):
+    # Minimal HTTP/1.1 GET on the event loop for tiny text/plain answers; avoids parking
+    # a blocking urllib call in an executor thread per endpoint.
+    parts = urllib.parse.urlsplit(url)
+    reader, writer, path = await _http_open(url, timeout, ssl_context)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: vpn-connect\r\n"
+            f"Accept: text/plain\r\nConnection: close\r\n\r\n".encode()
+        )
+        raw = b""
+        while len(raw) < limit:
+            chunk = await asyncio.wait_for(reader.read(limit - len(raw)), timeout)
+            if not chunk:
+                break
+            raw += chunk
+    finally:
+        writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status = head.split(b"\r\n", 1)[0].split()
+    if len(status) < 2 or status[1] != b"200":
+        raise ValueError(f"{url}: unexpected response {head[:40]!r}")
+    if b"transfer-encoding: chunked" in head.lower():
+        body = _dechunk(body)
+    return body.decode("ascii", errors="replace").strip()
+
+
+class PublicIpService:
+    # Exit-IP lookups raced across several plain-text "what is my IP" endpoints; the first
+    # valid address wins. Answers are cached per remote server for a TTL, and concurrent
+    # lookups for the same remote share one race, so a reconnect storm costs at most one
+    # round of requests. Runs on io_loop.
+
+    def __init__(self, urls=PUBLIC_IP_URLS, ttl=PUBLIC_IP_TTL, timeout=PUBLIC_IP_TIMEOUT):
+        self.urls = list(urls)
+        self.ttl = ttl
+        self.timeout = timeout
+        self._cache = {}
+        self._inflight = {}
+        self._ssl = None
+
+    def cached(self, key):
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    async def lookup(self, key, refresh=False):
+        if not refresh:
+            ip = self.cached(key)
+            if ip is not None:
+                return ip
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._race())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        ip = await asyncio.shield(task)
+        if ip is not None:
+            self._cache[key] = (ip, time.monotonic() + self.ttl)
+        return ip
+
+    async def _fetch(self, url):
+        if self._ssl is None and url.startswith("https:"):
+            self._ssl = ssl.create_default_context()
+        text = await _http_get_text(url, self.timeout, self._ssl)
+        return str(ipaddress.ip_address(text.split()[0])) if text else None
+
+    async def _race(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        pending = {asyncio.create_task(self._fetch(url)) for url in self.urls}
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None and task.result():
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        return None
+
+
+public_ip_service = PublicIpService()
+
+
+async def _read_http_head(reader, url, timeout):
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    status = head.split(b"\r\n", 1)[0].split()
+    if len(status) < 2 or status[1] != b"200":
+        raise ValueError(f"{url}: unexpected response {head[:40]!r}")
+    return head
+
+
+class SpeedTest:
+    # One throughput/latency run against a Cloudflare-style endpoint (GET __down?bytes=N,
+    # POST __up): idle RTT first, then parallel download streams, then parallel upload
+    # streams, with TCP-connect RTT probes running under each load. Throughput counts
+    # bytes per progress interval; the sustained figure leaves out the first
+    # SPEEDTEST_WARMUP seconds of slow start. Runs on io_loop; progress goes out as
+    # "speedtest" events.
+
+    def __init__(self, job_id, url, streams, duration, conn=None):
+        self.id = job_id
+        self.url = url.rstrip("/")
+        self.streams = streams
+        self.duration = duration
+        self.status = "queued"
+        self.phase = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self.context = self._context(conn)
+        self.rtt = {"idle": [], "download": [], "upload": []}
+        self.intervals = {"download": [], "upload": []}
+        self.bytes = {"download": 0, "upload": 0}
+        self.cpu = None
+        self._deadline = 0
+        self._ssl = ssl.create_default_context() if self.url.startswith("https:") else None
+        parts = urllib.parse.urlsplit(self.url)
+        self._probe_addr = (parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+    @staticmethod
+    def _context(conn):
+        # What the tunnel was running with, so runs over UDP vs TCP remotes or different
+        # ciphers can be compared side by side.
+        if conn is None:
+            return None
+        fields = conn.status_fields()
+        config = conn.config
+        return {
+            "id": conn.id,
+            "config_name": fields["config_name"],
+            "remote": list(conn.remote) if conn.remote else None,
+            "proto": config.proto if config else None,
+            "encryption": fields["encryption"],
+        }
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(*self._probe_addr), SPEEDTEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        rtt = (loop.time() - start) * 1000
+        writer.close()
+        return rtt
+
+    async def _probe_loop(self, phase):
+        while True:
+            rtt = await self._probe()
+            if rtt is not None:
+                self.rtt[phase].append(rtt)
+            await asyncio.sleep(SPEEDTEST_PROBE_INTERVAL)
+
+    async def _download(self):
+        loop = asyncio.get_running_loop()
+        url = f"{self.url}/__down?bytes={SPEEDTEST_DOWN_BYTES}"
+        while loop.time() < self._deadline:
+            reader, writer, path = await _http_open(url, SPEEDTEST_TIMEOUT, self._ssl)
+            try:
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {self._probe_addr[0]}\r\nUser-Agent: vpn-connect\r\n"
+                    f"Accept-Encoding: identity\r\nConnection: close\r\n\r\n".encode()
+                )
+                await _read_http_head(reader, url, SPEEDTEST_TIMEOUT)
+                while loop.time() < self._deadline:
+                    chunk = await asyncio.wait_for(reader.read(1 << 16), SPEEDTEST_TIMEOUT)
+                    if not chunk:
+                        break
+                    self.bytes["download"] += len(chunk)
+            finally:
+                writer.close()
+
+    async def _upload(self):
+        loop = asyncio.get_running_loop()
+        url = f"{self.url}/__up"
+        block = os.urandom(1 << 16)
+        while loop.time() < self._deadline:
+            reader, writer, path = await _http_open(url, SPEEDTEST_TIMEOUT, self._ssl)
+            try:
+                writer.write(
+                    f"POST {path} HTTP/1.1\r\nHost: {self._probe_addr[0]}\r\nUser-Agent: vpn-connect\r\n"
+                    f"Content-Type: application/octet-stream\r\nContent-Length: {SPEEDTEST_UP_BYTES}\r\n"
+                    f"Connection: close\r\n\r\n".encode()
+                )
+                sent = 0
+                while sent < SPEEDTEST_UP_BYTES and loop.time() < self._deadline:
+                    n = min(len(block), SPEEDTEST_UP_BYTES - sent)
+                    writer.write(block[:n])
+                    await asyncio.wait_for(writer.drain(), SPEEDTEST_TIMEOUT)
+                    sent += n
+                    self.bytes["upload"] += n
+                if sent == SPEEDTEST_UP_BYTES:
+                    await _read_http_head(reader, url, SPEEDTEST_TIMEOUT)
+            finally:
+                writer.close()
+
+    async def _phase(self, phase, stream):
+        loop = asyncio.get_running_loop()
+        self.phase = phase
+        start = loop.time()
+        self._deadline = start + self.duration
+        tasks = [asyncio.create_task(stream()) for _ in range(self.streams)]
+        probes = asyncio.create_task(self._probe_loop(phase))
+        last_bytes = 0
+        last = start
+        try:
+            while loop.time() < self._deadline:
+                done = [t for t in tasks if t.done()]
+                for t in done:
+                    if t.exception() is not None:
+                        raise t.exception()
+                if len(done) == len(tasks):
+                    break
+                await asyncio.sleep(SPEEDTEST_PROGRESS_INTERVAL)
+                now = loop.time()
+                total = self.bytes[phase]
+                mbps = 8 * (total - last_bytes) / (now - last) / 1e6
+                self.intervals[phase].append((now - start, mbps))
+                last_bytes, last = total, now
+                publish("speedtest", self.progress(mbps))
+        finally:
+            # Streams also watch the deadline: on 3.11 wait_for can swallow a cancel that
+            # races a completed read, and a busy stream would then run to the end.
+            self._deadline = 0
+            probes.cancel()
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(probes, *tasks, return_exceptions=True)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.status = "running"
+        self.started_at = time.time()
+        cpu_start = os.times()
+        wall_start = loop.time()
+        try:
+            self.phase = "idle"
+            for _ in range(SPEEDTEST_IDLE_PROBES):
+                rtt = await self._probe()
+                if rtt is not None:
+                    self.rtt["idle"].append(rtt)
+                await asyncio.sleep(SPEEDTEST_PROBE_INTERVAL / 2)
+            if not self.rtt["idle"]:
+                raise OSError(f"{self._probe_addr[0]}:{self._probe_addr[1]} is not reachable")
+            publish("speedtest", self.progress())
+            await self._phase("download", self._download)
+            await self._phase("upload", self._upload)
+            self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            self.status = "failed"
+            self.error = str(e) or type(e).__name__
+        finally:
+            cpu_end = os.times()
+            wall = loop.time() - wall_start
+            cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+            moved = (self.bytes["download"] + self.bytes["upload"]) / 1e6
+            self.cpu = {
+                "seconds": round(cpu, 3),
+                "percent": round(100 * cpu / wall, 1) if wall > 0 else None,
+                "ms_per_mb": round(1000 * cpu / moved, 2) if moved else None,
+            }
+            self.phase = None
+            self.finished_at = time.time()
+            publish("speedtest", self.to_dict())
+
+    def progress(self, mbps=None):
+        rtts = self.rtt.get(self.phase) or []
+        return {
+            "job": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "mbps": round(mbps, 2) if mbps is not None else None,
+            "rtt_ms": round(rtts[-1], 1) if rtts else None,
+        }
+
+    @staticmethod
+    def _rtt_summary(values):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return {
+            "samples": len(ordered),
+            "p50_ms": round(_percentile(ordered, 0.5), 1),
+            "p90_ms": round(_percentile(ordered, 0.9), 1),
+            "max_ms": round(ordered[-1], 1),
+        }
+
+    def _throughput(self, phase):
+        intervals = self.intervals[phase]
+        if not intervals:
+            return None
+        steady = [m for t, m in intervals if t > SPEEDTEST_WARMUP] or [m for _, m in intervals]
+        return {
+            "mbps": round(sum(steady) / len(steady), 2),
+            "peak_mbps": round(max(m for _, m in intervals), 2),
+            "bytes": self.bytes[phase],
+        }
+
+    def to_dict(self):
+        rtt = {phase: self._rtt_summary(values) for phase, values in self.rtt.items()}
+        idle = rtt["idle"]["p50_ms"] if rtt["idle"] else None
+        bloat = {
+            phase: round(rtt[phase]["p50_ms"] - idle, 1) if idle is not None and rtt[phase] else None
+            for phase in ("download", "upload")
+        }
+        return {
+            "job": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "error": self.error,
+            "url": self.url,
+            "streams": self.streams,
+            "duration": self.duration,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "connection": self.context,
+            "download": self._throughput("download"),
+            "upload": self._throughput("upload"),
+            "rtt": rtt,
+            "bufferbloat_ms": bloat,
+            "cpu": self.cpu,
+        }
+
+
+class SpeedTests:
+    # At most one test at a time (parallel runs would measure each other); finished runs
+    # are kept for comparison.
+
+    def __init__(self, history=SPEEDTEST_HISTORY):
+        self._lock = threading.Lock()
+        self._jobs = deque(maxlen=history)
+        self._next_id = 1
+        self.current = None
+
+    def start(self, url, streams, duration, conn=None):
+        with self._lock:
+            if self.current is not None and self.current.status in ("queued", "running"):
+                return None
+            job = SpeedTest(str(self._next_id), url, streams, duration, conn)
+            self._next_id += 1
+            self._jobs.append(job)
+            self.current = job
+        io_loop.submit(job.run())
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def cancel(self, job):
+        task = job.task
+        if task is not None and not task.done():
+            io_loop.call(task.cancel)
+            return True
+        return False
+
+
+speed_tests = SpeedTests()
+
+
+# Directives whose argument names a file openvpn must read (relative to the profile's
+# directory), unless the material is inlined as a <tag> block or given as "[inline]".
+_CONFIG_FILE_DIRECTIVES = ("ca", "cert", "key", "pkcs12", "tls-auth", "tls-crypt", "tls-crypt-v2", "secret")
+_TLS_WRAP_DIRECTIVES = ("tls-auth", "tls-crypt", "tls-crypt-v2")
+
+
+def _split_directive(line):
+    # openvpn accepts quoted and backslash-escaped arguments ('ca "my ca.crt"'); plain
+    # lines, by far the common case, skip the slower shlex pass. An unbalanced quote
+    # falls back to whitespace splitting rather than dropping the line.
+    if '"' not in line and "'" not in line and "\\" not in line:
+        return line.split()
+    try:
+        return shlex.split(line)
+    except ValueError:
+        return line.split()
+
+
+class OvpnConfig:
+    # The parts of a .ovpn profile the backend looks at, parsed once per file version.
+
+    def __init__(self, path):
+        self.path = path
+        self.remotes = []
+        self.proto = "udp"
+        self.port = DEFAULT_OPENVPN_PORT
+        self.dev = None
+        self.cipher = None
+        self.data_ciphers = []
+        self.auth = None
+        self.inline = {}
+        self.files = {}
+        self.connection_blocks = 0
+        self.remote_random = False
+
+    @classmethod
+    def parse(cls, path, text):
+        config = cls(path)
+        remotes = []
+        block = None
+        body = []
+        for line in text.splitlines():
+            parts = _split_directive(line)
+            if not parts or parts[0][0] in "#;":
+                if block is not None:
+                    body.append(line)
+                continue
+            key = parts[0]
+            if block is not None:
+                if key == f"</{block}>":
+                    if block == "connection":
+                        config.connection_blocks += 1
+                    else:
+                        config.inline[block] = "\n".join(body).strip() + "\n"
+                    block = None
+                elif block == "connection" and key == "remote" and len(parts) >= 2:
+                    remotes.append(parts[1:4])
+                else:
+                    body.append(line)
+                continue
+            if key.startswith("<") and key.endswith(">"):
+                block = key[1:-1]
+                body = []
+            elif key == "remote" and len(parts) >= 2:
+                remotes.append(parts[1:4])
+            elif key == "remote-random":
+                config.remote_random = True
+            elif key in ("port", "rport") and len(parts) >= 2 and parts[1].isdigit():
+                config.port = int(parts[1])
+            elif key == "proto" and len(parts) >= 2:
+                config.proto = parts[1]
+            elif key == "dev" and len(parts) >= 2:
+                config.dev = parts[1]
+            elif key == "cipher" and len(parts) >= 2:
+                config.cipher = parts[1]
+            elif key in ("data-ciphers", "ncp-ciphers") and len(parts) >= 2:
+                config.data_ciphers = [c for c in parts[1].split(":") if c]
+            elif key == "auth" and len(parts) >= 2:
+                config.auth = parts[1]
+            elif key in _CONFIG_FILE_DIRECTIVES and len(parts) >= 2 and parts[1] != "[inline]":
+                config.files[key] = parts[1]
+        for remote in remotes:
+            host = remote[0]
+            port = int(remote[1]) if len(remote) >= 2 and remote[1].isdigit() else config.port
+            proto = remote[2] if len(remote) >= 3 else config.proto
+            config.remotes.append((host, port, proto))
+        return config
+
+    @property
+    def raceable(self):
+        # <connection> blocks and remote-random leave remote selection to openvpn.
+        return not self.connection_blocks and not self.remote_random
+
+    @property
+    def tls_wrapped(self):
+        # tls-auth/tls-crypt servers drop any control packet without the right HMAC, so a
+        # UDP hard-reset probe can never get an answer from them.
+        return any(key in self.inline or key in self.files for key in _TLS_WRAP_DIRECTIVES)
+
+    @property
+    def encryption(self):
+        # Best guess before the handshake; the negotiated cipher replaces it once known.
+        if self.data_ciphers:
+            return self.data_ciphers[0]
+        return self.cipher or DEFAULT_CIPHER
+
+    def ping_target(self):
+        if not self.remotes:
+            return None
+        host, port, _ = self.remotes[0]
+        return (host, port)
+
+    def problems(self):
+        out = []
+        if not self.remotes:
+            out.append("Profile has no remote server.")
+        base = os.path.dirname(os.path.abspath(self.path))
+        for key, name in self.files.items():
+            if key not in self.inline and not os.path.isfile(os.path.join(base, name)):
+                out.append(f"File for '{key}' not found: {name}")
+        return out
+
+
+class ConfigCache:
+    # Parsed profiles keyed by path; a profile is re-read only when its inode, mtime or
+    # size change.
+
+    def __init__(self, maxsize=CONFIG_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.maxsize = maxsize
+
+    def get(self, path):
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                config = OvpnConfig.parse(path, f.read())
+        except OSError:
+            return None
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = (stamp, config)
+            while len(self._entries) > self.maxsize:
+                del self._entries[next(iter(self._entries))]
+        return config
+
+
+config_cache = ConfigCache()
+
+
+# P_CONTROL_HARD_RESET_CLIENT_V2 (opcode 7, key id 0), a random session id, an empty ack
+# array and message packet id 0. A server without tls-auth/tls-crypt answers it with its
+# own hard reset; one with them drops it silently.
+def _udp_reset_probe():
+    return bytes([7 << 3]) + os.urandom(8) + b"\x00" + b"\x00\x00\x00\x00"
+
+
+async def _probe_remote(result, timeout, answered):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    proto = result["proto"]
+    udp = proto.startswith("udp")
+    family = socket.AF_INET6 if proto[3:4] == "6" else socket.AF_INET if proto[3:4] == "4" else 0
+    kind = socket.SOCK_DGRAM if udp else socket.SOCK_STREAM
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(result["host"], result["port"], family=family, type=kind), timeout)
+        info = infos[0]
+    except (OSError, UnicodeError, IndexError):
+        result["state"] = "unresolved"
+        return
+    remaining = timeout - (loop.time() - start)
+    if remaining <= 0:
+        return
+    sock = socket.socket(info[0], kind)
+    sock.setblocking(False)
+    try:
+        if udp:
+            # Connected UDP socket: an ICMP port-unreachable surfaces as a refused recv.
+            sock.connect(info[4])
+            sent = time.perf_counter()
+            sock.send(_udp_reset_probe())
+            result["state"] = "silent"
+            try:
+                await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+            except asyncio.TimeoutError:
+                return
+        else:
+            sent = time.perf_counter()
+            await asyncio.wait_for(loop.sock_connect(sock, info[4]), remaining)
+        result["rtt_ms"] = round((time.perf_counter() - sent) * 1000.0, 1)
+        result["state"] = "reachable"
+        answered.set()
+    except ConnectionRefusedError:
+        result["state"] = "refused"
+    except OSError:
+        result["state"] = "unreachable"
+    finally:
+        sock.close()
+
+
+_RACE_RANK = {"reachable": 0, "silent": 1, "pending": 2, "unreachable": 2, "refused": 3, "unresolved": 3}
+
+
+async def race_remotes(remotes, timeout=REMOTE_RACE_TIMEOUT):
+    # Probes all remotes at once and ranks them: answered probes by RTT, then UDP remotes
+    # that stayed silent (likely tls-auth), then the dead ones, each group in config order.
+    # The first answer is by definition the fastest, so the race only waits a short grace
+    # after it instead of the whole deadline.
+    loop = asyncio.get_running_loop()
+    results = [
+        {"host": host, "port": port, "proto": proto, "state": "pending", "rtt_ms": None}
+        for host, port, proto in remotes
+    ]
+    answered = asyncio.Event()
+    probes = [asyncio.create_task(_probe_remote(r, timeout, answered)) for r in results]
+    waiter = asyncio.create_task(answered.wait())
+    deadline = loop.time() + timeout
+    pending = set(probes)
+    try:
+        while pending and not answered.is_set():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            _, pending = await asyncio.wait(pending | {waiter}, timeout=remaining,
+                                            return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(waiter)
+        if answered.is_set() and pending:
+            await asyncio.wait(pending, timeout=min(REMOTE_RACE_GRACE, max(0.0, deadline - loop.time())))
+    finally:
+        waiter.cancel()
+        for task in probes:
+            task.cancel()
+    ranked = [dict(r) for r in results]
+    ranked.sort(key=lambda r: (_RACE_RANK[r["state"]], r["rtt_ms"] or 0.0))
+    return ranked
+
+
+def _reconnect_delay(failures):
+    # Capped exponential backoff with jitter over its upper half, so the first retry comes
+    # back within a second and tunnels dropped together do not all retry in lockstep.
+    ceiling = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** max(0, failures - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ConnectAttempt:
+    # First-seen timestamp of every setup phase of one attempt; a phase's duration is the
+    # time since the previous phase that was reached, in CONNECT_PHASES order.
+
+    def __init__(self, conn_id, started_at):
+        self.conn_id = conn_id
+        self.started_at = started_at
+        self.finished_at = None
+        self.outcome = None
+        self.phases = {}
+        self.remotes = None
+
+    def mark(self, phase, ts):
+        if self.finished_at is None and phase not in self.phases:
+            self.phases[phase] = ts
+
+    def finish(self, outcome, ts):
+        if self.finished_at is not None:
+            return False
+        self.finished_at = ts
+        self.outcome = outcome
+        return True
+
+    def durations(self):
+        out = []
+        prev = self.started_at
+        for phase in CONNECT_PHASES:
+            ts = self.phases.get(phase)
+            if ts is None:
+                continue
+            out.append((phase, ts - self.started_at, max(0.0, ts - prev)))
+            prev = max(prev, ts)
+        return out
+
+    def to_dict(self):
+        completed = self.phases.get("completed")
+        return {
+            "connection": self.conn_id,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "outcome": self.outcome,
+            "total_seconds": round(completed - self.started_at, 3) if completed else None,
+            "phases": [
+                {"phase": phase, "at": round(at, 3), "duration": round(duration, 3)}
+                for phase, at, duration in self.durations()
+            ],
+            "remotes": self.remotes,
+        }
+
+
+class ConnectTimings:
+    def __init__(self, maxlen=CONNECT_TIMING_HISTORY):
+        self._lock = threading.Lock()
+        self._attempts = deque(maxlen=maxlen)
+
+    def add(self, attempt):
+        with self._lock:
+            self._attempts.append(attempt)
+
+    def recent(self, limit=None):
+        with self._lock:
+            attempts = list(self._attempts)
+        if limit is not None:
+            attempts = attempts[-limit:] if limit > 0 else []
+        return [a.to_dict() for a in attempts]
+
+    def summary(self):
+        with self._lock:
+            attempts = [a for a in self._attempts if a.outcome == "connected"]
+        per_phase = {}
+        totals = []
+        for attempt in attempts:
+            for phase, at, duration in attempt.durations():
+                per_phase.setdefault(phase, []).append(duration)
+                if phase == "completed":
+                    totals.append(at)
+
+        def stats(values):
+            ordered = sorted(values)
+            return {
+                "count": len(ordered),
+                "p50": round(_percentile(ordered, 0.50), 3),
+                "p90": round(_percentile(ordered, 0.90), 3),
+                "p99": round(_percentile(ordered, 0.99), 3),
+            }
+
+        return {
+            "attempts": len(attempts),
+            "total": stats(totals) if totals else None,
+            "phases": {phase: stats(per_phase[phase]) for phase in CONNECT_PHASES if phase in per_phase},
+        }
+
+
+connect_timings = ConnectTimings()
+
+
+class Teardown:
+    # One disconnect of one tunnel: which escalation stages ran, when each started and how
+    # long the child took to exit after it, all in ms from the request.
+
+    def __init__(self, job_id, conn_id):
+        self.id = job_id
+        self.conn_id = conn_id
+        self.requested_at = time.time()
+        self._start = time.monotonic()
+        self.stages = []
+        self.outcome = None
+        self.exit_code = None
+        self.total_ms = None
+
+    def elapsed_ms(self):
+        return round((time.monotonic() - self._start) * 1000, 1)
+
+    def finish(self, outcome, exit_code=None):
+        self.outcome = outcome
+        self.exit_code = exit_code
+        self.total_ms = self.elapsed_ms()
+
+    def to_dict(self):
+        return {
+            "job": self.id,
+            "id": self.conn_id,
+            "requested_at": self.requested_at,
+            "done": self.outcome is not None,
+            "outcome": self.outcome,
+            "exit_code": self.exit_code,
+            "total_ms": self.total_ms,
+            "stages": list(self.stages),
+        }
+
+
+class Teardowns:
+    def __init__(self, maxlen=TEARDOWN_HISTORY):
+        self._lock = threading.Lock()
+        self._jobs = deque(maxlen=maxlen)
+        self._next_id = 1
+
+    def new(self, conn_id):
+        with self._lock:
+            job = Teardown(str(self._next_id), conn_id)
+            self._next_id += 1
+            self._jobs.append(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def recent(self, limit=None):
+        with self._lock:
+            jobs = list(self._jobs)
+        if limit is not None:
+            jobs = jobs[-limit:] if limit > 0 else []
+        return [j.to_dict() for j in jobs]
+
+    def summary(self):
+        with self._lock:
+            jobs = [j for j in self._jobs if j.outcome == "exited"]
+        totals = sorted(j.total_ms for j in jobs)
+        by_stage = {}
+        for j in jobs:
+            by_stage[j.stages[-1]["stage"]] = by_stage.get(j.stages[-1]["stage"], 0) + 1
+        return {
+            "teardowns": len(jobs),
+            "total_ms": {
+                "p50": _percentile(totals, 0.50),
+                "p90": _percentile(totals, 0.90),
+                "p99": _percentile(totals, 0.99),
+            } if totals else None,
+            "exited_after": by_stage,
+        }
+
+
+teardowns = Teardowns()
+
+
+def _phase_for_event(event, data):
+    if event in ("remote", "tls"):
+        return _LOG_PHASES.get(data.get("phase"))
+    if event == "push_reply":
+        return "push_reply"
+    if event in ("tun_opened", "ifconfig"):
+        return "ifconfig"
+    return None
+
+
+def _icmp_checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class LatencyProber:
+    # Measures RTT without forking ping: an unprivileged ICMP datagram socket when the kernel
+    # allows it (net.ipv4.ping_group_range), otherwise TCP connect timing to the remote port.
+    # A refused connect still costs exactly one round trip, so it counts as a valid sample.
+
+    def __init__(self, host, port=DEFAULT_OPENVPN_PORT, window=PING_WINDOW, timeout=PING_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.samples = deque(maxlen=window)
+        self.method = None
+        self._addr = None
+        self._icmp = None
+        self._icmp_seq = 0
+        self.summary = self._summarize()
+
+    async def _resolve(self):
+        if self._addr is None:
+            loop = asyncio.get_running_loop()
+            info = (await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM))[0]
+            self._addr = (info[0], info[4])
+        return self._addr
+
+    def _open_icmp(self, family):
+        proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+        try:
+            sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+        except OSError:
+            return False
+        sock.setblocking(False)
+        return sock
+
+    async def _probe_icmp(self, family, addr):
+        loop = asyncio.get_running_loop()
+        self._icmp_seq = (self._icmp_seq + 1) & 0xFFFF
+        seq = self._icmp_seq
+        echo_type, reply_type = (128, 129) if family == socket.AF_INET6 else (8, 0)
+        payload = struct.pack("!d", time.time())
+        header = struct.pack("!BBHHH", echo_type, 0, 0, 0, seq)
+        packet = struct.pack("!BBHHH", echo_type, 0, _icmp_checksum(header + payload), 0, seq) + payload
+        start = time.perf_counter()
+        self._icmp.sendto(packet, (addr[0], 0))
+        deadline = start + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            try:
+                data = await asyncio.wait_for(loop.sock_recv(self._icmp, 1024), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if len(data) >= 8 and data[0] == reply_type and struct.unpack("!H", data[6:8])[0] == seq:
+                return (time.perf_counter() - start) * 1000.0
+
+    async def _probe_tcp(self, family, addr):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, addr), self.timeout)
+        except ConnectionRefusedError:
+            pass
+        except OSError:
+            return None
+        finally:
+            sock.close()
+        return (time.perf_counter() - start) * 1000.0
+
+    async def probe(self):
+        rtt = None
+        try:
+            family, addr = await self._resolve()
+            if self._icmp is None:
+                self._icmp = self._open_icmp(family)
+            if self._icmp:
+                self.method = "icmp"
+                rtt = await self._probe_icmp(family, addr)
+            else:
+                self.method = "tcp"
+                rtt = await self._probe_tcp(family, addr)
+        except OSError:
+            rtt = None
+        self.samples.append(rtt)
+        self.summary = self._summarize()
+        return rtt
+
+    def _summarize(self):
+        samples = list(self.samples)
+        rtts = [r for r in samples if r is not None]
+        summary = {
+            "method": self.method,
+            "target": self.host if self.method == "icmp" else f"{self.host}:{self.port}",
+            "samples": len(samples),
+            "loss_pct": round(100.0 * (len(samples) - len(rtts)) / len(samples), 1) if samples else None,
+            "last_ms": round(samples[-1], 1) if samples and samples[-1] is not None else None,
+            "min_ms": None,
+            "avg_ms": None,
+            "p95_ms": None,
+            "jitter_ms": None,
+        }
+        if rtts:
+            ordered = sorted(rtts)
+            summary["min_ms"] = round(ordered[0], 1)
+            summary["avg_ms"] = round(sum(rtts) / len(rtts), 1)
+            summary["p95_ms"] = round(_percentile(ordered, 0.95), 1)
+            if len(rtts) > 1:
+                diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+                summary["jitter_ms"] = round(sum(diffs) / len(diffs), 1)
+        return summary
+
+    def close(self):
+        if self._icmp:
+            try:
+                self._icmp.close()
+            except OSError:
+                pass
+        self._icmp = None
+
+
+_RTM_NEWLINK = 16
+_RTM_GETLINK = 18
+_NLMSG_ERROR = 2
+_NLM_F_REQUEST = 1
+_IFLA_IFNAME = 3
+_IFLA_OPERSTATE = 16
+_IFLA_STATS64 = 23
+_IF_OPER_DOWN = 2
+_IFF_UP = 0x1
+LINK_STAT_FIELDS = (
+    "rx_packets", "tx_packets", "rx_bytes", "tx_bytes", "rx_errors", "tx_errors", "rx_dropped", "tx_dropped",
+)
+
+
+def _read_sysfs_stats(dev):
+    base = f"{SYSFS_NET_DIR or '/sys/class/net'}/{dev}"
+    stats = {}
+    try:
+        for name in LINK_STAT_FIELDS:
+            with open(f"{base}/statistics/{name}") as f:
+                stats[name] = int(f.read())
+        with open(f"{base}/operstate") as f:
+            stats["up"] = f.read().strip() != "down"
+    except (OSError, ValueError):
+        return None
+    return stats
+
+
+class LinkStatsReader:
+    # Counters of one named interface over RTNETLINK: a single RTM_GETLINK request by name
+    # returns IFLA_STATS64 and the link state in one reply, instead of a file read per
+    # counter. Falls back to that interface's sysfs directory when netlink is unavailable.
+    # Returns None when the interface does not exist. A VPN_CONNECT_SYSFS_NET tree is read
+    # directly, since its interfaces are not known to the kernel. Runs on io_loop: the
+    # netlink socket is non-blocking, so a slow reply never stalls the loop.
+
+    def __init__(self):
+        self._sock = None
+        self._seq = 0
+        self.method = None
+
+    def _open(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, 0))
+            sock.setblocking(False)
+        except (OSError, AttributeError):
+            return False
+        return sock
+
+    async def read(self, dev):
+        if self._sock is None:
+            self._sock = not SYSFS_NET_DIR and self._open()
+        if self._sock:
+            try:
+                stats = await asyncio.wait_for(self._read_netlink(dev), LINK_STATS_TIMEOUT)
+                self.method = "netlink"
+                return stats
+            except (OSError, struct.error, asyncio.TimeoutError):
+                self.close()
+                self._sock = False
+        self.method = "sysfs"
+        return _read_sysfs_stats(dev)
+
+    async def _read_netlink(self, dev):
+        loop = asyncio.get_running_loop()
+        name = dev.encode() + b"\0"
+        attr = struct.pack("=HH", 4 + len(name), _IFLA_IFNAME) + name
+        attr += b"\0" * (-len(attr) % 4)
+        body = struct.pack("=BxHiII", socket.AF_UNSPEC, 0, 0, 0, 0) + attr
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        await loop.sock_sendall(
+            self._sock, struct.pack("=IHHII", 16 + len(body), _RTM_GETLINK, _NLM_F_REQUEST, self._seq, 0) + body
+        )
+        while True:
+            data = await loop.sock_recv(self._sock, 65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                length, msg_type, _, seq, _ = struct.unpack_from("=IHHII", data, offset)
+                if length < 16:
+                    break
+                if seq == self._seq:
+                    if msg_type == _NLMSG_ERROR:
+                        err = -struct.unpack_from("=i", data, offset + 16)[0]
+                        if err == errno.ENODEV:
+                            return None
+                        raise OSError(err, os.strerror(err))
+                    if msg_type == _RTM_NEWLINK:
+                        return self._parse_link(data, offset, length)
+                offset += (length + 3) & ~3
+
+    def _parse_link(self, data, offset, length):
+        flags = struct.unpack_from("=BxHiII", data, offset + 16)[3]
+        stats = {"up": bool(flags & _IFF_UP)}
+        end = offset + length
+        pos = offset + 32
+        while pos + 4 <= end:
+            attr_len, attr_type = struct.unpack_from("=HH", data, pos)
+            if attr_len < 4:
+                break
+            attr_type &= 0x3FFF
+            if attr_type == _IFLA_STATS64:
+                stats.update(zip(LINK_STAT_FIELDS, struct.unpack_from("=8Q", data, pos + 4)))
+            elif attr_type == _IFLA_OPERSTATE and data[pos + 4] == _IF_OPER_DOWN:
+                stats["up"] = False
+            pos += (attr_len + 3) & ~3
+        if "rx_bytes" not in stats:
+            raise OSError(errno.EPROTO, "RTM_NEWLINK without IFLA_STATS64")
+        return stats
+
+    def close(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+
+class ManagementClient:
+    # Client for openvpn's --management unix socket; turns >STATE, >BYTECOUNT and >LOG
+    # real-time notifications into callbacks so nothing has to be scraped from stdout.
+    # Lives on io_loop; command() may be called from any thread.
+
+    def __init__(self, path, on_state=None, on_bytecount=None, on_log=None):
+        self.path = path
+        self.on_state = on_state
+        self.on_bytecount = on_bytecount
+        self.on_log = on_log
+        self.pid = None
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, timeout=MANAGEMENT_CONNECT_TIMEOUT, alive=None):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if alive is not None and not alive():
+                return False
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(0.05)
+                continue
+            return True
+        return False
+
+    def command(self, cmd):
+        writer = self.writer
+        if writer is None or writer.is_closing():
+            return False
+        io_loop.call(writer.write, (cmd + "\n").encode())
+        return True
+
+    def subscribe(self, bytecount_interval=MANAGEMENT_BYTECOUNT_INTERVAL, log=False):
+        self.command("pid")
+        self.command("state on all")
+        if bytecount_interval:
+            self.command(f"bytecount {int(bytecount_interval)}")
+        if log:
+            self.command("log on")
+
+    def handle_line(self, line):
+        if line.startswith(">STATE:"):
+            fields = line[7:].split(",")
+        elif line.startswith(">BYTECOUNT:"):
+            rx, _, tx = line[11:].partition(",")
+            if self.on_bytecount:
+                try:
+                    self.on_bytecount(int(rx), int(tx))
+                except ValueError:
+                    pass
+            return
+        elif line.startswith(">LOG:"):
+            if self.on_log:
+                parts = line[5:].split(",", 2)
+                if len(parts) == 3:
+                    self.on_log(parts[2], parts[1])
+            return
+        elif line.startswith("SUCCESS: pid="):
+            try:
+                self.pid = int(line[13:])
+            except ValueError:
+                pass
+            return
+        elif line[:1].isdigit() and "," in line:
+            # History records replayed by "state on all" have no >STATE: prefix.
+            fields = line.split(",")
+            if len(fields) < 3 or not fields[1].isupper():
+                return
+        else:
+            return
+        if self.on_state and len(fields) >= 2:
+            fields += [""] * (9 - len(fields))
+            self.on_state(fields[1], fields[2], fields[3], fields[4], fields[5])
+
+    async def run(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                self.handle_line(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        writer, self.writer = self.writer, None
+        self.reader = None
+        if writer is not None:
+            writer.close()
+
+
+class Metrics:
+    # Counters for the /metrics exposition. Byte and log-line totals of live tunnels are read
+    # from the connections themselves at scrape time; retire() folds a finished tunnel's
+    # totals in under the same lock, so the exported counters never go backwards.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(METRIC_COUNTERS, 0)
+        self.retired_rx_bytes = 0
+        self.retired_tx_bytes = 0
+        self.retired_log_lines = 0
+        self.handshake_buckets = [0] * len(HANDSHAKE_BUCKETS)
+        self.handshake_sum = 0.0
+        self.handshake_count = 0
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe_handshake(self, seconds):
+        with self._lock:
+            for i, bound in enumerate(HANDSHAKE_BUCKETS):
+                if seconds <= bound:
+                    self.handshake_buckets[i] += 1
+            self.handshake_sum += seconds
+            self.handshake_count += 1
+
+    def retire(self, conn):
+        with self._lock:
+            self.retired_rx_bytes += conn.rx_bytes
+            self.retired_tx_bytes += conn.tx_bytes
+            self.retired_log_lines += conn.logs.last_seq()
+            conn.done.set()
+
+    def render(self):
+        with self._lock:
+            active = connections.active()
+            counters = dict(self.counters)
+            rx_total = self.retired_rx_bytes + sum(c.rx_bytes for c in active)
+            tx_total = self.retired_tx_bytes + sum(c.tx_bytes for c in active)
+            log_lines = self.retired_log_lines + sum(c.logs.last_seq() for c in active)
+            buckets = list(self.handshake_buckets)
+            handshake_sum = self.handshake_sum
+            handshake_count = self.handshake_count
+
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        family("vpn_connect_tunnel_rx_bytes_total", "counter", "Bytes received through our tunnels.")
+        out.append(f"vpn_connect_tunnel_rx_bytes_total {rx_total}")
+        family("vpn_connect_tunnel_tx_bytes_total", "counter", "Bytes sent through our tunnels.")
+        out.append(f"vpn_connect_tunnel_tx_bytes_total {tx_total}")
+        for name, help_text in METRIC_COUNTERS.items():
+            family(f"vpn_connect_{name}_total", "counter", help_text)
+            out.append(f"vpn_connect_{name}_total {counters[name]}")
+        family("vpn_connect_log_lines_total", "counter", "openvpn output lines ingested.")
+        out.append(f"vpn_connect_log_lines_total {log_lines}")
+
+        family("vpn_connect_handshake_seconds", "histogram", "Time from connect to Initialization Sequence Completed.")
+        for bound, count in zip(HANDSHAKE_BUCKETS, buckets):
+            out.append(f'vpn_connect_handshake_seconds_bucket{{le="{bound:g}"}} {count}')
+        out.append(f'vpn_connect_handshake_seconds_bucket{{le="+Inf"}} {handshake_count}')
+        out.append(f"vpn_connect_handshake_seconds_sum {handshake_sum:.6f}")
+        out.append(f"vpn_connect_handshake_seconds_count {handshake_count}")
+
+        family("vpn_connect_tunnels_active", "gauge", "Tunnels currently connecting or connected.")
+        out.append(f"vpn_connect_tunnels_active {len(active)}")
+        family("vpn_connect_tunnel_connected", "gauge", "1 if the tunnel is connected.")
+        for c in active:
+            out.append(f"vpn_connect_tunnel_connected{_metric_labels(c)} {1 if c.status == 'connected' else 0}")
+        family("vpn_connect_ping_milliseconds", "gauge", "Latest round-trip time to the tunnel's remote.")
+        for c in active:
+            if c.ping_ms is not None:
+                out.append(f"vpn_connect_ping_milliseconds{_metric_labels(c)} {c.ping_ms}")
+        return "\n".join(out) + "\n"
+
+
+def _metric_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _metric_labels(conn):
+    name = os.path.basename(conn.config_file) if conn.config_file else ""
+    return f'{{connection="{_metric_label_value(conn.id)}",config="{_metric_label_value(name)}"}}'
+
+
+metrics = Metrics()
+
+
+class Connection:
+    # One openvpn child with its own lock, log buffer, interface binding and samplers, so a
+    # tunnel flooding its log never blocks status reads of another tunnel.
+
+    def __init__(self, conn_id, config_path, auto_reconnect=AUTO_RECONNECT):
+        self.id = conn_id
+        self.config_file = config_path
+        self.config = config_cache.get(config_path)
+        self.created_at = time.time()
+        self.session = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.created_at))}-{conn_id}"
+        self.attempt = ConnectAttempt(conn_id, self.created_at)
+        self.attempts = deque([self.attempt], maxlen=MAX_ATTEMPTS_PER_CONNECTION)
+        self.stopping = threading.Event()
+        self.auto_reconnect = auto_reconnect
+        self.auth_failed = False
+        self.connected_once = False
+        self.restart_pending = False
+        self.reconnects = 0
+        self.reconnect_at = None
+        self.lock = threading.Lock()
+        self.logs = LogBuffer(MAX_LOGS)
+        self.done = threading.Event()
+        # Loop-side signals: samplers sleep on _up while the tunnel is not connected, and
+        # _wake cuts a reconnect backoff short on disconnect.
+        self._up = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._orphaned = asyncio.Event()
+        self.status = "connecting"
+        self.connect_start_time = None
+        self.vpn_process = None
+        self.askpass_file = None
+        self.pid = None
+        self.pid_file = None
+        self.ip = DISCONNECTED_IP
+        self.public_ip = None
+        self.encryption = self.config.encryption if self.config else DEFAULT_CIPHER
+        self.tun_dev = None
+        self.link_stats = None
+        self.remote = None
+        self.down_mbps = 0.0
+        self.up_mbps = 0.0
+        self.ping_ms = None
+        self.latency = None
+        self.management = None
+        self.bytecount_live = False
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self._bytes_base = (0, 0)
+        self._proc_bytes = (0, 0)
+        self._tun_prev = None
+        self._ranked_remotes = None
+        self._snapshot = self._build_snapshot()
+
+    @property
+    def active(self):
+        return not self.done.is_set()
+
+    def append_log(self, message, level=None):
+        if level is None:
+            level = level_for_line(message)
+        record = self.logs.append(level, message)
+        log_archive.append(self.session, self.id, record)
+        if _subscribers:
+            entry = format_log(record)
+            entry["id"] = self.id
+            publish("log", entry)
+
+    @contextlib.contextmanager
+    def updating(self):
+        # Every change to a field status_fields reports happens in here: the lock orders
+        # writers, and on the way out a fresh snapshot replaces the old one in a single
+        # reference assignment. Readers never take the lock.
+        with self.lock:
+            try:
+                yield
+            finally:
+                self._snapshot = self._build_snapshot()
+
+    def _build_snapshot(self):
+        # Called with self.lock held. The dict is never mutated once published.
+        st = self.status
+        return {
+            "id": self.id,
+            "session": self.session,
+            "status": st,
+            "ip": self.ip,
+            "public_ip": self.public_ip,
+            "pid": self.pid,
+            "tun_dev": self.tun_dev,
+            "link_stats": self.link_stats,
+            "down_mbps": self.down_mbps,
+            "up_mbps": self.up_mbps,
+            "ping_ms": self.ping_ms,
+            "latency": self.latency,
+            "config_file": self.config_file or "",
+            "encryption": self.encryption,
+            "auto_reconnect": self.auto_reconnect,
+            "reconnects": self.reconnects,
+            "reconnect_at": self.reconnect_at,
+            "connected": st == "connected",
+            "connecting": st == "connecting",
+            "config_name": os.path.basename(self.config_file) if self.config_file else "",
+            "connect_start_time": self.connect_start_time if st == "connected" else None,
+        }
+
+    def status_fields(self):
+        fields = dict(self._snapshot)
+        connect_start = fields.pop("connect_start_time")
+        fields["duration_seconds"] = int(max(0, time.time() - connect_start)) if connect_start else 0
+        fields["primary"] = connections.primary_id == self.id
+        return fields
+
+    def publish_status(self):
+        publish("status", self.status_fields())
+
+    def _reset_runtime(self):
+        self.status = "disconnected"
+        self.reconnect_at = None
+        self._reset_process()
+
+    def _reset_process(self):
+        # Per-child state; logs, byte totals and attempt history belong to the connection
+        # and survive supervisor restarts.
+        self.vpn_process = None
+        self.pid = None
+        self.pid_file = None
+        self.connect_start_time = None
+        self.ip = DISCONNECTED_IP
+        self.public_ip = None
+        self.down_mbps = 0.0
+        self.up_mbps = 0.0
+        self.ping_ms = None
+        self.latency = None
+        self.tun_dev = None
+        self.link_stats = None
+        self.remote = None
+        self.restart_pending = False
+        self._bytes_base = (self.rx_bytes, self.tx_bytes)
+        self._proc_bytes = (0, 0)
+        self._tun_prev = None
+
+    def mark_phase(self, phase):
+        with self.lock:
+            self.attempt.mark(phase, time.time())
+
+    def _finish_attempt(self, outcome):
+        with self.lock:
+            attempt = self.attempt
+            finished = attempt.finish(outcome, time.time())
+        if finished:
+            connect_timings.add(attempt)
+
+    def cleanup_askpass(self):
+        with self.lock:
+            path = self.askpass_file
+            self.askpass_file = None
+        if path and os.path.exists(path):
+            try:
+                os.unlink(path)
+            except Exception:
+                pass
+
+    def record_traffic(self, rx, tx, now):
+        with self.updating():
+            # rx/tx count from zero for every openvpn child; the totals add up all of them.
+            proc_rx = max(self._proc_bytes[0], rx)
+            proc_tx = max(self._proc_bytes[1], tx)
+            self._proc_bytes = (proc_rx, proc_tx)
+            self.rx_bytes = self._bytes_base[0] + proc_rx
+            self.tx_bytes = self._bytes_base[1] + proc_tx
+            if self.status != "connected":
+                return
+            prev = self._tun_prev
+            self._tun_prev = (rx, tx, now)
+            if prev is None or (now - prev[2]) <= 0:
+                return
+            elapsed = now - prev[2]
+            self.down_mbps = round(max(0, 8 * (rx - prev[0]) / elapsed / 1e6), 2)
+            self.up_mbps = round(max(0, 8 * (tx - prev[1]) / elapsed / 1e6), 2)
+            sample = {"id": self.id, "down_mbps": self.down_mbps, "up_mbps": self.up_mbps}
+        publish("throughput", sample)
+
+    async def _throughput_loop(self):
+        # The interface is the one openvpn reported in its own TUN/ifconfig output, never a
+        # guessed tunN, so another VPN's traffic is never attributed to this tunnel.
+        reader = LinkStatsReader()
+        link_down = 0
+        try:
+            while True:
+                await self._up.wait()
+                await asyncio.sleep(TUN_STATS_INTERVAL)
+                with self.updating():
+                    if self.status != "connected":
+                        self.down_mbps = 0.0
+                        self.up_mbps = 0.0
+                        self._tun_prev = None
+                        link_down = 0
+                        continue
+                    dev = self.tun_dev
+                    bytecount_live = self.bytecount_live
+                if dev is None:
+                    continue
+                stats = await reader.read(dev)
+                if self.auto_reconnect:
+                    link_down = 0 if stats is not None and stats["up"] else link_down + 1
+                    if link_down >= LINK_DOWN_RESTART:
+                        link_down = 0
+                        self.request_restart(f"Interface {dev} is down")
+                        continue
+                with self.updating():
+                    self.link_stats = stats
+                    if stats is None and self.status == "connected" and not bytecount_live:
+                        self.down_mbps = 0.0
+                        self.up_mbps = 0.0
+                if stats is not None and not bytecount_live:
+                    self.record_traffic(stats["rx_bytes"], stats["tx_bytes"], time.time())
+        finally:
+            reader.close()
+
+    async def _ping_loop(self):
+        prober = None
+        # Loss only counts once the target has answered, so a remote that never replies to
+        # probes (firewalled ICMP, UDP-only port) cannot trigger restarts.
+        answered = False
+        lost = 0
+        try:
+            while True:
+                await self._up.wait()
+                await asyncio.sleep(PING_INTERVAL)
+                with self.updating():
+                    if self.status != "connected":
+                        self.ping_ms = None
+                        self.latency = None
+                        answered = False
+                        lost = 0
+                        continue
+                    remote = self.remote
+                # Probe the remote openvpn actually linked to; after a race it need not be
+                # the first one in the config.
+                target = remote or (self.config and self.config.ping_target()) or ("8.8.8.8", 53)
+                if prober is not None and (prober.host, prober.port) != target:
+                    prober.close()
+                    prober = None
+                    answered = False
+                    lost = 0
+                if prober is None:
+                    prober = LatencyProber(*target)
+                rtt = await prober.probe()
+                summary = prober.summary
+                if rtt is not None:
+                    answered = True
+                    lost = 0
+                elif answered:
+                    lost += 1
+                    if lost >= PING_LOSS_RESTART and self.auto_reconnect:
+                        answered = False
+                        lost = 0
+                        self.request_restart(f"No reply from {target[0]} for {PING_LOSS_RESTART} probes")
+                with self.updating():
+                    if self.status != "connected":
+                        continue
+                    self.ping_ms = round(rtt) if rtt is not None else None
+                    self.latency = summary
+                publish("ping", {"id": self.id, "ping_ms": self.ping_ms, "latency": summary})
+        finally:
+            if prober is not None:
+                prober.close()
+
+    async def _lookup_public_ip(self):
+        # Keyed by the remote actually in use: a reconnect to the same server reuses the
+        # cached exit IP, landing on another server (a route change) looks it up afresh.
+        for delay in PUBLIC_IP_RETRY_DELAYS:
+            if delay:
+                await asyncio.sleep(delay)
+            with self.lock:
+                if self.status != "connected":
+                    return
+                key = self.remote or self.config_file
+            pub = await public_ip_service.lookup(key)
+            with self.updating():
+                if self.status != "connected":
+                    return
+                if pub:
+                    self.public_ip = pub
+            if pub:
+                self.publish_status()
+                return
+
+    def on_connected(self, ip=None):
+        with self.updating():
+            if ip:
+                self.ip = ip
+            already = self.status == "connected"
+            self.restart_pending = False
+            self.connected_once = True
+            if not already:
+                self.status = "connected"
+                self.connect_start_time = time.time()
+                self.attempt.mark("completed", self.connect_start_time)
+                handshake = self.connect_start_time - self.attempt.started_at
+        self.publish_status()
+        if already:
+            return
+        self._finish_attempt("connected")
+        metrics.inc("connect_successes")
+        metrics.observe_handshake(handshake)
+        self.append_log("VPN Connected!", "SUCCESS")
+        self.cleanup_askpass()
+        io_loop.call(self._up.set)
+        io_loop.submit(self._lookup_public_ip())
+
+    def on_management_state(self, name, description, local_ip, remote_ip, remote_port):
+        if name == "CONNECTED":
+            if remote_ip and remote_port.isdigit():
+                with self.lock:
+                    self.remote = (remote_ip, int(remote_port))
+            self.on_connected(local_ip or None)
+            return
+        if "auth-failure" in description.lower():
+            metrics.inc("auth_failures")
+            with self.lock:
+                self.auth_failed = True
+            self._finish_attempt("auth_failed")
+            self.append_log("VPN authentication failed.", "ERROR")
+        if name == "EXITING":
+            return
+        with self.updating():
+            reconnecting = self.status == "connected"
+            if reconnecting:
+                self.status = "connecting"
+                self.connect_start_time = None
+                self._up.clear()
+                self.attempt = ConnectAttempt(self.id, time.time())
+                self.attempts.append(self.attempt)
+            phase = _MANAGEMENT_PHASES.get(name)
+            if phase is not None:
+                self.attempt.mark(phase, time.time())
+            changed = reconnecting
+            if name == "ASSIGN_IP" and local_ip:
+                self.ip = local_ip
+                changed = True
+        if reconnecting:
+            metrics.inc("connect_attempts")
+        if changed:
+            self.publish_status()
+
+    def on_management_bytecount(self, rx, tx):
+        self.record_traffic(rx, tx, time.time())
+
+    def _on_line_connected(self, data):
+        if self.management is None:
+            self.on_connected()
+
+    def _on_line_auth_failed(self, data):
+        if self.management is None:
+            metrics.inc("auth_failures")
+            with self.lock:
+                self.auth_failed = True
+            self._finish_attempt("auth_failed")
+            self.append_log("VPN authentication failed.", "ERROR")
+
+    def _on_line_bad_decrypt(self, data):
+        with self.lock:
+            self.auth_failed = True
+        self.append_log("Wrong private key password.", "ERROR")
+
+    def _on_line_tun_opened(self, data):
+        with self.updating():
+            self.tun_dev = data.get("dev") or self.tun_dev
+
+    def _on_line_ifconfig(self, data):
+        with self.updating():
+            if data.get("dev"):
+                self.tun_dev = data["dev"]
+            if self.management is not None or not data.get("ip"):
+                return
+            self.ip = data["ip"]
+        self.publish_status()
+
+    def _on_line_remote(self, data):
+        host, _, port = data["address"].rpartition(":")
+        if host and port.isdigit():
+            with self.lock:
+                self.remote = (host, int(port))
+
+    def _on_line_tls(self, data):
+        cipher = data.get("cipher")
+        if not cipher:
+            return
+        with self.updating():
+            if self.encryption == cipher:
+                return
+            self.encryption = cipher
+        self.publish_status()
+
+    _LINE_EVENT_HANDLERS = {
+        "connected": _on_line_connected,
+        "auth_failed": _on_line_auth_failed,
+        "bad_decrypt": _on_line_bad_decrypt,
+        "tun_opened": _on_line_tun_opened,
+        "ifconfig": _on_line_ifconfig,
+        "remote": _on_line_remote,
+        "tls": _on_line_tls,
+    }
+
+    async def _read_stream(self, stream):
+        handlers = self._LINE_EVENT_HANDLERS
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:
+                # Line longer than the stream limit; the reader drops it and carries on.
+                continue
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            level, events = LOG_CLASSIFIER.classify(line)
+            self.append_log(line, level)
+            for event, data in events:
+                handler = handlers.get(event)
+                if handler is not None:
+                    handler(self, data)
+                phase = _phase_for_event(event, data)
+                if phase is not None:
+                    self.mark_phase(phase)
+
+    async def _race_remotes(self):
+        # Remotes given on the command line ahead of --config come first in openvpn's remote
+        # list, so the ranked order takes over and the config's own entries stay as a tail.
+        # The race runs once per connection; supervisor restarts reuse its ranking.
+        config = self.config
+        if config is None or not config.raceable or len(config.remotes) < 2:
+            return []
+        if self._ranked_remotes is not None:
+            if self._ranked_remotes:
+                with self.lock:
+                    self.attempt.remotes = self._ranked_remotes
+            return self._remote_args(self._ranked_remotes)
+        if config.tls_wrapped and any(proto.startswith("udp") for _, _, proto in config.remotes):
+            self.append_log("Remote race skipped: tls-auth/tls-crypt servers ignore probes; using config order.", "TCP")
+            self._ranked_remotes = []
+            return []
+        ranked = await race_remotes(config.remotes)
+        with self.lock:
+            self.attempt.mark("race", time.time())
+            self.attempt.remotes = ranked
+        best = ranked[0]
+        usable = sum(1 for r in ranked if r["state"] in ("reachable", "silent"))
+        if not usable:
+            self.append_log(f"No remote answered a probe ({len(ranked)} tried); using config order.", "TCP")
+            self._ranked_remotes = []
+            return []
+        rtt = f" ({best['rtt_ms']} ms)" if best["rtt_ms"] is not None else ""
+        self.append_log(
+            f"Remote race: {best['host']}:{best['port']}/{best['proto']}{rtt}, "
+            f"{usable} of {len(ranked)} remotes usable",
+            "TCP",
+        )
+        self._ranked_remotes = ranked
+        return self._remote_args(ranked)
+
+    @staticmethod
+    def _remote_args(ranked):
+        args = []
+        for r in ranked:
+            args += ["--remote", r["host"], str(r["port"]), r["proto"]]
+        return args
+
+    async def _attach_management(self, proc, path):
+        client = ManagementClient(
+            path,
+            on_state=self.on_management_state,
+            on_bytecount=self.on_management_bytecount,
+        )
+        if not await client.connect(alive=lambda: proc.returncode is None):
+            self.append_log("Management interface unavailable; falling back to output parsing.", "INFO")
+            return
+        with self.lock:
+            self.management = client
+            self.bytecount_live = True
+        client.subscribe()
+        await client.run()
+        with self.lock:
+            if self.management is client:
+                self.management = None
+                self.bytecount_live = False
+
+    def request_restart(self, reason):
+        # Kick a tunnel that looks dead without waiting for openvpn's own ping-restart:
+        # SIGUSR1 over the management socket resumes in place (same process, same tun),
+        # otherwise the child is stopped and the supervisor starts a fresh one.
+        with self.lock:
+            if self.status != "connected" or self.restart_pending or self.stopping.is_set():
+                return
+            self.restart_pending = True
+            client = self.management
+            proc = self.vpn_process
+        self.append_log(f"{reason}; restarting tunnel.", "ERROR")
+        if client is not None and client.command("signal SIGUSR1"):
+            return
+        if proc is not None:
+            io_loop.call(_terminate, proc)
+
+    def _new_attempt(self):
+        with self.lock:
+            self.attempt = ConnectAttempt(self.id, time.time())
+            self.attempts.append(self.attempt)
+        metrics.inc("connect_attempts")
+
+    async def run(self, password):
+        self.publish_status()
+        self.append_log(f"Connecting: {os.path.basename(self.config_file)}", "INFO")
+        samplers = [
+            asyncio.create_task(self._throughput_loop()),
+            asyncio.create_task(self._ping_loop()),
+        ]
+        failures = 0
+        try:
+            while True:
+                uptime = await self._run_process(password)
+                # Only a tunnel that came up once is supervised; a profile that never connects
+                # (bad options, wrong credentials) would otherwise retry forever.
+                with self.lock:
+                    retry = (
+                        self.auto_reconnect and self.connected_once
+                        and not self.auth_failed and not self.stopping.is_set()
+                    )
+                if not retry:
+                    break
+                # A session that stayed up for a while starts the backoff over.
+                failures = 1 if uptime >= RECONNECT_RESET_AFTER else failures + 1
+                if RECONNECT_MAX_RETRIES and failures > RECONNECT_MAX_RETRIES:
+                    self.append_log(f"Giving up after {RECONNECT_MAX_RETRIES} reconnect attempts.", "ERROR")
+                    break
+                delay = _reconnect_delay(failures)
+                with self.updating():
+                    self.reconnect_at = time.time() + delay
+                self.append_log(f"Reconnecting in {delay:.1f}s (retry {failures}).", "INFO")
+                self.publish_status()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                with self.updating():
+                    self.reconnect_at = None
+                    self.reconnects += 1
+                self._new_attempt()
+        except Exception as e:
+            self.append_log(str(e), "ERROR")
+        finally:
+            for task in samplers:
+                task.cancel()
+            self.append_log("Disconnected.", "INFO")
+            with self.updating():
+                self._reset_runtime()
+            metrics.retire(self)
+            connections.finished(self)
+            self.publish_status()
+
+    async def _run_process(self, password):
+        # One openvpn child from spawn to exit; returns how long it stayed connected.
+        config_path = self.config_file
+        mgmt_dir = None
+        pid_file = None
+        proc = None
+        readers = []
+        try:
+            askpass = tempfile.NamedTemporaryFile(mode="w", suffix=".pass", delete=False)
+            askpass.write(password + "\n")
+            askpass.close()
+            os.chmod(askpass.name, 0o600)
+            with self.lock:
+                self.askpass_file = askpass.name
+
+            remote_args = await self._race_remotes()
+            mgmt_dir = tempfile.mkdtemp(prefix="vpn-connect-mgmt-")
+            mgmt_path = os.path.join(mgmt_dir, "openvpn.sock")
+            pid_file = os.path.join(mgmt_dir, "openvpn.pid")
+            cmd = [
+                *OPENVPN_COMMAND,
+                *remote_args,
+                "--config", config_path,
+                "--askpass", askpass.name,
+                "--auth-nocache",
+                "--verb", "3",
+                "--management", mgmt_path, "unix",
+                "--management-client-user", current_user(),
+                "--writepid", pid_file,
+            ]
+            cwd = os.path.dirname(os.path.abspath(config_path))
+            if self.stopping.is_set():
+                return 0.0
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+            )
+            with self.updating():
+                self.vpn_process = proc
+                self.pid = proc.pid
+                self.pid_file = pid_file
+                self.attempt.mark("spawn", time.time())
+                stopped = self.stopping.is_set()
+            if stopped:
+                _terminate(proc)
+            self.publish_status()
+
+            readers = [
+                asyncio.create_task(self._read_stream(proc.stdout)),
+                asyncio.create_task(self._read_stream(proc.stderr)),
+            ]
+            management = asyncio.create_task(self._attach_management(proc, mgmt_path))
+            # Process.wait() also waits for the stdio pipes to close, which an orphaned
+            # openvpn keeps open; teardown sets _orphaned to stop waiting for it.
+            exited = asyncio.ensure_future(proc.wait())
+            orphaned = asyncio.ensure_future(self._orphaned.wait())
+            await asyncio.wait([exited, orphaned], return_when=asyncio.FIRST_COMPLETED)
+            orphaned.cancel()
+            code = proc.returncode
+            if not self._orphaned.is_set():
+                await asyncio.wait(readers, timeout=2)
+                await asyncio.wait([management], timeout=2)
+            readers += [management, exited]
+            if not self.stopping.is_set():
+                self.append_log(f"openvpn exited with code {code}.", "ERROR" if code else "INFO")
+        except Exception as e:
+            self.append_log(str(e), "ERROR")
+        finally:
+            for task in readers:
+                task.cancel()
+            self.cleanup_askpass()
+            with self.updating():
+                client = self.management
+                self.management = None
+                self.bytecount_live = False
+                uptime = time.time() - self.connect_start_time if self.connect_start_time else 0.0
+                if self.status == "connected":
+                    self.status = "connecting"
+                self._reset_process()
+            self._up.clear()
+            if client is not None:
+                client.close()
+            if mgmt_dir:
+                # A SIGKILLed sudo leaves openvpn running; its management socket is then
+                # the only handle left on it, so the directory stays.
+                orphan = _openvpn_pid(proc, client, pid_file) if proc is not None else None
+                if _pid_alive(orphan):
+                    self.append_log(f"openvpn (pid {orphan}) outlived its launcher; keeping {mgmt_dir}.", "ERROR")
+                else:
+                    shutil.rmtree(mgmt_dir, ignore_errors=True)
+            self._finish_attempt("aborted" if self.stopping.is_set() else "failed")
+            metrics.inc("disconnects")
+        return uptime
+
+    async def _teardown(self, job, proc, client, pid_file):
+        # Stops only this connection's child: "signal SIGTERM" over the management socket
+        # lets openvpn tear down routes and the tun device itself, then SIGTERM to the
+        # child (sudo relays it to openvpn), then SIGKILL. Each step gets a bounded wait.
+        # SIGKILL can only reach our direct child, so a stage only counts as an exit once
+        # openvpn's own pid is gone too; a killed sudo with openvpn still running is
+        # reported as "orphaned".
+        self._wake.set()
+        self._up.clear()
+        pid = _openvpn_pid(proc, client, pid_file)
+        if proc is None or (proc.returncode is not None and not _pid_alive(pid)):
+            job.finish("not_running", proc.returncode if proc is not None else None)
+        else:
+            loop = asyncio.get_running_loop()
+            for stage, wait in TEARDOWN_STAGES:
+                started = job.elapsed_ms()
+                if stage == "signal":
+                    if client is None or not client.command("signal SIGTERM"):
+                        continue
+                elif proc.returncode is not None:
+                    continue
+                else:
+                    try:
+                        if stage == "terminate":
+                            proc.terminate()
+                        else:
+                            proc.kill()
+                    except ProcessLookupError:
+                        pass
+                deadline = loop.time() + wait
+                try:
+                    await asyncio.wait_for(proc.wait(), wait)
+                    while _pid_alive(pid) and loop.time() < deadline:
+                        await asyncio.sleep(0.02)
+                except asyncio.TimeoutError:
+                    pass
+                exited = proc.returncode is not None and not _pid_alive(pid)
+                job.stages.append({
+                    "stage": stage,
+                    "started_ms": started,
+                    "duration_ms": round(job.elapsed_ms() - started, 1),
+                    "exited": exited,
+                })
+                if exited:
+                    break
+            if proc.returncode is None:
+                outcome = "survived"
+            elif _pid_alive(pid):
+                outcome = "orphaned"
+            else:
+                outcome = "exited"
+            job.finish(outcome, proc.returncode)
+            if outcome == "orphaned":
+                self._orphaned.set()
+        if job.outcome != "not_running":
+            after = f" after {job.stages[-1]['stage']}" if job.stages else ""
+            detail = f"; openvpn (pid {pid}) is still running" if job.outcome == "orphaned" else ""
+            self.append_log(
+                f"Teardown {job.outcome}{after} in {job.total_ms:.0f} ms{detail}.",
+                "INFO" if job.outcome == "exited" else "ERROR",
+            )
+        publish("teardown", job.to_dict())
+
+    def disconnect(self):
+        # Returns at once with the teardown job; the escalation runs on io_loop.
+        job = teardowns.new(self.id)
+        with self.updating():
+            self.stopping.set()
+            proc = self.vpn_process
+            client = self.management
+            pid_file = self.pid_file
+            self._reset_runtime()
+        self.publish_status()
+        self.append_log("Disconnecting...", "INFO")
+        io_loop.submit(self._teardown(job, proc, client, pid_file))
+        self.cleanup_askpass()
+        return job
+
+
+class ConnectionManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._next_id = 1
+        self.primary_id = None
+        self._history = None
 
+    def start(self, config_path, password, auto_reconnect=AUTO_RECONNECT):
+        with self._lock:
+            for conn in self._connections.values():
+                if conn.active and conn.config_file == config_path:
+                    return None
+            conn = Connection(str(self._next_id), config_path, auto_reconnect)
+            self._next_id += 1
+            self._connections[conn.id] = conn
+            self.primary_id = conn.id
+            if self._history is None or self._history.done():
+                self._history = io_loop.submit(_history_loop())
+            self._prune()
+        metrics.inc("connect_attempts")
+        publish("snapshot", _status_payload())
+        io_loop.submit(conn.run(password))
+        return conn
 
-def ensure_sudoers():
-    if os.path.exists(SUDOERS_FILE):
-        return True
-    try:
-        rule = (
-            f"{USER} ALL=(ALL) NOPASSWD: /usr/sbin/openvpn\n"
-            f"{USER} ALL=(ALL) NOPASSWD: /usr/bin/killall openvpn\n"
-            f"{USER} ALL=(ALL) NOPASSWD: /bin/killall openvpn\n"
+    def _prune(self):
+        finished = [c for c in self._connections.values() if not c.active and c.id != self.primary_id]
+        for conn in finished[:max(0, len(finished) - MAX_FINISHED_CONNECTIONS)]:
+            del self._connections[conn.id]
+
+    def finished(self, conn):
+        with self._lock:
+            remaining = [c for c in self._connections.values() if c.active]
+            if self.primary_id != conn.id or not remaining:
+                return
+            self.primary_id = remaining[-1].id
+        publish("snapshot", _status_payload())
+
+    def get(self, conn_id):
+        with self._lock:
+            return self._connections.get(str(conn_id))
+
+    def primary(self):
+        with self._lock:
+            return self._connections.get(self.primary_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._connections.values())
+
+    def active(self):
+        with self._lock:
+            return [c for c in self._connections.values() if c.active]
+
+
+connections = ConnectionManager()
+
+
+class MetricsHistory:
+    # Fixed-memory round-robin tiers (step seconds, slot count). Each slot aggregates every
+    # sample falling into its bucket, so memory stays constant no matter how long we run.
+
+    def __init__(self, tiers=HISTORY_TIERS):
+        self._lock = threading.Lock()
+        # Slots are allocated on first write, which keeps the ~2800 of them off import time.
+        self._tiers = [(step, [None] * slots) for step, slots in tiers]
+
+    def record(self, ts, rx_mbps, tx_mbps, ping_ms, connected):
+        with self._lock:
+            for step, slots in self._tiers:
+                bucket = int(ts // step) * step
+                i = (bucket // step) % len(slots)
+                slot = slots[i]
+                if slot is None or slot[0] != bucket:
+                    slot = slots[i] = [bucket, 0, 0.0, 0.0, 0.0, 0, 0]
+                slot[1] += 1
+                slot[2] += rx_mbps
+                slot[3] += tx_mbps
+                if ping_ms is not None:
+                    slot[4] += ping_ms
+                    slot[5] += 1
+                if connected:
+                    slot[6] += 1
+
+    def _pick_tier(self, start, now, step):
+        for tier_step, slots in self._tiers:
+            if step is not None and tier_step > step:
+                break
+            if now - tier_step * len(slots) <= start:
+                return tier_step, slots
+        for tier_step, slots in self._tiers:
+            if now - tier_step * len(slots) <= start:
+                return tier_step, slots
+        return self._tiers[-1]
+
+    def query(self, start, end, step=None, now=None):
+        now = time.time() if now is None else now
+        tier_step, slots = self._pick_tier(start, now, step)
+        # Nothing outside the tier's window can still be in a slot, so the walk below
+        # (which holds the lock) never covers more than len(slots) buckets.
+        start = max(start, now - tier_step * len(slots))
+        end = min(end, now)
+        if start > end:
+            return tier_step, []
+        out_step = tier_step
+        if step is not None and step > tier_step:
+            out_step = int(-(-step // tier_step)) * tier_step
+        while (end - start) / out_step > HISTORY_MAX_POINTS:
+            out_step += tier_step
+        first = int(start // tier_step) * tier_step
+        last = int(end // tier_step) * tier_step
+        points = []
+        current = None
+        with self._lock:
+            for bucket in range(first, last + 1, tier_step):
+                slot = slots[(bucket // tier_step) % len(slots)]
+                if slot is None or slot[0] != bucket or not slot[1]:
+                    continue
+                out_bucket = int(bucket // out_step) * out_step
+                if current is None or current[0] != out_bucket:
+                    current = [out_bucket, 0, 0.0, 0.0, 0.0, 0, 0]
+                    points.append(current)
+                for i in range(1, 7):
+                    current[i] += slot[i]
+        return out_step, [
+            {
+                "t": p[0],
+                "rx_mbps": round(p[2] / p[1], 3),
+                "tx_mbps": round(p[3] / p[1], 3),
+                "ping_ms": round(p[4] / p[5], 1) if p[5] else None,
+                "connected": round(p[6] / p[1], 3),
+            }
+            for p in points
+        ]
+
+
+metrics_history = MetricsHistory()
+
+
+async def _history_loop():
+    # Runs on io_loop only while a tunnel is active; ConnectionManager.start() revives it.
+    while True:
+        await asyncio.sleep(HISTORY_INTERVAL)
+        active = connections.active()
+        if not active:
+            return
+        primary = connections.primary()
+        ping_ms = primary.ping_ms if primary is not None and primary.active else None
+        metrics_history.record(
+            time.time(),
+            sum(c.down_mbps for c in active),
+            sum(c.up_mbps for c in active),
+            ping_ms,
+            any(c.status == "connected" for c in active),
         )
-        f = tempfile.NamedTemporaryFile(mode="w", suffix=".sh", delete=False)
-        f.write(f"#!/bin/bash\nprintf '%s' '{rule}' > {SUDOERS_FILE}\nchmod 440 {SUDOERS_FILE}\n")
-        f.close()
-        os.chmod(f.name, 0o755)
-        r = subprocess.run(["pkexec", "bash", f.name], capture_output=True, timeout=60)
-        os.unlink(f.name)
-        return r.returncode == 0
-    except Exception:
-        return False
 
 
-def level_for_line(line):
-    line_lower = line.lower()
-    if "Initialization Sequence Completed" in line:
-        return "SUCCESS"
-    if "AUTH_FAILED" in line or "auth-failure" in line_lower or "ERROR" in line:
-        return "ERROR"
-    if "tun0:" in line or ("established" in line_lower and "tun" in line):
-        return "TUN"
-    if "Connecting to" in line or "TCP" in line:
-        return "TCP"
-    if "TLS" in line or "Peer Connection" in line:
-        return "TLS"
-    return "INFO"
-
-
-def append_log(message, level=None):
-    ts = datetime.now().strftime("%H:%M:%S")
-    if level is None:
-        level = level_for_line(message)
-    with state["lock"]:
-        state["logs"].append({"timestamp": ts, "level": level, "message": message})
-        if len(state["logs"]) > MAX_LOGS:
-            state["logs"] = state["logs"][-MAX_LOGS:]
-
-
-def cleanup_askpass():
-    with state["lock"]:
-        path = state.get("askpass_file")
-        state["askpass_file"] = None
-    if path and os.path.exists(path):
-        try:
-            os.unlink(path)
-        except Exception:
-            pass
+def _idle_status_fields():
+    return {
+        "id": None,
+        "status": "disconnected",
+        "ip": DISCONNECTED_IP,
+        "public_ip": None,
+        "pid": None,
+        "tun_dev": None,
+        "link_stats": None,
+        "down_mbps": 0.0,
+        "up_mbps": 0.0,
+        "ping_ms": None,
+        "config_file": "",
+        "encryption": DEFAULT_CIPHER,
+        "connected": False,
+        "connecting": False,
+        "duration_seconds": 0,
+        "config_name": "",
+        "session": None,
+        "primary": True,
+    }
 
 
-def fetch_public_ip():
+def write_json_atomic(path, data, mode=0o600):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
     try:
-        import urllib.request
-        with urllib.request.urlopen("https://api.ipify.org", timeout=10) as r:
-            pub = r.read().decode().strip()
-            if pub and re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", pub):
-                with state["lock"]:
-                    if state["status"] == "connected":
-                        state["public_ip"] = pub
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=0)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
     except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(str(path.parent), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
         pass
 
 
-def _ping_target_from_config(config_path):
-    if not config_path or not os.path.isfile(config_path):
-        return None
-    try:
-        with open(config_path) as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("remote ") and not line.startswith("remote-cert"):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        host = parts[1]
-                        if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", host):
-                            return host
-                        return host
-    except Exception:
-        pass
-    return None
+class ProfileStore:
+    # Parsed saved.json kept in memory; reloaded only when the file's inode, mtime or size change.
 
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._profiles = []
+        self._listing = []
+        self._index = {}
 
-def _measure_ping(target="8.8.8.8"):
-    try:
-        r = subprocess.run(
-            ["ping", "-c", "1", "-W", "3", target],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        if r.returncode != 0:
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
             return None
-        m = re.search(r"time[= ]([\d.]+)\s*ms", r.stdout)
-        if m:
-            return round(float(m.group(1)))
-        m = re.search(r"rtt min/avg/max = [\d./]+/([\d.]+)/[\d./]+ ms", r.stdout)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _set_profiles(self, profiles):
+        self._profiles = profiles
+        self._index = {p["config_path"]: p for p in profiles if p.get("config_path")}
+        listing = []
+        for p in profiles:
+            entry = dict(p)
+            if "name" not in entry and entry.get("config_path"):
+                entry["name"] = os.path.basename(entry["config_path"])
+            listing.append(entry)
+        self._listing = listing
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return
+        profiles = []
+        if stamp is not None:
+            try:
+                with open(self.path) as f:
+                    saved = json.load(f)
+                if "profiles" in saved:
+                    profiles = [p for p in saved["profiles"] if isinstance(p, dict)]
+                elif saved.get("config_path") or saved.get("password"):
+                    profiles = [{"config_path": saved.get("config_path") or "", "password": saved.get("password") or ""}]
+            except Exception:
+                profiles = []
+        self._set_profiles(profiles)
+        self._stamp = stamp
+
+    def list(self):
+        with self._lock:
+            self._refresh()
+            return self._listing
+
+    def rev(self):
+        # Changes whenever saved.json does, including across backend restarts.
+        with self._lock:
+            self._refresh()
+            return "-".join(map(str, self._stamp)) if self._stamp else "0"
+
+    def save(self, config_path, password):
+        with self._lock:
+            self._refresh()
+            existing = self._index.get(config_path)
+            if existing is not None and existing.get("password") == password:
+                return
+            profiles = [dict(p) for p in self._profiles]
+            for p in profiles:
+                if p.get("config_path") == config_path:
+                    p["password"] = password
+                    break
+            else:
+                profiles.append({"config_path": config_path, "password": password})
+            write_json_atomic(self.path, {"profiles": profiles})
+            self._set_profiles(profiles)
+            self._stamp = self._file_stamp()
+
+
+profile_store = ProfileStore(SAVED_CREDENTIALS_FILE)
+
+
+# Leading two-letter location code in provider file and host names: "us-nyc.udp.ovpn",
+# "de123.example.net", "uk_london". Best effort; profiles without one list under "".
+_COUNTRY_PREFIX = re.compile(r"^([a-z]{2})(?=[-_.\d]|$)")
+
+
+def _guess_country(name, hosts):
+    for candidate in (name, *hosts):
+        m = _COUNTRY_PREFIX.match(candidate.lower())
         if m:
-            return round(float(m.group(1)))
-    except Exception:
-        pass
-    return None
+            return m.group(1)
+    return ""
 
 
-def _ping_loop():
-    while True:
-        time.sleep(PING_INTERVAL)
-        with state["lock"]:
-            if state["status"] != "connected":
-                state["ping_ms"] = None
-                continue
-            config_file = state.get("config_file") or ""
-        target = _ping_target_from_config(config_file) if config_file else None
-        if not target:
-            target = "8.8.8.8"
-        ms = _measure_ping(target)
-        with state["lock"]:
-            if state["status"] == "connected":
-                state["ping_ms"] = ms
-
-
-def _read_tun_stats(iface="tun0"):
-    rx_path = Path(f"/sys/class/net/{iface}/statistics/rx_bytes")
-    tx_path = Path(f"/sys/class/net/{iface}/statistics/tx_bytes")
-    if rx_path.exists() and tx_path.exists():
+def _safe_relpath(name):
+    # Normalised path inside an import root, or None for absolute paths and ".." escapes.
+    name = name.replace("\\", "/")
+    if name.startswith("/"):
+        return None
+    norm = posixpath.normpath(name)
+    if norm in (".", "") or norm.startswith("../") or norm == "..":
+        return None
+    return norm
+
+
+class _ImportSource:
+    # Uniform read access to the members of a zip archive, a directory tree or a set of
+    # uploaded files, with the per-file and total size limits applied.
+
+    def __init__(self, members, reader, lookup=None):
+        self.members = members
+        self._reader = reader
+        self._lookup = lookup
+        self._lock = threading.Lock()
+        self._total = 0
+
+    @classmethod
+    def from_zip(cls, fileobj):
+        zf = zipfile.ZipFile(fileobj)
+        members = {}
+        for info in zf.infolist():
+            rel = _safe_relpath(info.filename)
+            if rel is not None and not info.is_dir():
+                members[rel] = info
+        lock = threading.Lock()
+
+        def read(info):
+            if info.file_size > LIBRARY_MAX_FILE_BYTES:
+                raise ValueError("file too large")
+            # ZipFile shares one file handle between readers.
+            with lock:
+                return zf.read(info)
+
+        return cls(members, read)
+
+    @classmethod
+    def from_directory(cls, root):
+        # Only the .ovpn files are collected up front; the key files they reference are
+        # looked up by name when a profile is prepared. The walk stops with ValueError
+        # after LIBRARY_MAX_IMPORT_ENTRIES directory entries, so pointing the import at
+        # a home directory fails fast instead of walking it whole.
+        root = Path(root)
+        members = {}
+        seen = 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            seen += len(dirnames) + len(filenames)
+            if seen > LIBRARY_MAX_IMPORT_ENTRIES:
+                raise ValueError(f"Directory has more than {LIBRARY_MAX_IMPORT_ENTRIES} entries.")
+            base = Path(dirpath)
+            for name in filenames:
+                if name.lower().endswith(".ovpn"):
+                    members[(base / name).relative_to(root).as_posix()] = base / name
+
+        def read(path):
+            if path.stat().st_size > LIBRARY_MAX_FILE_BYTES:
+                raise ValueError("file too large")
+            return path.read_bytes()
+
+        def lookup(rel):
+            path = root / rel
+            return path if path.is_file() else None
+
+        return cls(members, read, lookup)
+
+    @classmethod
+    def from_uploads(cls, files):
+        members = {}
+        for f in files:
+            rel = _safe_relpath(f.filename or "")
+            if rel is not None:
+                members[rel] = f.read(LIBRARY_MAX_FILE_BYTES + 1)
+
+        def read(data):
+            if len(data) > LIBRARY_MAX_FILE_BYTES:
+                raise ValueError("file too large")
+            return data
+
+        return cls(members, read)
+
+    def has(self, rel):
+        with self._lock:
+            if rel in self.members:
+                return True
+            if self._lookup is None:
+                return False
+            entry = self._lookup(rel)
+            if entry is not None:
+                self.members[rel] = entry
+            return entry is not None
+
+    def read(self, rel):
+        data = self._reader(self.members[rel])
+        with self._lock:
+            self._total += len(data)
+            if self._total > LIBRARY_MAX_IMPORT_BYTES:
+                raise ValueError("import exceeds the size limit")
+        return data
+
+    def profiles(self):
+        return sorted(rel for rel in self.members if rel.lower().endswith(".ovpn"))
+
+
+class ConfigLibrary:
+    # Persistent, content-addressed store of imported profiles. Each profile lives in
+    # objects/<hash>/ with the key files it references, laid out as in the original bundle,
+    # so openvpn (started with the profile's directory as cwd) resolves them; the hash covers
+    # the profile and those files, so re-importing a bundle adds nothing. Listings are
+    # served from memory: entries sorted by name plus per-country, proto and port sets.
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._entries = None
+        self._sorted = []
+        self._facets = {}
+
+    @property
+    def _index_path(self):
+        return self.root / "index.json"
+
+    def _load(self):
+        # Called with _lock held.
+        if self._entries is not None:
+            return
+        entries = {}
         try:
-            rx = int(rx_path.read_text().strip())
-            tx = int(tx_path.read_text().strip())
-            return (rx, tx)
-        except Exception:
+            with open(self._index_path) as f:
+                for e in json.load(f).get("profiles", []):
+                    if isinstance(e, dict) and e.get("id"):
+                        entries[e["id"]] = e
+        except (OSError, ValueError, AttributeError):
             pass
-    try:
-        with open("/proc/net/dev") as f:
-            for line in f:
-                parts = line.split()
-                if len(parts) >= 17 and (parts[0].startswith("tun") and ":" in parts[0]):
-                    name = parts[0].rstrip(":")
-                    if name == iface or (iface == "tun0" and name.startswith("tun")):
-                        rx = int(parts[1])
-                        tx = int(parts[9])
-                        return (rx, tx)
-    except Exception:
-        pass
-    return (None, None)
+        self._set_entries(entries)
 
+    def _set_entries(self, entries):
+        self._entries = entries
+        self._sorted = sorted(entries.values(), key=lambda e: (e["name"].lower(), e["id"]))
+        facets = {"country": {}, "proto": {}, "port": {}}
+        for e in self._sorted:
+            for key in ("country", "proto", "port"):
+                facets[key].setdefault(e[key], set()).add(e["id"])
+        self._facets = facets
 
-def _throughput_loop():
-    while True:
-        time.sleep(TUN_STATS_INTERVAL)
-        with state["lock"]:
-            if state["status"] != "connected":
-                state["down_mbps"] = 0.0
-                state["up_mbps"] = 0.0
-                state["_tun_rx_prev"] = None
-                state["_tun_tx_prev"] = None
-                state["_tun_time_prev"] = None
+    def _prepare(self, source, rel):
+        # Runs on the import pool: read, hash and parse one profile and the files it
+        # references, and write them to the object store. Raises ValueError for
+        # profiles that cannot be imported.
+        data = source.read(rel)
+        config = OvpnConfig.parse(rel, data.decode("utf-8", errors="replace"))
+        if not config.remotes:
+            raise ValueError("no remote server")
+        base = posixpath.dirname(rel)
+        name = posixpath.basename(rel)
+        refs = {}
+        missing = []
+        for key in sorted(config.files):
+            if key in config.inline:
                 continue
-        rx, tx = _read_tun_stats("tun0")
-        if rx is None:
-            rx, tx = _read_tun_stats("tun1")
-        if rx is None or tx is None:
-            with state["lock"]:
-                if state["status"] == "connected":
-                    state["down_mbps"] = 0.0
-                    state["up_mbps"] = 0.0
-            continue
-        now = time.time()
-        with state["lock"]:
-            if state["status"] != "connected":
+            ref = config.files[key]
+            member = _safe_relpath(posixpath.join(base, ref))
+            if member is None or not source.has(member):
+                missing.append(ref)
                 continue
-            prev_rx = state["_tun_rx_prev"]
-            prev_tx = state["_tun_tx_prev"]
-            prev_time = state["_tun_time_prev"]
-            state["_tun_rx_prev"] = rx
-            state["_tun_tx_prev"] = tx
-            state["_tun_time_prev"] = now
-            if prev_time is not None and prev_rx is not None and (now - prev_time) > 0:
-                elapsed = now - prev_time
-                state["down_mbps"] = round(max(0, 8 * (rx - prev_rx) / elapsed / 1e6), 2)
-                state["up_mbps"] = round(max(0, 8 * (tx - prev_tx) / elapsed / 1e6), 2)
-
-
-def run_vpn(config_path: str, password: str):
-    with state["lock"]:
-        state["status"] = "connecting"
-        state["config_file"] = config_path
-    append_log(f"Connecting: {os.path.basename(config_path)}", "INFO")
-    try:
-        askpass = tempfile.NamedTemporaryFile(mode="w", suffix=".pass", delete=False)
-        askpass.write(password + "\n")
-        askpass.close()
-        os.chmod(askpass.name, 0o600)
-        with state["lock"]:
-            state["askpass_file"] = askpass.name
-
-        cmd = [
-            "sudo", "openvpn",
-            "--config", config_path,
-            "--askpass", askpass.name,
-            "--auth-nocache",
-            "--verb", "3",
-        ]
-        cwd = os.path.dirname(os.path.abspath(config_path))
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            bufsize=1,
-            cwd=cwd,
-        )
-        with state["lock"]:
-            state["vpn_process"] = proc
-            state["pid"] = proc.pid
+            if member not in refs:
+                refs[member] = source.read(member)
+        # Everything is stored relative to the deepest directory holding the profile and
+        # the files it references, so references such as "../ca.crt" resolve unchanged.
+        top = posixpath.commonpath([posixpath.dirname(p) for p in (rel, *refs)])
 
-        def read_stream(stream):
-            for line in stream:
-                line = line.strip()
-                if not line:
+        def local(path):
+            return posixpath.relpath(path, top) if top else path
+
+        files = {local(rel): data}
+        digest = hashlib.sha256(data)
+        for member in refs:
+            files[local(member)] = refs[member]
+            digest.update(b"\0" + local(member).encode() + b"\0" + refs[member])
+        hosts = sorted({h for h, _, _ in config.remotes})
+        host, port, proto = config.remotes[0]
+        entry = {
+            "id": digest.hexdigest()[:32],
+            "name": name,
+            "file": local(rel),
+            "source": rel,
+            "hosts": hosts,
+            "country": _guess_country(name, hosts),
+            "proto": proto.split("-")[0].lower(),
+            "port": port,
+            "remotes": len(config.remotes),
+            "encryption": config.encryption,
+            "missing": missing,
+        }
+        self._store(entry, files)
+        return entry
+
+    def _store(self, entry, files):
+        # Idempotent: objects are named by content, so a racing or earlier copy is as good.
+        dest = self.root / "objects" / entry["id"]
+        if dest.exists():
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{entry['id']}.", dir=str(dest.parent)))
+        try:
+            for rel, blob in files.items():
+                path = tmp / rel
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(blob)
+            os.rename(tmp, dest)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not dest.exists():
+                raise
+
+    def import_source(self, source):
+        names = source.profiles()
+        added, duplicates, failed = [], [], []
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=LIBRARY_IMPORT_WORKERS, thread_name_prefix="vpn-import") as pool:
+            results = list(pool.map(lambda rel: self._try_prepare(source, rel), names))
+        with self._lock:
+            self._load()
+            entries = dict(self._entries)
+            now = time.time()
+            for rel, result in zip(names, results):
+                if isinstance(result, str):
+                    failed.append({"source": rel, "error": result})
                     continue
-                append_log(line)
-                if "Initialization Sequence Completed" in line:
-                    with state["lock"]:
-                        state["status"] = "connected"
-                        state["connect_start_time"] = time.time()
-                    append_log("VPN Connected!", "SUCCESS")
-                    cleanup_askpass()
-                    def fetch_public_ip_retry():
-                        for _ in range(5):
-                            fetch_public_ip()
-                            with state["lock"]:
-                                if state.get("public_ip") or state["status"] != "connected":
-                                    return
-                            time.sleep(2)
-                    threading.Thread(target=fetch_public_ip_retry, daemon=True).start()
-                if "AUTH_FAILED" in line or "auth-failure" in line.lower():
-                    append_log("VPN authentication failed.", "ERROR")
-                if "bad decrypt" in line.lower():
-                    append_log("Wrong private key password.", "ERROR")
-                if "tun0:" in line or ("established" in line.lower() and ("tun" in line or "/24" in line)):
-                    for m in re.finditer(r"(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})", line):
-                        a, b, c, d = int(m.group(1)), int(m.group(2)), int(m.group(3)), int(m.group(4))
-                        if (a == 10) or (a == 172 and 16 <= b <= 31) or (a == 192 and b == 168):
-                            with state["lock"]:
-                                state["ip"] = m.group(0)
-                            break
-
-        t1 = threading.Thread(target=read_stream, args=(proc.stdout,), daemon=True)
-        t2 = threading.Thread(target=read_stream, args=(proc.stderr,), daemon=True)
-        t1.start()
-        t2.start()
-        proc.wait()
-        t1.join(timeout=2)
-        t2.join(timeout=2)
-    except Exception as e:
-        append_log(str(e), "ERROR")
-    finally:
-        cleanup_askpass()
-        append_log("Disconnected.", "INFO")
-        with state["lock"]:
-            state["status"] = "disconnected"
-            state["vpn_process"] = None
-            state["pid"] = None
-            state["connect_start_time"] = None
-            state["ip"] = "---.---.---.---"
-            state["public_ip"] = None
-            state["down_mbps"] = 0.0
-            state["up_mbps"] = 0.0
-            state["ping_ms"] = None
-            state["_tun_rx_prev"] = None
-            state["_tun_tx_prev"] = None
-            state["_tun_time_prev"] = None
+                entry = result
+                existing = entries.get(entry["id"])
+                if existing is not None:
+                    duplicates.append({"source": rel, "id": existing["id"], "name": existing["name"]})
+                    continue
+                entry["path"] = str(self.root / "objects" / entry["id"] / entry["file"])
+                entry["imported_at"] = now
+                entries[entry["id"]] = entry
+                added.append({"source": rel, "id": entry["id"], "name": entry["name"]})
+            if added:
+                write_json_atomic(self._index_path, {"profiles": list(entries.values())})
+                self._set_entries(entries)
+        return {"added": added, "duplicates": duplicates, "failed": failed}
+
+    def _try_prepare(self, source, rel):
+        try:
+            return self._prepare(source, rel)
+        except (ValueError, OSError, zipfile.BadZipFile, RuntimeError) as e:
+            return str(e)
+
+    def get(self, profile_id):
+        with self._lock:
+            self._load()
+            return self._entries.get(profile_id)
+
+    def remove(self, profile_id):
+        with self._lock:
+            self._load()
+            if profile_id not in self._entries:
+                return False
+            entries = dict(self._entries)
+            del entries[profile_id]
+            write_json_atomic(self._index_path, {"profiles": list(entries.values())})
+            self._set_entries(entries)
+        shutil.rmtree(self.root / "objects" / profile_id, ignore_errors=True)
+        return True
+
+    def query(self, text=None, country=None, proto=None, port=None, offset=0, limit=LIBRARY_PAGE_SIZE):
+        with self._lock:
+            self._load()
+            rows = self._sorted
+            facets = self._facets
+        allowed = None
+        for key, value in (("country", country), ("proto", proto), ("port", port)):
+            if value is None:
+                continue
+            ids = facets[key].get(value, set())
+            allowed = ids if allowed is None else allowed & ids
+        if allowed is not None:
+            rows = [e for e in rows if e["id"] in allowed]
+        if text:
+            needle = text.lower()
+            rows = [e for e in rows if needle in e["name"].lower() or any(needle in h.lower() for h in e["hosts"])]
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "profiles": rows[offset:offset + limit],
+            "facets": {key: {str(v): len(ids) for v, ids in values.items()} for key, values in facets.items()},
+        }
+
+
+config_library = ConfigLibrary(LIBRARY_DIR)
+
+
+_HASHED_ASSET = re.compile(r"(?:^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/wasm")
+
+
+class StaticAsset:
+    def __init__(self, body, mimetype, etag, cache_control):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.cache_control = cache_control
+        self.variants = {}
+
+
+class StaticAssets:
+    # In-memory manifest of the built frontend: every file is read once, tagged with a
+    # content hash and, when it shrinks, pre-compressed (gzip, plus brotli if the module is
+    # installed; .gz/.br files emitted by the build are used as-is). Vite's content-hashed
+    # assets/ files never change under the same name, so they are marked immutable.
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._assets = None
+
+    def load(self):
+        assets = {}
+        if self.root.is_dir():
+            for path in sorted(self.root.rglob("*")):
+                if not path.is_file() or path.suffix in (".gz", ".br"):
+                    continue
+                rel = path.relative_to(self.root).as_posix()
+                try:
+                    assets[rel] = self._build(path, rel)
+                except OSError:
+                    continue
+        with self._lock:
+            self._assets = assets
+        return assets
+
+    def _build(self, path, rel):
+        body = path.read_bytes()
+        mimetype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        if _HASHED_ASSET.search(rel):
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "no-cache"
+        asset = StaticAsset(body, mimetype, etag, cache_control)
+        if len(body) < STATIC_COMPRESS_MIN or not mimetype.startswith(_COMPRESSIBLE_TYPES):
+            return asset
+        for encoding, suffix, compress in (("br", ".br", _brotli_compress), ("gzip", ".gz", _gzip_compress)):
+            prebuilt = path.with_name(path.name + suffix)
+            if prebuilt.is_file():
+                data = prebuilt.read_bytes()
+            elif compress is not None:
+                data = compress(body)
+            else:
+                continue
+            if len(data) < len(body):
+                asset.variants[encoding] = data
+        return asset
+
+    def get(self, rel):
+        with self._lock:
+            assets = self._assets
+        if assets is None:
+            with self._load_lock:
+                with self._lock:
+                    assets = self._assets
+                if assets is None:
+                    assets = self.load()
+        return assets.get(rel)
+
+    def response(self, asset):
+        encoding = None
+        if asset.variants:
+            accepted = request.accept_encodings
+            for candidate in ("br", "gzip"):
+                if candidate in asset.variants and accepted[candidate]:
+                    encoding = candidate
+                    break
+        # Each representation gets its own strong validator.
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(asset.variants[encoding] if encoding else asset.body, mimetype=asset.mimetype)
+            if encoding:
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = asset.cache_control
+        if asset.variants:
+            resp.headers["Vary"] = "Accept-Encoding"
+        return resp
+
+
+def _gzip_compress(data):
+    import gzip
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+try:
+    import brotli
+
+    def _brotli_compress(data):
+        return brotli.compress(data, quality=11)
+except ImportError:
+    _brotli_compress = None
+
+
+static_assets = StaticAssets(STATIC_DIR)
+
+
+def _status_payload(conn=None, profiles_rev=None):
+    if conn is None:
+        conn = connections.primary()
+    if conn is None:
+        payload = _idle_status_fields()
+        payload["logs"] = []
+    else:
+        payload = conn.status_fields()
+        payload["logs"] = [format_log(r) for r in conn.logs.tail(STATUS_LOG_TAIL)]
+    # Clients that pass back the profiles_rev they already hold skip the profile list.
+    rev = profile_store.rev()
+    payload["profiles_rev"] = rev
+    if profiles_rev != rev:
+        payload["saved_profiles"] = profile_store.list()
+    payload["connections"] = [c.status_fields() for c in connections.list()]
+    return payload
+
+
+def _requested_connection():
+    conn_id = request.args.get("id")
+    if conn_id is None and request.is_json:
+        conn_id = (request.get_json(silent=True) or {}).get("id")
+    if conn_id is None or conn_id == "":
+        return connections.primary(), None
+    conn = connections.get(conn_id)
+    if conn is None:
+        return None, (jsonify({"ok": False, "error": f"Unknown connection: {conn_id}"}), 404)
+    return conn, None
 
 
 @app.route("/api/status")
 def api_status():
-    with state["lock"]:
-        st = state["status"]
-        pid = state["pid"]
-        ip = state["ip"]
-        public_ip = state.get("public_ip")
-        config_file = state["config_file"]
-        encryption = state["encryption"]
-        connect_start = state["connect_start_time"]
-        down_mbps = state.get("down_mbps", 0.0)
-        up_mbps = state.get("up_mbps", 0.0)
-        ping_ms = state.get("ping_ms")
-    duration_seconds = 0
-    if connect_start and st == "connected":
-        duration_seconds = int(max(0, time.time() - connect_start))
-
-    saved_profiles = []
-    if SAVED_CREDENTIALS_FILE.exists():
+    conn, error = _requested_connection()
+    if error:
+        return error
+    return jsonify(_status_payload(conn, request.args.get("profiles_rev")))
+
+
+@app.route("/api/events")
+def api_events():
+    q = subscribe()
+
+    def stream():
         try:
-            with open(SAVED_CREDENTIALS_FILE) as f:
-                saved = json.load(f)
-                if "profiles" in saved:
-                    saved_profiles = saved["profiles"]
-                elif saved.get("config_path") or saved.get("password"):
-                    saved_profiles = [{"config_path": saved.get("config_path") or "", "password": saved.get("password") or ""}]
-        except Exception:
-            pass
-    for p in saved_profiles:
-        if "name" not in p and p.get("config_path"):
-            p["name"] = os.path.basename(p["config_path"])
+            yield _sse("snapshot", _status_payload())
+            while True:
+                try:
+                    msg = q.get(timeout=EVENT_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if msg is None:
+                    yield _sse("snapshot", _status_payload())
+                    continue
+                yield msg
+        finally:
+            unsubscribe(q)
 
-    return jsonify({
-        "connected": st == "connected",
-        "connecting": st == "connecting",
-        "status": st,
-        "duration_seconds": duration_seconds,
-        "ip": ip,
-        "public_ip": public_ip,
-        "pid": pid,
-        "down_mbps": down_mbps,
-        "up_mbps": up_mbps,
-        "ping_ms": ping_ms,
-        "config_file": config_file or "",
-        "config_name": os.path.basename(config_file) if config_file else "",
-        "encryption": encryption,
-        "saved_profiles": saved_profiles,
-        "logs": state["logs"][-200:],
-    })
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/api/connect", methods=["POST"])
 def api_connect():
     data = request.get_json() or {}
     config_path = (data.get("config_path") or "").strip()
+    if not config_path and data.get("library_id"):
+        entry = config_library.get(data["library_id"])
+        if entry is None:
+            return jsonify({"ok": False, "error": f"Unknown library profile: {data['library_id']}"}), 404
+        config_path = entry["path"]
     password = data.get("password") or ""
-    if not config_path or not os.path.exists(config_path):
+    config = config_cache.get(config_path) if config_path else None
+    if config is None:
         return jsonify({"ok": False, "error": "Select a valid .ovpn file."}), 400
+    problems = config.problems()
+    if problems:
+        return jsonify({"ok": False, "error": " ".join(problems), "problems": problems}), 400
     if not password:
         return jsonify({"ok": False, "error": "Enter your private key password."}), 400
-    with state["lock"]:
-        if state["vpn_process"] is not None:
-            return jsonify({"ok": False, "error": "Already connected or connecting."}), 400
 
     try:
-        SAVED_CREDENTIALS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        profiles = []
-        if SAVED_CREDENTIALS_FILE.exists():
-            try:
-                with open(SAVED_CREDENTIALS_FILE) as f:
-                    data = json.load(f)
-                    profiles = data.get("profiles") or []
-                    if not profiles and (data.get("config_path") or data.get("password")):
-                        profiles = [{"config_path": data.get("config_path") or "", "password": data.get("password") or ""}]
-            except Exception:
-                pass
-        found = False
-        for p in profiles:
-            if p.get("config_path") == config_path:
-                p["password"] = password
-                found = True
-                break
-        if not found:
-            profiles.append({"config_path": config_path, "password": password})
-        with open(SAVED_CREDENTIALS_FILE, "w") as f:
-            json.dump({"profiles": profiles}, f, indent=0)
-        os.chmod(SAVED_CREDENTIALS_FILE, 0o600)
+        profile_store.save(config_path, password)
     except Exception:
         pass
 
-    threading.Thread(target=run_vpn, args=(config_path, password), daemon=True).start()
-    return jsonify({"ok": True})
+    conn = connections.start(config_path, password, bool(data.get("auto_reconnect", AUTO_RECONNECT)))
+    if conn is None:
+        return jsonify({"ok": False, "error": "Already connected or connecting with this config."}), 400
+    return jsonify({"ok": True, "id": conn.id})
 
 
 @app.route("/api/disconnect", methods=["POST"])
 def api_disconnect():
-    with state["lock"]:
-        proc = state["vpn_process"]
-        state["vpn_process"] = None
-        state["pid"] = None
-        state["connect_start_time"] = None
-        state["status"] = "disconnected"
-        state["ip"] = "---.---.---.---"
-        state["public_ip"] = None
-        state["down_mbps"] = 0.0
-        state["up_mbps"] = 0.0
-        state["ping_ms"] = None
-    if proc:
-        try:
-            proc.terminate()
-        except Exception:
-            pass
-    try:
-        subprocess.run(["sudo", "killall", "openvpn"], capture_output=True, timeout=5)
-    except Exception:
-        pass
-    cleanup_askpass()
-    append_log("Disconnecting...", "INFO")
-    return jsonify({"ok": True})
+    data = request.get_json(silent=True) or {}
+    if data.get("all"):
+        targets = connections.active()
+    else:
+        conn, error = _requested_connection()
+        if error:
+            return error
+        targets = [conn] if conn is not None else []
+    jobs = [conn.disconnect() for conn in targets]
+    return jsonify({"ok": True, "ids": [c.id for c in targets], "jobs": [j.id for j in jobs]})
+
+
+def _logs_response(conn):
+    since = request.args.get("since", default=0, type=int)
+    limit = request.args.get("limit", default=None, type=int)
+    if limit is not None:
+        limit = max(0, limit)
+    if conn is None:
+        return jsonify({"logs": [], "cursor": max(since, 0), "last_seq": 0, "truncated": False})
+    records, truncated = conn.logs.since(max(0, since), limit)
+    return jsonify({
+        "id": conn.id,
+        "logs": [format_log(r) for r in records],
+        "cursor": records[-1][0] if records else max(since, 0),
+        "last_seq": conn.logs.last_seq(),
+        "truncated": truncated,
+    })
 
 
 @app.route("/api/logs")
 def api_logs():
-    with state["lock"]:
-        return jsonify({"logs": list(state["logs"])})
+    conn, error = _requested_connection()
+    if error:
+        return error
+    return _logs_response(conn)
+
+
+def _search_time(value):
+    # Accepts epoch seconds or an ISO 8601 timestamp (local time when no offset is given).
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return datetime.fromisoformat(value).timestamp()
+
+
+@app.route("/api/logs/search")
+def api_logs_search():
+    args = request.args
+    levels = [v.strip().upper() for v in args.get("level", "").split(",") if v.strip()]
+    unknown = [v for v in levels if v not in _LEVEL_INDEX]
+    if unknown:
+        return jsonify({"ok": False, "error": f"Unknown level: {', '.join(unknown)}"}), 400
+    try:
+        start = _search_time(args.get("from"))
+        end = _search_time(args.get("to"))
+    except ValueError:
+        return jsonify({"ok": False, "error": "from/to must be epoch seconds or ISO 8601"}), 400
+    limit = max(0, min(args.get("limit", default=LOG_SEARCH_LIMIT, type=int), LOG_SEARCH_MAX_LIMIT))
+    result = log_archive.search(
+        session=args.get("session") or None,
+        levels=levels,
+        text=args.get("q") or None,
+        start=start,
+        end=end,
+        limit=limit,
+    )
+    result["dropped"] = log_archive.dropped
+    return jsonify(result)
+
+
+@app.route("/api/logs/sessions")
+def api_logs_sessions():
+    return jsonify({"sessions": log_archive.sessions()})
+
+
+@app.route("/api/connections")
+def api_connections():
+    return jsonify({
+        "primary": connections.primary_id,
+        "connections": [c.status_fields() for c in connections.list()],
+    })
+
+
+@app.route("/api/connections/<conn_id>")
+def api_connection(conn_id):
+    conn = connections.get(conn_id)
+    if conn is None:
+        return jsonify({"ok": False, "error": f"Unknown connection: {conn_id}"}), 404
+    return jsonify(conn.status_fields())
+
+
+@app.route("/api/connections/<conn_id>/logs")
+def api_connection_logs(conn_id):
+    conn = connections.get(conn_id)
+    if conn is None:
+        return jsonify({"ok": False, "error": f"Unknown connection: {conn_id}"}), 404
+    return _logs_response(conn)
+
+
+@app.route("/api/connections/<conn_id>/disconnect", methods=["POST"])
+def api_connection_disconnect(conn_id):
+    conn = connections.get(conn_id)
+    if conn is None:
+        return jsonify({"ok": False, "error": f"Unknown connection: {conn_id}"}), 404
+    job = conn.disconnect()
+    return jsonify({"ok": True, "ids": [conn.id], "jobs": [job.id]})
+
+
+@app.route("/api/connections/<conn_id>/attempts")
+def api_connection_attempts(conn_id):
+    conn = connections.get(conn_id)
+    if conn is None:
+        return jsonify({"ok": False, "error": f"Unknown connection: {conn_id}"}), 404
+    with conn.lock:
+        attempts = [a.to_dict() for a in conn.attempts]
+    return jsonify({"id": conn.id, "attempts": attempts})
+
+
+@app.route("/api/connect-timings")
+def api_connect_timings():
+    limit = request.args.get("limit", default=20, type=int)
+    return jsonify({
+        "phases": list(CONNECT_PHASES),
+        "summary": connect_timings.summary(),
+        "recent": connect_timings.recent(limit),
+    })
+
+
+@app.route("/api/teardowns")
+def api_teardowns():
+    limit = request.args.get("limit", default=20, type=int)
+    return jsonify({"summary": teardowns.summary(), "recent": teardowns.recent(limit)})
+
+
+@app.route("/api/teardowns/<job_id>")
+def api_teardown(job_id):
+    job = teardowns.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": f"Unknown teardown: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route("/api/metrics/history")
+def api_metrics_history():
+    now = time.time()
+    end = request.args.get("to", default=now, type=float)
+    start = request.args.get("from", default=end - 600, type=float)
+    step = request.args.get("step", default=None, type=int)
+    if not (math.isfinite(start) and math.isfinite(end)):
+        return jsonify({"ok": False, "error": "'from' and 'to' must be finite timestamps."}), 400
+    if start > end:
+        return jsonify({"ok": False, "error": "'from' must not be after 'to'."}), 400
+    if step is not None and step <= 0:
+        return jsonify({"ok": False, "error": "'step' must be a positive number of seconds."}), 400
+    out_step, points = metrics_history.query(start, end, step, now=now)
+    return jsonify({"from": start, "to": end, "step": out_step, "points": points})
 
 
 def _native_browse_ovpn():
+    import subprocess
     try:
         r = subprocess.run(
             ["zenity", "--file-selection", "--title=Select OVPN config", "--file-filter=OVPN files (*.ovpn) | *.ovpn"],
@@ -555,28 +3916,143 @@ def api_upload_config():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+def _import_source():
+    # A .zip upload, .ovpn uploads together with the files they reference, or {"path": ...}
+    # naming a local zip or directory (the desktop shell runs the backend on the same machine).
+    files = request.files.getlist("file")
+    if files:
+        if len(files) == 1 and files[0].filename.lower().endswith(".zip"):
+            data = files[0].read(LIBRARY_MAX_IMPORT_BYTES + 1)
+            if len(data) > LIBRARY_MAX_IMPORT_BYTES:
+                raise ValueError("Archive exceeds the size limit.")
+            return _ImportSource.from_zip(io.BytesIO(data))
+        return _ImportSource.from_uploads(files)
+    path = ((request.get_json(silent=True) or {}).get("path") or "").strip()
+    if not path:
+        raise ValueError("Upload a .zip or .ovpn files, or give a directory path.")
+    path = os.path.expanduser(path)
+    if os.path.isdir(path):
+        return _ImportSource.from_directory(path)
+    if os.path.isfile(path) and zipfile.is_zipfile(path):
+        return _ImportSource.from_zip(path)
+    raise ValueError(f"Not a directory or zip archive: {path}")
+
+
+@app.route("/api/speedtest", methods=["GET", "POST"])
+def api_speedtest():
+    if request.method == "GET":
+        current = speed_tests.current
+        return jsonify({
+            "current": current.to_dict() if current is not None else None,
+            "recent": [job.to_dict() for job in speed_tests.list()],
+        })
+    data = request.get_json(silent=True) or {}
+    url = (data.get("url") or SPEEDTEST_URL).strip()
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https") or not urllib.parse.urlsplit(url).hostname:
+        return jsonify({"ok": False, "error": f"Not an http(s) URL: {url}"}), 400
+    try:
+        streams = max(1, min(int(data.get("streams", SPEEDTEST_STREAMS)), SPEEDTEST_MAX_STREAMS))
+        duration = max(1.0, min(float(data.get("duration", SPEEDTEST_DURATION)), SPEEDTEST_MAX_DURATION))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "streams and duration must be numbers."}), 400
+    conn, error = _requested_connection()
+    if error:
+        return error
+    job = speed_tests.start(url, streams, duration, conn if conn is not None and conn.status == "connected" else None)
+    if job is None:
+        return jsonify({"ok": False, "error": "A speed test is already running.", "job": speed_tests.current.id}), 409
+    return jsonify({"ok": True, "job": job.id}), 202
+
+
+@app.route("/api/speedtest/<job_id>", methods=["GET", "DELETE"])
+def api_speedtest_job(job_id):
+    job = speed_tests.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": f"Unknown speed test: {job_id}"}), 404
+    if request.method == "DELETE":
+        return jsonify({"ok": speed_tests.cancel(job)})
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/library/import", methods=["POST"])
+def api_library_import():
+    try:
+        source = _import_source()
+    except (ValueError, OSError, zipfile.BadZipFile) as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if not source.profiles():
+        return jsonify({"ok": False, "error": "No .ovpn files found."}), 400
+    result = config_library.import_source(source)
+    return jsonify({"ok": True, **result})
+
+
+@app.route("/api/library")
+def api_library():
+    args = request.args
+    offset = max(0, args.get("offset", default=0, type=int))
+    limit = max(0, min(args.get("limit", default=LIBRARY_PAGE_SIZE, type=int), LIBRARY_MAX_PAGE_SIZE))
+    return jsonify(config_library.query(
+        text=args.get("q") or None,
+        country=args.get("country", "").lower() or None,
+        proto=args.get("proto", "").lower() or None,
+        port=args.get("port", type=int),
+        offset=offset,
+        limit=limit,
+    ))
+
+
+@app.route("/api/library/<profile_id>", methods=["GET", "DELETE"])
+def api_library_profile(profile_id):
+    if request.method == "DELETE":
+        if not config_library.remove(profile_id):
+            return jsonify({"ok": False, "error": f"Unknown library profile: {profile_id}"}), 404
+        return jsonify({"ok": True})
+    entry = config_library.get(profile_id)
+    if entry is None:
+        return jsonify({"ok": False, "error": f"Unknown library profile: {profile_id}"}), 404
+    return jsonify(entry)
+
+
 @app.route("/")
 def index():
-    if STATIC_DIR.exists():
-        return send_from_directory(STATIC_DIR, "index.html")
+    asset = static_assets.get("index.html")
+    if asset is not None:
+        return static_assets.response(asset)
     return "<h1>VPN Connect</h1><p>Frontend not built. Run: cd vpn-connect && npm run build</p>", 404
 
 
 @app.route("/<path:path>")
 def serve_static(path):
-    if not STATIC_DIR.exists():
+    asset = static_assets.get(path)
+    if asset is not None:
+        return static_assets.response(asset)
+    # Client-side routes fall back to the app shell; a missing file (anything with an
+    # extension, or under api/ or assets/) is a real 404.
+    last = path.rsplit("/", 1)[-1]
+    if "." in last or path.startswith(("api/", "assets/")):
         return "Not found", 404
-    file_path = STATIC_DIR / path
-    if file_path.is_file():
-        return send_from_directory(STATIC_DIR, path)
-    return send_from_directory(STATIC_DIR, "index.html")
+    asset = static_assets.get("index.html")
+    if asset is None:
+        return "Not found", 404
+    return static_assets.response(asset)
 
 
-def main():
-    threading.Thread(target=_throughput_loop, daemon=True).start()
-    threading.Thread(target=_ping_loop, daemon=True).start()
+def _sd_notify(message):
+    # systemd-style readiness for service managers that pass NOTIFY_SOCKET.
+    path = os.environ.get("NOTIFY_SOCKET")
+    if not path:
+        return
+    if path.startswith("@"):
+        path = "\0" + path[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message.encode(), path)
+    except OSError:
+        pass
+
 
-    port = 8765
+def main():
+    port = DEFAULT_PORT
     open_browser = True
     for arg in sys.argv[1:]:
         if arg.startswith("--port="):
@@ -589,10 +4065,18 @@ def main():
     if not STATIC_DIR.exists():
         print("Warning: Frontend not built. Run: cd vpn-connect && npm run build", file=sys.stderr)
 
+    # Bind first and announce readiness; everything else (asset manifest, browser) happens
+    # after the shell has been told it can load the UI.
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    port = server.server_port
     url = f"http://127.0.0.1:{port}"
+    print(f"VPN Connect backend at {url}")
+    print(f"READY port={port}", flush=True)
+    _sd_notify("READY=1")
+
+    threading.Thread(target=static_assets.get, args=("index.html",), daemon=True).start()
     if open_browser:
         def open_later():
-            time.sleep(1.2)
             try:
                 import webbrowser
                 webbrowser.open(url)
@@ -600,8 +4084,10 @@ def main():
                 pass
         threading.Thread(target=open_later, daemon=True).start()
 
-    print(f"VPN Connect backend at {url}")
-    app.run(host="127.0.0.1", port=port, threaded=True, use_reloader=False)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
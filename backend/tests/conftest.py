@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = BACKEND_DIR / "bench"
+
+# server reads its paths and overrides from the environment at import time, so the
+# sandbox has to be in place before any test module imports it: a throwaway HOME, the
+# fake openvpn, a fake sysfs tree and a public-IP lookup that fails fast on localhost.
+_SANDBOX = Path(tempfile.mkdtemp(prefix="vpn-connect-tests-"))
+(_SANDBOX / "sysfs").mkdir()
+os.environ["HOME"] = str(_SANDBOX / "home")
+os.environ["VPN_CONNECT_OPENVPN"] = f"{sys.executable} {BENCH_DIR / 'fake_openvpn.py'}"
+os.environ["VPN_CONNECT_SYSFS_NET"] = str(_SANDBOX / "sysfs")
+os.environ["VPN_CONNECT_PUBLIC_IP_URLS"] = "http://127.0.0.1:9/"
+os.environ["FAKE_OPENVPN_SYSFS"] = str(_SANDBOX / "sysfs")
+os.environ.setdefault("FAKE_OPENVPN_CONNECT_DELAY", "0.1")
+
+sys.path.insert(0, str(BACKEND_DIR))
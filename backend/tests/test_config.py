@@ -0,0 +1,79 @@
+import server
+
+PROFILE = """\
+client
+dev tun
+proto udp
+port 1195
+remote vpn1.example.com
+remote vpn2.example.com 443 tcp
+remote 198.51.100.7 1194
+cipher AES-256-CBC
+data-ciphers AES-256-GCM:CHACHA20-POLY1305
+auth SHA256
+ca "my ca.crt"
+cert 'client cert.crt'
+key client\\ key.key
+# ca commented-out.crt
+; remote commented.example.com
+<tls-crypt>
+-----BEGIN OpenVPN Static key V1-----
+abcdef
+-----END OpenVPN Static key V1-----
+</tls-crypt>
+"""
+
+
+def test_parse_remotes_and_options():
+    config = server.OvpnConfig.parse("/etc/vpn/a.ovpn", PROFILE)
+    assert config.remotes == [
+        ("vpn1.example.com", 1195, "udp"),
+        ("vpn2.example.com", 443, "tcp"),
+        ("198.51.100.7", 1194, "udp"),
+    ]
+    assert config.dev == "tun"
+    assert config.cipher == "AES-256-CBC"
+    assert config.data_ciphers == ["AES-256-GCM", "CHACHA20-POLY1305"]
+    assert config.encryption == "AES-256-GCM"
+    assert config.auth == "SHA256"
+    assert config.raceable
+
+
+def test_parse_quoted_file_arguments():
+    config = server.OvpnConfig.parse("/etc/vpn/a.ovpn", PROFILE)
+    assert config.files == {"ca": "my ca.crt", "cert": "client cert.crt", "key": "client key.key"}
+
+
+def test_parse_inline_blocks():
+    config = server.OvpnConfig.parse("/etc/vpn/a.ovpn", PROFILE)
+    assert "abcdef" in config.inline["tls-crypt"]
+    assert config.inline["tls-crypt"].endswith("\n")
+    assert config.tls_wrapped
+
+
+def test_connection_blocks_and_remote_random_are_not_raced():
+    text = "<connection>\nremote a.example.com 1194 udp\n</connection>\n<connection>\nremote b.example.com 443 tcp\n</connection>\n"
+    config = server.OvpnConfig.parse("a.ovpn", text)
+    assert config.connection_blocks == 2
+    assert [r[0] for r in config.remotes] == ["a.example.com", "b.example.com"]
+    assert not config.raceable
+    assert not server.OvpnConfig.parse("b.ovpn", "remote a 1\nremote b 2\nremote-random\n").raceable
+
+
+def test_inline_marker_is_not_a_file():
+    config = server.OvpnConfig.parse("a.ovpn", "remote a\ntls-auth [inline] 1\n<tls-auth>\nk\n</tls-auth>\n")
+    assert config.files == {}
+    assert config.tls_wrapped
+
+
+def test_unbalanced_quote_falls_back_to_whitespace():
+    config = server.OvpnConfig.parse("a.ovpn", 'remote a\nca "broken.crt\n')
+    assert config.files == {"ca": '"broken.crt'}
+
+
+def test_problems(tmp_path):
+    (tmp_path / "my ca.crt").write_text("ca")
+    path = tmp_path / "a.ovpn"
+    config = server.OvpnConfig.parse(str(path), 'remote a\nca "my ca.crt"\nkey missing.key\n')
+    assert config.problems() == ["File for 'key' not found: missing.key"]
+    assert server.OvpnConfig.parse(str(path), "client\n").problems() == ["Profile has no remote server."]
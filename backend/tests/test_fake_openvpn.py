@@ -0,0 +1,41 @@
+import time
+
+import server
+
+PROFILE = "client\ndev tun\nproto udp\nremote 127.0.0.1 1194\ncipher AES-256-GCM\n"
+
+
+def _wait(predicate, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_connect_disconnect_cycle(tmp_path):
+    # One full cycle against bench/fake_openvpn.py (see conftest): spawn, management
+    # attach, CONNECTED over the management socket, then teardown via "signal SIGTERM".
+    profile = tmp_path / "fake.ovpn"
+    profile.write_text(PROFILE)
+    conn = server.connections.start(str(profile), "secret", auto_reconnect=False)
+    assert conn is not None
+    try:
+        assert _wait(lambda: conn.status == "connected"), conn.logs.tail(20)
+        assert _wait(lambda: conn.management is not None and conn.management.pid)
+        status = conn.status_fields()
+        assert status["connected"]
+        assert status["ip"].startswith("10.")
+        assert server.connections.start(str(profile), "secret") is None
+    finally:
+        job = conn.disconnect()
+    assert _wait(lambda: job.outcome is not None)
+    assert job.outcome == "exited"
+    assert job.stages[-1]["stage"] == "signal"
+    assert _wait(conn.done.is_set)
+    messages = [r[3] for r in conn.logs.tail(50)]
+    assert "Disconnecting..." in messages
+    assert messages[-1] == "Disconnected."
+    assert messages.index("Disconnecting...") < messages.index("Disconnected.")
+    assert conn.attempt.phases.get("completed")
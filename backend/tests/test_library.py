@@ -0,0 +1,110 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import server
+
+
+def _profile(host, port=1194, proto="udp", ca="ca.crt"):
+    return f"client\nremote {host} {port} {proto}\nca {ca}\n".encode()
+
+
+BUNDLE = {
+    "configs/us-nyc.ovpn": _profile("us-nyc.example.com", ca="../ca.crt"),
+    "configs/de-fra.ovpn": _profile("de-fra.example.com", 443, "tcp", ca="../ca.crt"),
+    "nl-ams.ovpn": _profile("nl-ams.example.com"),
+    "ca.crt": b"CA",
+}
+
+
+def _zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def _added(result):
+    return sorted(a["source"] for a in result["added"])
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    library = server.ConfigLibrary(tmp_path / "library")
+    monkeypatch.setattr(server, "config_library", library)
+    return library
+
+
+def test_zip_import_keeps_bundle_layout(library):
+    result = library.import_source(server._ImportSource.from_zip(_zip(BUNDLE)))
+    assert _added(result) == ["configs/de-fra.ovpn", "configs/us-nyc.ovpn", "nl-ams.ovpn"]
+    assert result["failed"] == []
+    by_name = {e["name"]: e for e in library.query()["profiles"]}
+    assert all(e["missing"] == [] for e in by_name.values())
+    nyc = Path(by_name["us-nyc.ovpn"]["path"])
+    assert (nyc.parent / "../ca.crt").resolve().read_bytes() == b"CA"
+    assert server.OvpnConfig.parse(str(nyc), nyc.read_text()).problems() == []
+
+
+def test_reimport_is_deduplicated(library):
+    library.import_source(server._ImportSource.from_zip(_zip(BUNDLE)))
+    moved = {f"vpn/{name}": data for name, data in BUNDLE.items()}
+    again = library.import_source(server._ImportSource.from_zip(_zip(moved)))
+    assert again["added"] == []
+    assert len(again["duplicates"]) == 3
+    assert library.query()["total"] == 3
+
+
+def test_directory_import_resolves_parent_references(library, tmp_path):
+    root = tmp_path / "bundle"
+    for name, data in BUNDLE.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_bytes(data)
+    (root / "notes.txt").write_text("not a profile")
+    result = library.import_source(server._ImportSource.from_directory(root))
+    assert len(result["added"]) == 3
+    assert all(e["missing"] == [] for e in library.query()["profiles"])
+
+
+def test_missing_and_escaping_references_are_reported(library):
+    files = {"a/us-1.ovpn": _profile("h1", ca="../../outside.crt"), "b/us-2.ovpn": _profile("h2", ca="gone.crt")}
+    library.import_source(server._ImportSource.from_zip(_zip(files)))
+    missing = {e["name"]: e["missing"] for e in library.query()["profiles"]}
+    assert missing == {"us-1.ovpn": ["../../outside.crt"], "us-2.ovpn": ["gone.crt"]}
+
+
+def test_upload_import_keeps_key_files(library):
+    client = server.app.test_client()
+    data = {"file": [(io.BytesIO(_profile("se-sto.example.com")), "se-sto.ovpn"), (io.BytesIO(b"CA"), "ca.crt")]}
+    r = client.post("/api/library/import", data=data, content_type="multipart/form-data")
+    assert r.status_code == 200
+    assert [a["name"] for a in r.get_json()["added"]] == ["se-sto.ovpn"]
+    entry = library.query()["profiles"][0]
+    assert entry["missing"] == []
+    assert (Path(entry["path"]).parent / "ca.crt").read_bytes() == b"CA"
+
+
+def test_upload_without_profiles_is_rejected(library):
+    client = server.app.test_client()
+    data = {"file": [(io.BytesIO(b"CA"), "ca.crt")]}
+    r = client.post("/api/library/import", data=data, content_type="multipart/form-data")
+    assert r.status_code == 400
+
+
+def test_library_route_filters_and_pages(library):
+    library.import_source(server._ImportSource.from_zip(_zip(BUNDLE)))
+    client = server.app.test_client()
+    page = client.get("/api/library?limit=2").get_json()
+    assert page["total"] == 3
+    assert [p["name"] for p in page["profiles"]] == ["de-fra.ovpn", "nl-ams.ovpn"]
+    rest = client.get("/api/library?limit=2&offset=2").get_json()
+    assert [p["name"] for p in rest["profiles"]] == ["us-nyc.ovpn"]
+    assert page["facets"]["country"] == {"de": 1, "nl": 1, "us": 1}
+    assert [p["name"] for p in client.get("/api/library?proto=tcp").get_json()["profiles"]] == ["de-fra.ovpn"]
+    assert [p["name"] for p in client.get("/api/library?port=1194&country=US").get_json()["profiles"]] == ["us-nyc.ovpn"]
+    assert [p["name"] for p in client.get("/api/library?q=ams.example").get_json()["profiles"]] == ["nl-ams.ovpn"]
+    assert client.get("/api/library?country=fr").get_json()["total"] == 0
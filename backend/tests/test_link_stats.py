@@ -0,0 +1,74 @@
+import asyncio
+import socket
+
+import pytest
+
+import server
+
+
+def _sysfs_dev(root, dev, rx_bytes):
+    stats = root / dev / "statistics"
+    stats.mkdir(parents=True)
+    for name in server.LINK_STAT_FIELDS:
+        (stats / name).write_text(str(rx_bytes if name == "rx_bytes" else 0))
+    (root / dev / "operstate").write_text("unknown\n")
+
+
+def test_sysfs_tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "SYSFS_NET_DIR", str(tmp_path))
+    _sysfs_dev(tmp_path, "tun7", 1234)
+    reader = server.LinkStatsReader()
+    stats = asyncio.run(reader.read("tun7"))
+    assert reader.method == "sysfs"
+    assert stats["rx_bytes"] == 1234 and stats["up"]
+    assert asyncio.run(reader.read("tun8")) is None
+
+
+def test_netlink_loopback(monkeypatch):
+    monkeypatch.setattr(server, "SYSFS_NET_DIR", "")
+    reader = server.LinkStatsReader()
+    try:
+        stats = asyncio.run(reader.read("lo"))
+        if reader.method != "netlink":
+            pytest.skip("RTNETLINK is not available here")
+        assert stats["up"]
+        assert set(server.LINK_STAT_FIELDS) <= set(stats)
+        assert asyncio.run(reader.read("nonexistent0")) is None
+        assert reader.method == "netlink"
+    finally:
+        reader.close()
+
+
+def test_stalled_netlink_does_not_block_the_loop(tmp_path, monkeypatch):
+    # A socket that never answers stands in for a stuck netlink reply: the loop keeps
+    # running while the read waits, and the reader then falls back to sysfs for good.
+    monkeypatch.setattr(server, "SYSFS_NET_DIR", str(tmp_path))
+    monkeypatch.setattr(server, "LINK_STATS_TIMEOUT", 0.3)
+    _sysfs_dev(tmp_path, "tun7", 99)
+    reader = server.LinkStatsReader()
+    mute, peer = socket.socketpair()
+    mute.setblocking(False)
+    reader._sock = mute
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        stats = await reader.read("tun7")
+        ticker.cancel()
+        return stats, ticks
+
+    try:
+        stats, ticks = asyncio.run(run())
+    finally:
+        peer.close()
+    assert ticks >= 10
+    assert stats["rx_bytes"] == 99
+    assert reader.method == "sysfs"
+    assert reader._sock is False
@@ -0,0 +1,104 @@
+import gzip
+import json
+
+import server
+
+T0 = 1_700_000_000.0
+
+
+def _append(archive, session, n, start=0, level="INFO", text="line", ts=T0):
+    for i in range(start, start + n):
+        archive.append(session, "1", (i, ts + i, server.LOG_LEVELS.index(level), f"{text} {i}"))
+    archive.flush()
+
+
+def test_rotation_gzips_segments_and_indexes_them(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=2048, max_bytes=1 << 20)
+    for batch in range(6):
+        _append(archive, "s1", 20, start=batch * 20)
+    segments = sorted(tmp_path.glob("segment-*.jsonl.gz"))
+    assert len(segments) >= 2
+    with gzip.open(segments[0], "rt") as f:
+        first = json.loads(f.readline())
+    assert first["s"] == "s1" and first["m"] == "line 0"
+    index = json.loads((tmp_path / "index.json").read_text())
+    assert [e["file"] for e in index["segments"]] == [p.name for p in segments]
+    assert sum(e["lines"] for e in index["segments"]) + archive._active["lines"] == 120
+
+
+def test_rotation_prunes_oldest_over_budget(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=1024, max_bytes=1500)
+    for batch in range(10):
+        _append(archive, "s1", 20, start=batch * 20)
+    segments = sorted(tmp_path.glob("segment-*.jsonl.gz"))
+    assert segments
+    assert segments[0].name != "segment-000001.jsonl.gz"
+    assert sum(p.stat().st_size for p in segments) <= 1500 or len(segments) == 1
+
+
+def test_search_filters_and_orders(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=2048)
+    _append(archive, "s1", 50)
+    _append(archive, "s2", 5, start=100, level="ERROR", text="TLS handshake failed")
+    _append(archive, "s1", 50, start=200)
+    r = archive.search(levels=("ERROR",))
+    assert [x["message"] for x in r["results"]] == [f"TLS handshake failed {i}" for i in range(100, 105)]
+    assert all(x["session"] == "s2" and x["level"] == "ERROR" for x in r["results"])
+    assert archive.search(text="handshake FAILED 103")["results"][0]["timestamp"] == T0 + 103
+    assert archive.search(session="s2", text="line")["results"] == []
+    window = archive.search(session="s1", start=T0 + 10, end=T0 + 19)["results"]
+    assert [x["message"] for x in window] == [f"line {i}" for i in range(10, 20)]
+
+
+def test_search_limit_keeps_newest_and_skips_ruled_out_segments(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=1024)
+    for batch in range(8):
+        _append(archive, "s1", 20, start=batch * 20)
+    r = archive.search(session="s1", limit=5)
+    assert [x["message"] for x in r["results"]] == [f"line {i}" for i in range(155, 160)]
+    assert r["truncated"]
+    assert r["segments_scanned"] < r["segments_matched"]
+    late = archive.search(start=T0 + 150)
+    assert late["segments_matched"] < late["segments_indexed"]
+
+
+def test_sessions_merge_across_segments(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=1024)
+    _append(archive, "s1", 60)
+    _append(archive, "s2", 3, start=100, level="ERROR")
+    sessions = {s["session"]: s for s in archive.sessions()}
+    assert sessions["s1"]["lines"] == 60
+    assert sessions["s2"]["levels"] == {"ERROR": 3}
+
+
+def test_reopen_recovers_active_file(tmp_path):
+    archive = server.LogArchive(tmp_path, segment_bytes=1 << 20)
+    _append(archive, "s1", 10)
+    reopened = server.LogArchive(tmp_path)
+    assert len(reopened.search(session="s1")["results"]) == 10
+    assert list(tmp_path.glob("segment-*.jsonl.gz"))
+
+
+def _messages(archive, text):
+    return [r["message"] for r in archive.search(text=text)["results"]]
+
+
+def _archive_with(tmp_path, *messages):
+    archive = server.LogArchive(tmp_path)
+    for i, message in enumerate(messages):
+        archive.append("s1", "1", (i, T0 + i, server.LOG_LEVELS.index("ERROR"), message))
+    archive.flush()
+    return archive
+
+
+def test_search_matches_non_ascii_and_quotes(tmp_path):
+    # Segment lines are JSON, which escapes these; the raw-line prefilter must not hide them.
+    archive = _archive_with(tmp_path, 'Cannot load "my ca.crt": café', "plain line")
+    assert _messages(archive, "café") == ['Cannot load "my ca.crt": café']
+    assert _messages(archive, '"MY CA.crt"') == ['Cannot load "my ca.crt": café']
+    assert _messages(archive, "plain") == ["plain line"]
+
+
+def test_search_matches_backslashes(tmp_path):
+    archive = _archive_with(tmp_path, r"Reading key from C:\keys\client.key", "plain line")
+    assert _messages(archive, r"C:\keys") == [r"Reading key from C:\keys\client.key"]
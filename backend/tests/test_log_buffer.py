@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+
+import server
+
+
+def _fill(buf, n):
+    for i in range(n):
+        buf.append("INFO", f"line {i + 1}", ts=1700000000 + i)
+
+
+def _seqs(records):
+    return [r[0] for r in records]
+
+
+def _contiguous(seqs):
+    return seqs == list(range(seqs[0], seqs[0] + len(seqs))) if seqs else True
+
+
+def test_since_returns_records_after_seq():
+    buf = server.LogBuffer(8)
+    _fill(buf, 5)
+    records, truncated = buf.since(2)
+    assert _seqs(records) == [3, 4, 5]
+    assert not truncated
+    assert buf.last_seq() == 5
+
+
+def test_since_caught_up_is_empty():
+    buf = server.LogBuffer(8)
+    _fill(buf, 3)
+    assert buf.since(3) == ([], False)
+
+
+def test_since_after_lapping_reports_truncation():
+    buf = server.LogBuffer(4)
+    _fill(buf, 10)
+    records, truncated = buf.since(2)
+    assert _seqs(records) == [7, 8, 9, 10]
+    assert truncated
+    assert [r[3] for r in records] == ["line 7", "line 8", "line 9", "line 10"]
+
+
+def test_since_within_window_after_lapping_is_not_truncated():
+    buf = server.LogBuffer(4)
+    _fill(buf, 10)
+    records, truncated = buf.since(7)
+    assert _seqs(records) == [8, 9, 10]
+    assert not truncated
+
+
+def test_since_limit_pages_forward():
+    buf = server.LogBuffer(16)
+    _fill(buf, 10)
+    first, _ = buf.since(0, limit=4)
+    second, _ = buf.since(first[-1][0], limit=4)
+    assert _seqs(first) == [1, 2, 3, 4]
+    assert _seqs(second) == [5, 6, 7, 8]
+
+
+def test_tail_is_capped_by_capacity():
+    buf = server.LogBuffer(4)
+    _fill(buf, 6)
+    assert _seqs(buf.tail(3)) == [4, 5, 6]
+    assert _seqs(buf.tail(100)) == [3, 4, 5, 6]
+
+
+def test_level_is_stored_as_index():
+    buf = server.LogBuffer(4)
+    buf.append("ERROR", "boom")
+    assert buf.tail(1)[0][2] == server.LOG_LEVELS.index("ERROR")
+
+
+def test_concurrent_reader_sees_contiguous_records():
+    # A writer lapping a small ring while a reader follows it with since(); frequent
+    # thread switches preempt the reader mid-copy. Every result must be contiguous, and
+    # an untruncated one must pick up right after the cursor.
+    buf = server.LogBuffer(256)
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            buf.append("INFO", "x")
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        cursor = 0
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            records, truncated = buf.since(cursor)
+            seqs = _seqs(records)
+            assert _contiguous(seqs)
+            if seqs and not truncated:
+                assert seqs[0] == cursor + 1
+            if seqs:
+                cursor = seqs[-1]
+            assert _contiguous(_seqs(buf.tail(64)))
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(interval)
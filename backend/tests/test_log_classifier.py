@@ -0,0 +1,45 @@
+import server
+
+TS = "2024-05-01 12:00:00 us=123456 "
+
+
+def _classify(line):
+    level, events = server.LOG_CLASSIFIER.classify(line)
+    return level, [e for e, _ in events]
+
+
+def test_events_and_fields():
+    level, events = server.LOG_CLASSIFIER.classify(TS + "net_addr_v4_add: 10.8.0.6/24 dev tun0")
+    assert level == "TUN"
+    assert events == [("ifconfig", {"ip": "10.8.0.6", "dev": "tun0"})]
+    push = TS + "PUSH: Received control message: 'PUSH_REPLY,route 10.8.0.1,ifconfig 10.8.0.6 10.8.0.5'"
+    assert _classify(push) == ("INFO", ["push_reply", "ifconfig"])
+
+
+def test_highest_priority_level_wins():
+    assert _classify(TS + "TLS Error: TLS handshake failed")[0] == "TLS"
+    assert _classify("ERROR: tun0: TCP connect failed")[0] == "ERROR"
+    assert _classify(TS + "Initialization Sequence Completed with ERROR")[0] == "SUCCESS"
+    assert _classify("tun0: link up")[0] == "TUN"
+    assert _classify("tunnel ready")[0] == "INFO"
+
+
+def test_level_only_rules_apply_without_timestamp():
+    assert _classify("Attempting to establish TCP connection") == ("TCP", [])
+    assert _classify("Connecting to [AF_INET]198.51.100.7:1194") == ("TCP", [])
+
+
+def test_data_plane_lines_are_info():
+    for message in ("RWRwrWRw", "TUN READ [84]", "UDPv4 WRITE [133] to [AF_INET]203.0.113.7:1194: P_DATA_V2"):
+        assert _classify(TS + message) == ("INFO", [])
+        assert _classify(message) == ("INFO", [])
+    # TCP trace lines are not data-plane prefixes; they keep their TCP level.
+    assert _classify(TS + "TCPv4_CLIENT WRITE [10] to [AF_INET]203.0.113.7:443")[0] == "TCP"
+    assert _classify(TS + "Restart pause, 5 second(s)")[0] == "INFO"
+
+
+def test_add_rule_recompiles():
+    classifier = server.LogClassifier(server.LOG_RULES)
+    assert classifier.classify("custom marker")[1] == ()
+    classifier.add_rule("custom", "custom marker", level="ERROR")
+    assert classifier.classify("custom marker") == ("ERROR", [("custom", {})])
@@ -0,0 +1,65 @@
+import server
+
+
+def _client():
+    events = {"state": [], "bytecount": [], "log": []}
+    client = server.ManagementClient(
+        "/nonexistent",
+        on_state=lambda *fields: events["state"].append(fields),
+        on_bytecount=lambda rx, tx: events["bytecount"].append((rx, tx)),
+        on_log=lambda message, flags: events["log"].append((message, flags)),
+    )
+    return client, events
+
+
+def test_state_notification():
+    client, events = _client()
+    client.handle_line(">STATE:1700000000,CONNECTED,SUCCESS,10.8.0.6,198.51.100.1,1194,,")
+    assert events["state"] == [("CONNECTED", "SUCCESS", "10.8.0.6", "198.51.100.1", "1194")]
+
+
+def test_short_state_is_padded():
+    client, events = _client()
+    client.handle_line(">STATE:1700000000,WAIT")
+    assert events["state"] == [("WAIT", "", "", "", "")]
+
+
+def test_state_on_all_history_replay():
+    # "state on all" replays the history as bare records, then END.
+    client, events = _client()
+    for line in (
+        "1700000000,RESOLVE,,,,,,",
+        "1700000001,WAIT,,,,,,",
+        "1700000002,CONNECTED,SUCCESS,10.8.0.6,198.51.100.1,1194,,",
+        "END",
+    ):
+        client.handle_line(line)
+    assert [s[0] for s in events["state"]] == ["RESOLVE", "WAIT", "CONNECTED"]
+
+
+def test_bare_lines_that_are_not_states_are_ignored():
+    client, events = _client()
+    client.handle_line("1700000000,lowercase,not-a-state")
+    client.handle_line("12,34")
+    client.handle_line("SUCCESS: bytecount interval changed")
+    client.handle_line(">INFO:OpenVPN Management Interface Version 5")
+    assert events["state"] == []
+
+
+def test_bytecount():
+    client, events = _client()
+    client.handle_line(">BYTECOUNT:1024,2048")
+    client.handle_line(">BYTECOUNT:garbage,1")
+    assert events["bytecount"] == [(1024, 2048)]
+
+
+def test_log_notification_keeps_commas_in_message():
+    client, events = _client()
+    client.handle_line(">LOG:1700000000,I,Peer Connection Initiated with [AF_INET]1.2.3.4:1194, sid=1")
+    assert events["log"] == [("Peer Connection Initiated with [AF_INET]1.2.3.4:1194, sid=1", "I")]
+
+
+def test_pid_reply():
+    client, _ = _client()
+    client.handle_line("SUCCESS: pid=4242")
+    assert client.pid == 4242
@@ -0,0 +1,55 @@
+import server
+
+NOW = 1_700_000_000.0
+
+
+def _history(seconds=120):
+    history = server.MetricsHistory(tiers=((1, 600), (60, 60)))
+    for i in range(seconds):
+        history.record(NOW - seconds + i, rx_mbps=10.0, tx_mbps=2.0, ping_ms=20.0 if i % 2 else None, connected=True)
+    return history
+
+
+def test_recent_window_uses_finest_tier():
+    step, points = _history().query(NOW - 10, NOW, now=NOW)
+    assert step == 1
+    assert len(points) == 10
+    assert points[0]["rx_mbps"] == 10.0
+    assert points[0]["connected"] == 1.0
+
+
+def test_requested_step_aggregates():
+    step, points = _history().query(NOW - 60, NOW, step=10, now=NOW)
+    assert step == 10
+    assert len(points) == 6
+    assert all(p["tx_mbps"] == 2.0 and p["ping_ms"] == 20.0 for p in points)
+
+
+def test_old_window_falls_back_to_coarser_tier():
+    step, points = _history().query(NOW - 3600, NOW, now=NOW)
+    assert step == 60
+    assert points
+
+
+def test_window_is_clamped_to_tier_and_now():
+    history = _history()
+    step, points = history.query(-1e11, NOW + 1e9, now=NOW)
+    assert step == 60
+    assert all(NOW - 3600 <= p["t"] <= NOW for p in points)
+
+
+def test_window_entirely_outside_history_is_empty():
+    assert _history().query(NOW + 10, NOW + 20, now=NOW)[1] == []
+
+
+def test_empty_history():
+    assert server.MetricsHistory().query(NOW - 600, NOW, now=NOW)[1] == []
+
+
+def test_route_rejects_bad_bounds():
+    client = server.app.test_client()
+    assert client.get("/api/metrics/history?to=nan").status_code == 400
+    assert client.get("/api/metrics/history?from=-inf").status_code == 400
+    assert client.get("/api/metrics/history?from=20&to=10").status_code == 400
+    assert client.get("/api/metrics/history?step=0").status_code == 400
+    assert client.get("/api/metrics/history?from=-1e11").status_code == 200
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import server
+
+SLOW_DELAY = 0.5
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # /good answers at once, /junk answers with something that is not an address,
+    # /slow answers with a different address after SLOW_DELAY, /down is a 503.
+    def do_GET(self):
+        self.server.hits[self.path] += 1
+        if self.path == "/slow":
+            time.sleep(SLOW_DELAY)
+        status, body = {
+            "/good": (200, "203.0.113.5\n"),
+            "/junk": (200, "<html>rate limited</html>"),
+            "/slow": (200, "198.51.100.9\n"),
+        }.get(self.path, (503, "unavailable"))
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoints():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.hits = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield lambda *paths: [base + p for p in paths], httpd.hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_first_valid_answer_wins(endpoints):
+    urls, hits = endpoints
+    service = server.PublicIpService(urls("/junk", "/slow", "/down", "/good"), timeout=3.0)
+    start = time.monotonic()
+    assert asyncio.run(service.lookup("remote-a")) == "203.0.113.5"
+    assert time.monotonic() - start < SLOW_DELAY
+    assert hits["/junk"] == hits["/good"] == 1
+
+
+def test_slow_valid_answer_beats_junk(endpoints):
+    urls, _ = endpoints
+    service = server.PublicIpService(urls("/junk", "/down", "/slow"), timeout=3.0)
+    assert asyncio.run(service.lookup("remote-a")) == "198.51.100.9"
+
+
+def test_no_valid_answer_within_timeout(endpoints):
+    urls, _ = endpoints
+    service = server.PublicIpService(urls("/junk", "/slow"), timeout=0.2)
+    start = time.monotonic()
+    assert asyncio.run(service.lookup("remote-a")) is None
+    assert time.monotonic() - start < SLOW_DELAY
+    assert service.cached("remote-a") is None
+
+
+def test_answers_are_cached_per_key_for_the_ttl(endpoints):
+    urls, hits = endpoints
+    service = server.PublicIpService(urls("/good"), ttl=0.3, timeout=2.0)
+
+    async def run():
+        assert await service.lookup("remote-a") == "203.0.113.5"
+        assert await service.lookup("remote-a") == "203.0.113.5"
+        assert hits["/good"] == 1
+        assert await service.lookup("remote-b") == "203.0.113.5"
+        assert hits["/good"] == 2
+        assert await service.lookup("remote-a", refresh=True) == "203.0.113.5"
+        assert hits["/good"] == 3
+        await asyncio.sleep(0.4)
+        assert service.cached("remote-a") is None
+        await service.lookup("remote-a")
+        assert hits["/good"] == 4
+
+    asyncio.run(run())
+
+
+def test_concurrent_lookups_share_one_race(endpoints):
+    urls, hits = endpoints
+    service = server.PublicIpService(urls("/junk", "/good"), timeout=2.0)
+
+    async def run():
+        return await asyncio.gather(*(service.lookup("remote-a") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["203.0.113.5"] * 5
+    assert hits["/junk"] == hits["/good"] == 1
+    assert service._inflight == {}
@@ -0,0 +1,141 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+import server
+from test_fake_openvpn import _wait
+
+
+@pytest.fixture
+def ports():
+    # Local stand-ins for remotes: a TCP listener, a UDP socket that answers every
+    # datagram, one that never answers, and TCP/UDP ports with nothing bound.
+    socks = []
+
+    def bound(kind):
+        sock = socket.socket(socket.AF_INET, kind)
+        sock.bind(("127.0.0.1", 0))
+        socks.append(sock)
+        return sock
+
+    tcp = bound(socket.SOCK_STREAM)
+    tcp.listen(8)
+    echo = bound(socket.SOCK_DGRAM)
+    silent = bound(socket.SOCK_DGRAM)
+
+    def answer():
+        while True:
+            try:
+                data, addr = echo.recvfrom(2048)
+                echo.sendto(data, addr)
+            except OSError:
+                return
+
+    threading.Thread(target=answer, daemon=True).start()
+    closed = {}
+    for name, kind in (("tcp_closed", socket.SOCK_STREAM), ("udp_closed", socket.SOCK_DGRAM)):
+        sock = socket.socket(socket.AF_INET, kind)
+        sock.bind(("127.0.0.1", 0))
+        closed[name] = sock.getsockname()[1]
+        sock.close()
+    yield {
+        "tcp_open": tcp.getsockname()[1],
+        "udp_echo": echo.getsockname()[1],
+        "udp_silent": silent.getsockname()[1],
+        **closed,
+    }
+    for sock in socks:
+        sock.close()
+
+
+def _probe(host, port, proto, timeout=0.5):
+    result = {"host": host, "port": port, "proto": proto, "state": "pending", "rtt_ms": None}
+    answered = asyncio.Event()
+
+    async def run():
+        await server._probe_remote(result, timeout, answered)
+        return answered.is_set()
+
+    return result, asyncio.run(run())
+
+
+def test_probe_states(ports):
+    result, answered = _probe("127.0.0.1", ports["tcp_open"], "tcp-client")
+    assert (result["state"], answered) == ("reachable", True)
+    assert result["rtt_ms"] is not None
+    result, answered = _probe("127.0.0.1", ports["udp_echo"], "udp")
+    assert (result["state"], answered) == ("reachable", True)
+    result, answered = _probe("127.0.0.1", ports["udp_silent"], "udp", timeout=0.2)
+    assert (result["state"], answered, result["rtt_ms"]) == ("silent", False, None)
+    assert _probe("127.0.0.1", ports["tcp_closed"], "tcp")[0]["state"] == "refused"
+    assert _probe("127.0.0.1", ports["udp_closed"], "udp4")[0]["state"] == "refused"
+    assert _probe("remote.invalid", 1194, "udp")[0]["state"] == "unresolved"
+
+
+def test_race_ranks_by_state_then_config_order(ports):
+    remotes = [
+        ("remote.invalid", 1194, "udp"),
+        ("127.0.0.1", ports["tcp_closed"], "tcp"),
+        ("127.0.0.1", ports["udp_silent"], "udp"),
+        ("127.0.0.1", ports["tcp_open"], "tcp"),
+        ("127.0.0.1", ports["udp_closed"], "udp"),
+    ]
+    ranked = asyncio.run(server.race_remotes(remotes, timeout=1.0))
+    assert [(r["port"], r["state"]) for r in ranked] == [
+        (ports["tcp_open"], "reachable"),
+        (ports["udp_silent"], "silent"),
+        (1194, "unresolved"),
+        (ports["tcp_closed"], "refused"),
+        (ports["udp_closed"], "refused"),
+    ]
+
+
+def test_race_stops_a_grace_period_after_the_first_answer(ports):
+    remotes = [("127.0.0.1", ports["udp_silent"], "udp"), ("127.0.0.1", ports["udp_echo"], "udp")]
+    start = time.monotonic()
+    ranked = asyncio.run(server.race_remotes(remotes, timeout=5.0))
+    assert time.monotonic() - start < 1.0
+    assert [r["state"] for r in ranked] == ["reachable", "silent"]
+
+
+def test_race_without_answers_waits_for_the_deadline(ports):
+    remotes = [("127.0.0.1", ports["udp_silent"], "udp"), ("127.0.0.1", ports["tcp_closed"], "tcp")]
+    start = time.monotonic()
+    ranked = asyncio.run(server.race_remotes(remotes, timeout=0.3))
+    assert time.monotonic() - start >= 0.25
+    assert [r["state"] for r in ranked] == ["silent", "refused"]
+
+
+def test_remote_args_keep_ranked_order():
+    ranked = [
+        {"host": "b.example.com", "port": 443, "proto": "tcp"},
+        {"host": "a.example.com", "port": 1194, "proto": "udp"},
+    ]
+    assert server.Connection._remote_args(ranked) == [
+        "--remote", "b.example.com", "443", "tcp",
+        "--remote", "a.example.com", "1194", "udp",
+    ]
+
+
+def test_ranked_remote_is_passed_ahead_of_config(ports, tmp_path):
+    # The fake openvpn connects to the first --remote on its command line, falling back to
+    # the profile's first remote, so the winner only shows up if it precedes --config.
+    profile = tmp_path / "race.ovpn"
+    profile.write_text(
+        "client\ndev tun\n"
+        f"remote 127.0.0.1 {ports['tcp_closed']} tcp\n"
+        f"remote 127.0.0.1 {ports['tcp_open']} tcp\n"
+    )
+    conn = server.connections.start(str(profile), "secret", auto_reconnect=False)
+    assert conn is not None
+    try:
+        assert _wait(lambda: conn.status == "connected"), conn.logs.tail(20)
+        assert conn.remote == ("127.0.0.1", ports["tcp_open"])
+        assert [r["state"] for r in conn.attempt.remotes] == ["reachable", "refused"]
+    finally:
+        job = conn.disconnect()
+    assert _wait(lambda: job.outcome is not None)
+    assert _wait(conn.done.is_set)
@@ -0,0 +1,73 @@
+import re
+import subprocess
+import sys
+import time
+
+import pytest
+
+import server
+from conftest import BENCH_DIR
+
+DOWN_MBPS = 40
+UP_MBPS = 20
+
+
+@pytest.fixture(scope="module")
+def endpoint():
+    proc = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "speedtest_server.py"), "--port", "0",
+         "--down-mbps", str(DOWN_MBPS), "--up-mbps", str(UP_MBPS)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        m = re.search(r"http://[\d.]+:\d+", proc.stdout.readline())
+        assert m, "speedtest_server.py did not report its address"
+        yield m.group()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def _wait_finished(client, job_id, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/speedtest/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"speed test {job_id} still running")
+
+
+def _start(client, url):
+    return client.post("/api/speedtest", json={"url": url, "streams": 2, "duration": 2})
+
+
+def test_shaped_run_and_single_flight(endpoint):
+    client = server.app.test_client()
+    r = _start(client, endpoint)
+    assert r.status_code == 202
+    job_id = r.get_json()["job"]
+    busy = _start(client, endpoint)
+    assert busy.status_code == 409
+    assert busy.get_json()["job"] == job_id
+    job = _wait_finished(client, job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["rtt"]["idle"]["samples"] > 0
+    assert 0.5 * DOWN_MBPS <= job["download"]["mbps"] <= 1.5 * DOWN_MBPS
+    # Upload counts bytes handed to the socket; the loopback send buffers (a few MB per
+    # stream) inflate a 2 s run, so only the order of magnitude is checked.
+    assert 0.5 * UP_MBPS <= job["upload"]["mbps"] <= 2 * UP_MBPS
+    assert job_id in [j["job"] for j in client.get("/api/speedtest").get_json()["recent"]]
+
+
+def test_delete_cancels_a_run(endpoint):
+    client = server.app.test_client()
+    r = _start(client, endpoint)
+    assert r.status_code == 202
+    job_id = r.get_json()["job"]
+    time.sleep(0.3)
+    assert client.delete(f"/api/speedtest/{job_id}").get_json()["ok"]
+    job = _wait_finished(client, job_id, timeout=5.0)
+    assert job["status"] == "cancelled"
+    assert not client.delete(f"/api/speedtest/{job_id}").get_json()["ok"]
+    assert client.get("/api/speedtest/nope").status_code == 404
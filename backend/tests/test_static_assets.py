@@ -0,0 +1,89 @@
+import gzip
+
+import pytest
+
+import server
+
+INDEX = b"<!doctype html><title>VPN Connect</title>" + b"<!-- padding -->" * 100
+APP_JS = b"export const answer = 42;\n" * 200
+HASHED = "assets/index-AbCd1234.js"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / HASHED).write_bytes(APP_JS)
+    (tmp_path / "favicon.svg").write_bytes(b"<svg/>")
+    (tmp_path / "assets" / "vendor-Zz99Yy88.css").write_bytes(b"body{}" * 400)
+    (tmp_path / "assets" / "vendor-Zz99Yy88.css.gz").write_bytes(b"prebuilt")
+    monkeypatch.setattr(server, "static_assets", server.StaticAssets(tmp_path))
+    return server.app.test_client()
+
+
+def test_gzip_is_negotiated(client):
+    r = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip, deflate"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(r.data) == APP_JS
+    plain = client.get(f"/{HASHED}")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == APP_JS
+    refused = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip;q=0"})
+    assert refused.data == APP_JS
+
+
+def test_brotli_is_preferred_when_available(client):
+    brotli = pytest.importorskip("brotli")
+    r = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip, br"})
+    assert r.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(r.data) == APP_JS
+
+
+def test_etag_and_304_per_encoding(client):
+    zipped = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip"})
+    plain = client.get(f"/{HASHED}")
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+    again = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == zipped.headers["ETag"]
+    assert again.data == b""
+    # A validator for the identity body does not match the gzip representation.
+    other = client.get(f"/{HASHED}", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]})
+    assert other.status_code == 200
+    assert client.get(f"/{HASHED}", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def test_prebuilt_and_small_files(client):
+    css = client.get("/assets/vendor-Zz99Yy88.css", headers={"Accept-Encoding": "gzip"})
+    assert css.headers["Content-Encoding"] == "gzip"
+    assert css.data == b"prebuilt"
+    svg = client.get("/favicon.svg", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in svg.headers
+    assert "Vary" not in svg.headers
+    assert svg.data == b"<svg/>"
+
+
+def test_cache_control(client):
+    assert client.get(f"/{HASHED}").headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert client.get("/favicon.svg").headers["Cache-Control"] == "no-cache"
+    assert client.get("/").headers["Cache-Control"] == "no-cache"
+
+
+def test_index_fallback_and_404s(client):
+    root = client.get("/")
+    assert root.status_code == 200
+    assert root.data == INDEX
+    for route in ("/connections", "/settings/profiles"):
+        r = client.get(route)
+        assert r.status_code == 200
+        assert r.data == INDEX
+    for missing in ("/missing.js", "/settings/logo.png", "/assets/gone", "/api/not-a-route"):
+        assert client.get(missing).status_code == 404
+
+
+def test_without_build_everything_is_404(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "static_assets", server.StaticAssets(tmp_path / "dist"))
+    client = server.app.test_client()
+    assert client.get("/").status_code == 404
+    assert client.get("/connections").status_code == 404
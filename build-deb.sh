@@ -26,6 +26,7 @@ rm -rf "$BUILD_DIR"
 mkdir -p "$DEST" "$BIN_DEST" "$APP_DEST"
 
 cp backend/server.py "$DEST/"
+python3 -m compileall -q "$DEST/server.py" || true
 cp -r vpn-connect/dist "$DEST/"
 cp desktop/main.js desktop/package.json desktop/run.sh "$DEST/"
 [ -f desktop/icon.jpeg ] && cp desktop/icon.jpeg "$DEST/"
@@ -5,11 +5,13 @@ const http = require('http');
 const fs = require('fs');
 
 const PORT = 8765;
-const URL = `http://127.0.0.1:${PORT}`;
+let URL = `http://127.0.0.1:${PORT}`;
 
 let backendProcess = null;
+let backendReady = null;
 
-function waitForBackend(maxAttempts = 50) {
+// Legacy path for a backend that never prints READY: poll until it answers.
+function pollBackend(maxAttempts = 50) {
   return new Promise((resolve, reject) => {
     let attempts = 0;
     const tryConnect = () => {
@@ -26,6 +28,30 @@ function waitForBackend(maxAttempts = 50) {
   });
 }
 
+// The backend prints "READY port=N" once its socket is listening.
+function waitForBackend(timeoutMs = 20000) {
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      backendReady = null;
+      pollBackend().then(resolve, reject);
+    }, timeoutMs);
+    backendReady = (port) => {
+      clearTimeout(timer);
+      backendReady = null;
+      URL = `http://127.0.0.1:${port}`;
+      resolve();
+    };
+    if (backendProcess) {
+      backendProcess.once('exit', () => {
+        if (!backendReady) return;
+        clearTimeout(timer);
+        backendReady = null;
+        reject(new Error('Backend exited during startup. Check that port 8765 is free.'));
+      });
+    }
+  });
+}
+
 function createWindow() {
   let iconOption = {};
   try {
@@ -75,13 +101,25 @@ function startBackend() {
   }
 
   const env = { ...process.env, VPN_CONNECT_STATIC: staticDir };
-  backendProcess = spawn('python3', [serverPath, '--port=' + PORT, '--no-browser'], {
+  // -m lets Python reuse server.py's cached bytecode; a script run always recompiles it.
+  backendProcess = spawn('python3', ['-m', 'server', '--port=' + PORT, '--no-browser'], {
     cwd: installDir,
     env,
     stdio: ['ignore', 'pipe', 'pipe'],
   });
 
-  backendProcess.stdout.on('data', (d) => process.stdout.write(d.toString()));
+  let pending = '';
+  backendProcess.stdout.on('data', (d) => {
+    const text = d.toString();
+    process.stdout.write(text);
+    if (!backendReady) return;
+    pending += text;
+    const m = pending.match(/^READY port=(\d+)$/m);
+    if (m) {
+      pending = '';
+      backendReady(Number(m[1]));
+    }
+  });
   backendProcess.stderr.on('data', (d) => process.stderr.write(d.toString()));
   backendProcess.on('error', (err) => {
     console.error('Backend failed to start:', err);
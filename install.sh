@@ -54,6 +54,7 @@ pip3 install --user -r "$SCRIPT_DIR/backend/requirements.txt"
 echo "[5/7] Installing to $INSTALL_DIR..."
 mkdir -p "$INSTALL_DIR"
 cp "$SCRIPT_DIR/backend/server.py" "$INSTALL_DIR/server.py"
+python3 -m compileall -q "$INSTALL_DIR/server.py" || true
 cp -r "$SCRIPT_DIR/vpn-connect/dist" "$INSTALL_DIR/dist"
 cp "$SCRIPT_DIR/desktop/main.js" "$INSTALL_DIR/main.js"
 cp "$SCRIPT_DIR/desktop/package.json" "$INSTALL_DIR/package.json"
@@ -95,7 +96,7 @@ EOF
 
 echo ""
 echo "=== Optional: Allow openvpn without sudo password ==="
-echo "  sudo visudo  # add: $USER ALL=(ALL) NOPASSWD: /usr/sbin/openvpn, /usr/bin/killall openvpn"
+echo "  sudo visudo  # add: $USER ALL=(ALL) NOPASSWD: /usr/sbin/openvpn"
 echo ""
 echo "=== Installation complete ==="
 echo "  Launch from app menu:  VPN Connect"
@@ -21,6 +21,7 @@ import {
 import { motion, AnimatePresence } from 'motion/react';
 
 interface LogEntry {
+  seq?: number;
   timestamp: string;
   level: 'INFO' | 'TCP' | 'TLS' | 'SUCCESS' | 'ERROR' | 'TUN';
   message: string;
@@ -29,6 +30,7 @@ interface LogEntry {
 const API_BASE = '';
 
 interface ApiStatus {
+  id: string | null;
   connected: boolean;
   connecting: boolean;
   status: string;
@@ -42,7 +44,8 @@ interface ApiStatus {
   config_file: string;
   config_name: string;
   encryption: string;
-  saved_profiles: { config_path: string; password: string; name?: string }[];
+  saved_profiles?: { config_path: string; password: string; name?: string }[];
+  profiles_rev?: string;
   logs: LogEntry[];
 }
 
@@ -76,44 +79,108 @@ export default function App() {
   const logContainerRef = useRef<HTMLDivElement>(null);
   const userAtBottomRef = useRef(true);
   const hasLoadedSavedRef = useRef(false);
+  const connectionIdRef = useRef<string | null>(null);
+  const profilesRevRef = useRef<string | null>(null);
 
   useEffect(() => {
+    const applyStatus = (data: Partial<ApiStatus>) => {
+      setApiConnected(true);
+      setApiError(null);
+      if (typeof data.connected === 'boolean') setIsConnected(data.connected);
+      if (typeof data.connecting === 'boolean') setIsConnecting(data.connecting);
+      if (typeof data.duration_seconds === 'number') setDuration(data.duration_seconds);
+      if ('ip' in data) setIp(data.ip || '---.---.---.---');
+      if ('public_ip' in data) setPublicIp(data.public_ip ?? null);
+      if ('pid' in data) setPid(data.pid ?? null);
+      if ('down_mbps' in data) setDownMbps(typeof data.down_mbps === 'number' ? data.down_mbps : 0);
+      if ('up_mbps' in data) setUpMbps(typeof data.up_mbps === 'number' ? data.up_mbps : 0);
+      if ('ping_ms' in data) setPingMs(typeof data.ping_ms === 'number' ? data.ping_ms : null);
+      if ('config_name' in data) setConfigName(data.config_name || '');
+      if ('encryption' in data) setEncryption(data.encryption || 'AES-256-GCM');
+    };
+
+    const isCurrent = (data: { id?: string | null }) =>
+      data.id == null || data.id === connectionIdRef.current;
+
+    const applySnapshot = (data: ApiStatus) => {
+      connectionIdRef.current = data.id ?? null;
+      applyStatus(data);
+      setLogs(Array.isArray(data.logs) ? data.logs : []);
+      if (typeof data.profiles_rev === 'string') profilesRevRef.current = data.profiles_rev;
+      if (!Array.isArray(data.saved_profiles)) return;
+      setSavedProfiles(data.saved_profiles);
+      if (!hasLoadedSavedRef.current && Array.isArray(data.saved_profiles) && data.saved_profiles.length > 0) {
+        hasLoadedSavedRef.current = true;
+        const first = data.saved_profiles[0];
+        if (first?.config_path) setConfigPath(first.config_path);
+        if (first?.password) setPassword(first.password);
+      }
+    };
+
     const fetchStatus = async () => {
       try {
-        const res = await fetch(`${API_BASE}/api/status`);
+        const rev = profilesRevRef.current;
+        const res = await fetch(`${API_BASE}/api/status${rev ? `?profiles_rev=${encodeURIComponent(rev)}` : ''}`);
         if (!res.ok) return;
-        const data: ApiStatus = await res.json();
-        setApiConnected(true);
-        setApiError(null);
-        setIsConnected(data.connected);
-        setIsConnecting(data.connecting);
-        setDuration(data.duration_seconds);
-        setIp(data.ip || '---.---.---.---');
-        setPublicIp(data.public_ip ?? null);
-        setPid(data.pid ?? null);
-        setDownMbps(typeof data.down_mbps === 'number' ? data.down_mbps : 0);
-        setUpMbps(typeof data.up_mbps === 'number' ? data.up_mbps : 0);
-        setPingMs(typeof data.ping_ms === 'number' ? data.ping_ms : null);
-        setConfigName(data.config_name || '');
-        setEncryption(data.encryption || 'AES-256-GCM');
-        if (data.logs?.length) setLogs(data.logs);
-        setSavedProfiles(Array.isArray(data.saved_profiles) ? data.saved_profiles : []);
-        if (!hasLoadedSavedRef.current && Array.isArray(data.saved_profiles) && data.saved_profiles.length > 0) {
-          hasLoadedSavedRef.current = true;
-          const first = data.saved_profiles[0];
-          if (first?.config_path) setConfigPath(first.config_path);
-          if (first?.password) setPassword(first.password);
-        }
+        applySnapshot(await res.json());
       } catch {
         setApiConnected(false);
         setApiError('Backend not running. Start: python3 backend/server.py');
       }
     };
-    fetchStatus();
-    const interval = setInterval(fetchStatus, 1500);
-    return () => clearInterval(interval);
+
+    let interval: ReturnType<typeof setInterval> | null = null;
+    const startPolling = () => {
+      if (interval) return;
+      fetchStatus();
+      interval = setInterval(fetchStatus, 1500);
+    };
+
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+      return () => { if (interval) clearInterval(interval); };
+    }
+
+    let opened = false;
+    const source = new EventSource(`${API_BASE}/api/events`);
+    source.onopen = () => { opened = true; };
+    source.addEventListener('snapshot', (e) => applySnapshot(JSON.parse((e as MessageEvent).data)));
+    const applyCurrent = (e: Event) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      if (isCurrent(data)) applyStatus(data);
+    };
+    source.addEventListener('status', applyCurrent);
+    source.addEventListener('throughput', applyCurrent);
+    source.addEventListener('ping', applyCurrent);
+    source.addEventListener('log', (e) => {
+      const entry: LogEntry & { id?: string } = JSON.parse((e as MessageEvent).data);
+      if (!isCurrent(entry)) return;
+      setLogs(prev => {
+        const last = prev[prev.length - 1];
+        if (last?.seq != null && entry.seq != null && entry.seq <= last.seq) return prev;
+        return [...prev.slice(-199), entry];
+      });
+    });
+    source.onerror = () => {
+      setApiConnected(false);
+      setApiError('Backend not running. Start: python3 backend/server.py');
+      if (!opened) {
+        source.close();
+        startPolling();
+      }
+    };
+    return () => {
+      source.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
+  useEffect(() => {
+    if (!isConnected) return;
+    const tick = setInterval(() => setDuration(d => d + 1), 1000);
+    return () => clearInterval(tick);
+  }, [isConnected]);
+
   useEffect(() => {
     if (userAtBottomRef.current && logContainerRef.current) {
       const el = logContainerRef.current;